@@ -0,0 +1,150 @@
+from web3 import Web3
+import argparse
+import json
+import os
+import threading
+from chain_utils import HYPEREVM_RPC_URL
+from rpc_scheduler import ScheduledHTTPProvider
+
+
+# Sends per arm (with and without the list) before the measured means decide for a key
+MEASURE_SAMPLES = 5
+
+
+def _key(pool, operation, sender):
+    return f"{pool.lower()}:{operation}:{sender.lower()}"
+
+
+class AccessListCache:
+    """
+    EIP-2930 access lists per (pool, operation kind, sender), generated once with
+    eth_createAccessList and reused for later transactions of the same shape.
+
+    The sender is part of the key because token balance and Permit2 allowance slots
+    are per wallet. The operation should carry whatever changes the touched slots,
+    e.g. "swapSingleTokenExactIn:<token_in>". Lists and gas statistics are kept in a
+    JSON file so they survive restarts, report() compares gas with and without lists.
+    Sends of a key alternate between the two until each has MEASURE_SAMPLES receipts,
+    after that the lower measured mean decides.
+    """
+
+    def __init__(self, w3, path="access_lists.json"):
+        self.w3 = w3
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def save(self):
+        with self.lock:
+            with open(self.path, "w") as f:
+                json.dump(self.entries, f, indent=2)
+
+    def generate(self, transaction):
+        """eth_createAccessList plus a plain estimate, returns (access_list, gas with list, gas without)"""
+        call = {k: transaction[k] for k in ("from", "to", "data", "value") if k in transaction}
+        response = self.w3.manager.request_blocking("eth_createAccessList", [call, "latest"])
+        access_list = [
+            {"address": Web3.to_checksum_address(entry["address"]),
+             "storageKeys": [Web3.to_hex(k) for k in entry["storageKeys"]]}
+            for entry in response["accessList"]
+        ]
+        gas_with = int(response["gasUsed"], 16) if isinstance(response["gasUsed"], str) else response["gasUsed"]
+        gas_without = self.w3.eth.estimate_gas(call)
+        return access_list, gas_with, gas_without
+
+    def get(self, pool, operation, transaction):
+        """Cached list for the key, generated from this transaction the first time"""
+        key = _key(pool, operation, transaction["from"])
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            access_list, gas_with, gas_without = self.generate(transaction)
+            entry = {
+                "access_list": access_list,
+                "estimated_with": gas_with,
+                "estimated_without": gas_without,
+                # A list only helps if the cold-access discounts beat its up front cost
+                "use": gas_with < gas_without,
+                "sent_with": [],
+                "sent_without": [],
+            }
+            with self.lock:
+                self.entries[key] = entry
+            self.save()
+        return entry
+
+    def apply(self, pool, operation, transaction):
+        """
+        Turn a legacy transaction dict into an EIP-2930 (type 1) one carrying the cached list.
+        Type 1 keeps gasPrice, so big block / small block routing is unchanged.
+        Returns the transaction unchanged when the list would not save gas, or when this
+        send measures the arm without it.
+        """
+        entry = self.get(pool, operation, transaction)
+        if not self._use_list(entry):
+            return transaction
+        typed = dict(transaction)
+        typed["type"] = 1
+        typed["accessList"] = entry["access_list"]
+        typed.setdefault("chainId", self.w3.eth.chain_id)
+        return typed
+
+    @staticmethod
+    def _use_list(entry):
+        with_list, without_list = entry["sent_with"], entry["sent_without"]
+        if len(with_list) >= MEASURE_SAMPLES and len(without_list) >= MEASURE_SAMPLES:
+            return sum(with_list) / len(with_list) < sum(without_list) / len(without_list)
+        if len(with_list) == len(without_list):
+            # The estimate picks which arm goes first
+            return entry["use"]
+        return len(with_list) < len(without_list)
+
+    def record(self, pool, operation, sender, receipt, used_list):
+        """Keep the actual gas used, so the report is measured and not only estimated"""
+        key = _key(pool, operation, sender)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            entry["sent_with" if used_list else "sent_without"].append(receipt.gasUsed)
+        self.save()
+
+    def report(self):
+        """Per key: estimated saving, and mean gas actually used with and without the list"""
+        rows = []
+        for key, entry in sorted(self.entries.items()):
+            with_list, without_list = entry["sent_with"], entry["sent_without"]
+            rows.append({
+                "key": key,
+                "entries": len(entry["access_list"]),
+                "estimated_saved": entry["estimated_without"] - entry["estimated_with"],
+                "sent_with": len(with_list),
+                "mean_with": sum(with_list) / len(with_list) if with_list else None,
+                "sent_without": len(without_list),
+                "mean_without": sum(without_list) / len(without_list) if without_list else None,
+            })
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show gas saved by cached access lists')
+    parser.add_argument('--path', default='access_lists.json', help='Access list cache file')
+    args = parser.parse_args()
+
+    cache = AccessListCache(Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL)), args.path)
+    total_saved = 0
+    for row in cache.report():
+        measured = ""
+        if row["mean_with"] is not None and row["mean_without"] is not None:
+            measured = f", measured {row['mean_without'] - row['mean_with']:.0f} saved"
+        print(f"{row['key']}: {row['entries']} entries, estimated {row['estimated_saved']} saved "
+              f"({row['sent_with']} sent with list, {row['sent_without']} without){measured}")
+        total_saved += max(row["estimated_saved"], 0) * row["sent_with"]
+    print(f"Estimated gas saved across sent transactions: {total_saved}")
+
+
+if __name__ == "__main__":
+    main()
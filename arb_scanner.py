@@ -0,0 +1,307 @@
+from web3 import Web3
+import argparse
+import time
+from decimal import Decimal
+import numpy as np
+from chain_utils import HYPEREVM_RPC_URL, KNOWN_POOLS, ROUTER_ADDRESS, TOKENS, encode_calldata, load_abi
+from pool_math import AMP_PRECISION, MAX_IN_RATIO, ONE
+from pool_mirror import PoolMirror
+from pool_registry import build_path_calls, build_registry, haircut_path, indexed_pools
+from rpc_scheduler import ScheduledHTTPProvider
+
+GRID_POINTS = 24
+REFINE_ITERATIONS = 40
+GOLDEN = (np.sqrt(5) - 1) / 2
+
+
+class ArbCandidate:
+    """A profitable cycle with its optimal size and the router calls that execute it"""
+
+    def __init__(self, cycle, amount_in, amount_out, calls=None):
+        self.cycle = cycle
+        self.amount_in = amount_in
+        self.amount_out = amount_out
+        self.profit = amount_out - amount_in
+        self.calls = calls or []
+
+    @property
+    def token(self):
+        return self.cycle[0][1]
+
+    def multicall_transaction(self, router_contract, tx_params):
+        """Unsigned router.multicall transaction, tx_params supplies from/nonce/gas/gasPrice"""
+        return router_contract.functions.multicall(self.calls).build_transaction(tx_params)
+
+    def __repr__(self):
+        hops = " -> ".join(pool[:8] for pool, _, _ in self.cycle)
+        return f"ArbCandidate({hops}, in={self.amount_in}, profit={self.profit})"
+
+
+def find_cycles(registry, start_tokens, max_hops=3):
+    """Simple cycles of 2..max_hops pools that start and end at one of start_tokens"""
+    cycles = []
+    for start in start_tokens:
+        target = start.lower()
+
+        def walk(token, path, used_pools, seen_tokens):
+            for pool, next_token in registry.graph.get(token.lower(), []):
+                if pool in used_pools:
+                    continue
+                hop_path = path + [(pool, token, next_token)]
+                if next_token.lower() == target:
+                    if len(hop_path) >= 2:
+                        cycles.append(hop_path)
+                elif len(hop_path) < max_hops and next_token.lower() not in seen_tokens:
+                    walk(next_token, hop_path, used_pools | {pool}, seen_tokens | {next_token.lower()})
+
+        walk(start, [], frozenset(), frozenset({target}))
+    return cycles
+
+
+def _hop_params(registry, hop):
+    """Float parameters of one hop for the vectorized math, None if the pool is not supported"""
+    pool, token_in, token_out = hop
+    state = registry.states[pool]
+    if state.kind == "stable" and len(state.tokens) != 2:
+        return None
+    i, o = state.index(token_in), state.index(token_out)
+    live = state.balances_live
+    return {
+        "weighted": state.kind == "weighted",
+        "bi": float(live[i]),
+        "bo": float(live[o]),
+        "wi": float(state.weights[i]) / ONE if state.weights else 0.0,
+        "wo": float(state.weights[o]) / ONE if state.weights else 1.0,
+        "amp": float(state.amp or 0) / AMP_PRECISION,
+        "fee": float(state.swap_fee) / ONE,
+        "scale_in": state.scaling_factors[i] * float(state.token_rates[i]) / ONE,
+        "scale_out": state.scaling_factors[o] * float(state.token_rates[o]) / ONE,
+    }
+
+
+def _stable_invariant_vec(amp, x, y):
+    """2-token StableMath invariant in float64, vectorized over pools"""
+    total = x + y
+    invariant = total.copy()
+    amp_total = amp * 2
+    for _ in range(64):
+        d_p = invariant * invariant / (x * 2) * invariant / (y * 2)
+        invariant = ((amp_total * total + d_p * 2) * invariant) / ((amp_total - 1) * invariant + 3 * d_p)
+    return invariant
+
+
+def _stable_out_vec(amp, bi, bo, invariant, x):
+    """2-token stable swap output in float64 (balances and x in scaled18 units)"""
+    amp_total = amp * 2
+    new_in = bi + x
+    c = invariant ** 3 / (amp_total * 4 * new_in)
+    b = new_in + invariant / amp_total
+    y = (invariant * invariant + c) / (invariant + b)
+    for _ in range(64):
+        y = (y * y + c) / (2 * y + b - invariant)
+    return bo - y
+
+
+def _hop_out(params, x):
+    """Vectorized hop output: params are arrays of shape (C, 1), x has shape (C, G)"""
+    xs = x * params["scale_in"]
+    xs = xs * (1 - params["fee"])
+    weighted = params["weighted"]
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        out_weighted = params["bo"] * (1 - (params["bi"] / (params["bi"] + xs)) ** (params["wi"] / params["wo"]))
+        out_weighted = np.where(xs > params["bi"] * (MAX_IN_RATIO / ONE), np.nan, out_weighted)
+        if weighted.all():
+            # The stable solver dominates the cost, skip it when no row needs it
+            return out_weighted / params["scale_out"]
+        out_stable = _stable_out_vec(params["amp"], params["bi"], params["bo"], params["inv"], xs)
+    out = np.where(weighted, out_weighted, out_stable)
+    return out / params["scale_out"]
+
+
+class CycleEvaluator:
+    """Finds the optimal input size of many cycles at once with float64 NumPy math"""
+
+    def __init__(self, registry, cycles):
+        self.registry = registry
+        self.cycles = cycles
+        self.max_hops = max(len(c) for c in cycles)
+        self.hops = []
+        for h in range(self.max_hops):
+            rows = []
+            for cycle in cycles:
+                rows.append(_hop_params(registry, cycle[h]) if h < len(cycle) else None)
+            self.hops.append(rows)
+        self.active = np.array([[h < len(c) for h in range(self.max_hops)] for c in cycles])
+        self.supported = np.array([all(self.hops[h][k] is not None for h in range(len(c))) for k, c in enumerate(cycles)])
+        self.arrays = [self._stack(rows) for rows in self.hops]
+
+    def _stack(self, rows):
+        filler = {"weighted": True, "bi": 1.0, "bo": 1.0, "wi": 1.0, "wo": 1.0, "amp": 1.0, "fee": 0.0,
+                  "scale_in": 1.0, "scale_out": 1.0}
+        rows = [r if r is not None else filler for r in rows]
+        arrays = {key: np.array([r[key] for r in rows])[:, None] for key in filler}
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            arrays["inv"] = np.where(arrays["weighted"], 1.0, _stable_invariant_vec(arrays["amp"], arrays["bi"], arrays["bo"]))
+        return arrays
+
+    def chain(self, x):
+        """Cycle output for inputs x of shape (C, G), NaN where a hop would revert"""
+        amount = x
+        for h, params in enumerate(self.arrays):
+            out = _hop_out(params, amount)
+            amount = np.where(self.active[:, h:h + 1], out, amount)
+        return amount
+
+    def optimize(self):
+        """(best input, best output) per cycle in raw units of the start token"""
+        first = self.arrays[0]
+        max_in = first["bi"][:, 0] * (MAX_IN_RATIO / ONE) / first["scale_in"][:, 0]
+        grid = max_in[:, None] * np.geomspace(1e-6, 1, GRID_POINTS)[None, :]
+        profit = np.nan_to_num(self.chain(grid) - grid, nan=-np.inf)
+        best = np.argmax(profit, axis=1)
+        rows = np.arange(len(self.cycles))
+        lo = grid[rows, np.maximum(best - 1, 0)]
+        hi = grid[rows, np.minimum(best + 1, GRID_POINTS - 1)]
+
+        # Golden-section search on every cycle at once
+        for _ in range(REFINE_ITERATIONS):
+            a = hi - GOLDEN * (hi - lo)
+            b = lo + GOLDEN * (hi - lo)
+            pa = np.nan_to_num(self.chain(a[:, None])[:, 0] - a, nan=-np.inf)
+            pb = np.nan_to_num(self.chain(b[:, None])[:, 0] - b, nan=-np.inf)
+            hi = np.where(pa > pb, b, hi)
+            lo = np.where(pa > pb, lo, a)
+        best_in = (lo + hi) / 2
+        best_out = self.chain(best_in[:, None])[:, 0]
+        return best_in, np.nan_to_num(best_out, nan=0.0)
+
+
+class ArbScanner:
+    """
+    Evaluates every cycle once, then on each block only the cycles through pools that changed.
+    Float results are confirmed with the exact integer math before a candidate is emitted.
+    """
+
+    def __init__(self, registry, start_tokens, router_contract, max_hops=3, min_profit=None, slippage=Decimal('0.0001')):
+        self.registry = registry
+        self.router_contract = router_contract
+        self.cycles = find_cycles(registry, start_tokens, max_hops)
+        self.min_profit = min_profit or {}
+        self.slippage = slippage
+        self.by_pool = {}
+        for index, cycle in enumerate(self.cycles):
+            for pool, _, _ in cycle:
+                self.by_pool.setdefault(pool, set()).add(index)
+        self.results = {}
+        print(f"Scanning {len(self.cycles)} cycles")
+
+    def _evaluate(self, indexes):
+        indexes = sorted(indexes)
+        if not indexes:
+            return
+        cycles = [self.cycles[k] for k in indexes]
+        evaluator = CycleEvaluator(self.registry, cycles)
+        best_in, best_out = evaluator.optimize()
+        for position, k in enumerate(indexes):
+            self.results.pop(k, None)
+            cycle = cycles[position]
+            if evaluator.supported[position]:
+                if best_out[position] <= best_in[position]:
+                    continue
+                amount_in = int(best_in[position])
+            else:
+                amount_in = self._scalar_optimum(cycle)
+                if amount_in is None:
+                    continue
+            # Profit as the emitted calls realize it: later hops spend the haircut amounts
+            haircut = haircut_path(self.registry, cycle, amount_in, self.slippage)
+            if haircut is None:
+                continue
+            amount_out = haircut[1][-1]
+            min_profit = self.min_profit.get(cycle[0][1].lower(), 0)
+            if amount_out - amount_in <= min_profit:
+                continue
+            self.results[k] = ArbCandidate(cycle, amount_in, amount_out)
+
+    def _scalar_optimum(self, cycle, iterations=60):
+        """Golden-section search with the integer math, for pools the vector path does not cover"""
+        state = self.registry.states[cycle[0][0]]
+        first = state.index(cycle[0][1])
+        lo, hi = 1, state.balances_raw[first] * MAX_IN_RATIO // ONE
+
+        def profit(x):
+            out = self.registry.quote_path(cycle, int(x))
+            return -float("inf") if out is None else out - int(x)
+        for _ in range(iterations):
+            a = hi - GOLDEN * (hi - lo)
+            b = lo + GOLDEN * (hi - lo)
+            if profit(a) > profit(b):
+                hi = b
+            else:
+                lo = a
+        x = int((lo + hi) / 2)
+        return x if profit(x) > 0 else None
+
+    def scan_all(self):
+        self._evaluate(range(len(self.cycles)))
+        return self.candidates()
+
+    def on_block(self, changed_pools):
+        """Re-evaluate only the cycles that go through a changed pool"""
+        affected = set()
+        for pool in changed_pools:
+            affected |= self.by_pool.get(pool, set())
+        self._evaluate(affected)
+        return self.candidates()
+
+    def candidates(self, deadline=None):
+        """Profitable cycles, best first, with router calls that revert unless the profit is there"""
+        deadline = deadline or int(time.time()) + 60
+        result = sorted(self.results.values(), key=lambda c: c.profit, reverse=True)
+        for candidate in result:
+            min_profit = self.min_profit.get(candidate.token.lower(), 0)
+            candidate.calls, _, _ = build_path_calls(
+                self.router_contract, candidate.cycle, candidate.amount_in, self.slippage, deadline, self.registry,
+                min_final_out=candidate.amount_in + min_profit + 1
+            )
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scan cycles across our pools for arbitrage on every block')
+    parser.add_argument('--tokens', nargs='*', default=['USDT'], help='Start tokens of the cycles (symbols or addresses)')
+    parser.add_argument('--max_hops', type=int, default=3, help='Maximum pools per cycle')
+    parser.add_argument('--once', action='store_true', help='Scan the current state once and exit')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    if not w3.is_connected():
+        raise Exception("Failed to connect to Ethereum node")
+
+    pools = dict(KNOWN_POOLS)
+    pools.update(indexed_pools())
+    registry = build_registry(w3, pools)
+    router_contract = w3.eth.contract(address=ROUTER_ADDRESS, abi=load_abi("router"))
+    start_tokens = [Web3.to_checksum_address(TOKENS.get(t, t)) for t in args.tokens]
+    scanner = ArbScanner(registry, start_tokens, router_contract, args.max_hops)
+
+    start = time.time()
+    for candidate in scanner.scan_all():
+        print(f"  {candidate}")
+    print(f"Full scan took {(time.time() - start) * 1000:.1f} ms")
+    if args.once:
+        return
+
+    def on_block(block_number, changed):
+        start = time.time()
+        candidates = scanner.on_block(changed)
+        print(f"Block {block_number}: {len(changed)} pools changed, {len(candidates)} candidates "
+              f"({(time.time() - start) * 1000:.1f} ms)")
+        for candidate in candidates[:5]:
+            print(f"  {candidate} calldata: {encode_calldata(router_contract.functions.multicall(candidate.calls))[:74]}...")
+
+    PoolMirror(w3, registry).follow(on_block)
+
+
+if __name__ == "__main__":
+    main()
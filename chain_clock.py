@@ -0,0 +1,152 @@
+from web3 import Web3
+import argparse
+import math
+import threading
+import time
+from collections import deque
+from chain_utils import HYPEREVM_RPC_URL, MAX_UINT48
+from rpc_scheduler import BULK, ScheduledHTTPProvider, rpc_priority
+
+# HyperEVM small blocks have a 2M gas limit, anything above is a big block
+SMALL_BLOCK_GAS_LIMIT = 2_000_000
+# Assumed clock error before any header was seen (local wall time vs block timestamps)
+UNSYNCED_ERROR = 15
+# Slope is only fitted once the samples span this many seconds, below it we assume 1
+MIN_FIT_SPAN = 30
+
+
+def block_lane(block):
+    return "big" if block["gasLimit"] > SMALL_BLOCK_GAS_LIMIT else "small"
+
+
+class ChainClock:
+    """
+    Model of block timestamp against local wall time, so deadlines need no block fetch.
+
+    Headers are observed once (follow() or observe() from a loop that already has them).
+    The fit is timestamp = a + b * wall over the last `window` headers, shifted up to the
+    highest sample: a header is always seen after it was produced, so the earliest-seen
+    one bounds the chain clock best. Per lane (small/big blocks) we keep the interval so
+    margins can cover "the next block of that lane".
+    """
+
+    def __init__(self, w3, window=128, margin=5):
+        self.w3 = w3
+        self.margin = margin
+        self.samples = deque(maxlen=window)        # (wall, timestamp)
+        self.lanes = {"small": deque(maxlen=window), "big": deque(maxlen=window)}  # (number, timestamp)
+        self.last_block = None
+        self.lock = threading.Lock()
+        self.fit = None
+
+    def observe(self, block, received_at=None):
+        """Add a header (a dict/AttributeDict with number, timestamp, gasLimit)"""
+        received_at = time.time() if received_at is None else received_at
+        with self.lock:
+            if self.last_block is not None and block["number"] <= self.last_block:
+                return
+            self.last_block = block["number"]
+            self.samples.append((received_at, block["timestamp"]))
+            self.lanes[block_lane(block)].append((block["number"], block["timestamp"]))
+            self.fit = None
+
+    def sync(self):
+        """Observe the latest header (one request)"""
+        with rpc_priority(BULK):
+            self.observe(self.w3.eth.get_block('latest'))
+
+    def follow(self, poll_interval=0.5, stop=None):
+        """Observe every new header until stop (a threading.Event) is set"""
+        while stop is None or not stop.is_set():
+            try:
+                with rpc_priority(BULK):
+                    head = self.w3.eth.block_number
+                    start = head if self.last_block is None else self.last_block + 1
+                    # After a long pause only the recent headers matter for the fit
+                    for number in range(max(start, head - 8), head + 1):
+                        self.observe(self.w3.eth.get_block(number))
+            except Exception as e:
+                print(f"Chain clock: {e}")
+            time.sleep(poll_interval)
+
+    def start(self, poll_interval=0.5):
+        thread = threading.Thread(target=self.follow, args=(poll_interval,), daemon=True)
+        thread.start()
+        return thread
+
+    def _fit(self):
+        """(a, b, error): timestamp ~ a + b * wall, error is the spread below the envelope"""
+        with self.lock:
+            if self.fit is not None:
+                return self.fit
+            samples = list(self.samples)
+            if not samples:
+                return None
+            walls = [w for w, _ in samples]
+            stamps = [t for _, t in samples]
+            b = 1.0
+            if walls[-1] - walls[0] >= MIN_FIT_SPAN:
+                mean_w, mean_t = sum(walls) / len(walls), sum(stamps) / len(stamps)
+                var = sum((w - mean_w) ** 2 for w in walls)
+                b = sum((w - mean_w) * (t - mean_t) for w, t in samples) / var
+            residuals = [t - b * w for w, t in samples]
+            a = max(residuals)
+            # Timestamps are whole seconds, never claim better than that
+            error = max(a - min(residuals), 1.0)
+            self.fit = (a, b, error)
+            return self.fit
+
+    def now(self):
+        """(estimated chain timestamp now, error in seconds)"""
+        fit = self._fit()
+        wall = time.time()
+        if fit is None:
+            return wall, UNSYNCED_ERROR
+        a, b, error = fit
+        return a + b * wall, error
+
+    def block_interval(self, lane="small"):
+        """Seconds per block in a lane from the observed headers (None until two were seen)"""
+        with self.lock:
+            blocks = list(self.lanes[lane])
+        if len(blocks) < 2:
+            return None
+        return (blocks[-1][1] - blocks[0][1]) / (len(blocks) - 1)
+
+    def deadline(self, seconds, margin=None, lane="small"):
+        """
+        Swap/sig deadline `seconds` from now, extended by the clock error, one block of the
+        lane and the safety margin so it cannot already be past when the transaction lands.
+        """
+        margin = self.margin if margin is None else margin
+        estimate, error = self.now()
+        interval = self.block_interval(lane) or 0
+        return int(math.ceil(estimate + error + interval)) + int(seconds) + int(margin)
+
+    def sig_deadline(self, seconds=600, margin=None, lane="small"):
+        return self.deadline(seconds, margin, lane)
+
+    def expiration(self, seconds, margin=None, lane="small"):
+        """Permit2 allowance expiration (uint48)"""
+        return min(self.deadline(seconds, margin, lane), MAX_UINT48)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Follow headers and show the fitted chain clock')
+    parser.add_argument('--seconds', type=int, default=60, help='How long to follow')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    clock = ChainClock(w3)
+    stop = threading.Event()
+    threading.Thread(target=clock.follow, kwargs={"stop": stop}, daemon=True).start()
+    time.sleep(args.seconds)
+    stop.set()
+    estimate, error = clock.now()
+    print(f"Headers: {len(clock.samples)}, chain time - wall time: {estimate - time.time():+.2f}s (error {error:.2f}s)")
+    print(f"Small block interval: {clock.block_interval('small')}, big block interval: {clock.block_interval('big')}")
+    print(f"Deadline in 60s: {clock.deadline(60)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+from web3 import Web3
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from eth_account import Account
+from dotenv import load_dotenv
+from chain_clock import ChainClock
+from chain_utils import (
+    HYPEREVM_RPC_URL, KNOWN_POOLS, PERMIT2_ADDRESS, ROUTER_ADDRESS, STABLE_FACTORY_ADDRESS, TOKENS,
+    WEIGHTED_FACTORY_ADDRESS, encode_calldata, get_big_block_gas_price, load_abi
+)
+from hypercore_client import set_big_block_flag
+from permit2_tracker import Permit2Tracker
+from rpc_scheduler import ScheduledHTTPProvider
+from signing_service import permit2_batch_typed_data
+from wallet_fleet import NonceManager
+
+load_dotenv()
+
+
+class ChainProfile:
+    """
+    Everything that differs between chains: endpoint, deployment addresses, tokens and pools,
+    gas strategy and which block lanes exist (HyperEVM has small and big blocks, Base one lane).
+    """
+
+    def __init__(self, name, rpc_url, router, permit2=PERMIT2_ADDRESS, weighted_factory=None,
+                 stable_factory=None, tokens=None, pools=None, lanes=("small",), gas_limits=None,
+                 rate=10, burst=20):
+        self.name = name
+        self.rpc_url = rpc_url
+        self.router = router
+        self.permit2 = permit2
+        self.weighted_factory = weighted_factory
+        self.stable_factory = stable_factory
+        self.tokens = dict(tokens or {})
+        self.pools = dict(pools or {})
+        self.lanes = lanes
+        # Gas limit per operation and lane, init/deploy go to big blocks where they exist
+        self.gas_limits = dict(gas_limits or {})
+        self.rate = rate
+        self.burst = burst
+
+    def __repr__(self):
+        return f"ChainProfile({self.name}, {self.rpc_url})"
+
+    def default_lane(self, operation):
+        return "big" if "big" in self.lanes and operation in ("initialize", "deploy") else "small"
+
+    def gas_price(self, w3, lane="small"):
+        if lane == "big":
+            if "big" not in self.lanes:
+                raise Exception(f"{self.name} has no big block lane")
+            return get_big_block_gas_price(w3)
+        return w3.eth.gas_price
+
+    def gas_limit(self, operation, lane="small"):
+        return self.gas_limits.get((operation, lane), self.gas_limits.get(operation, 1000000))
+
+
+PROFILES = {
+    "hyperevm": ChainProfile(
+        "hyperevm", HYPEREVM_RPC_URL, ROUTER_ADDRESS,
+        weighted_factory=WEIGHTED_FACTORY_ADDRESS,
+        stable_factory=STABLE_FACTORY_ADDRESS,
+        tokens=TOKENS,
+        pools=KNOWN_POOLS,
+        lanes=("small", "big"),
+        gas_limits={"approve": 100000, "swap": 500000, "join": 800000, ("initialize", "big"): 5000000,
+                    ("initialize", "small"): 1800000},
+    ),
+    "base": ChainProfile(
+        "base", "https://base.lava.build", "0x76578ecf9a141296Ec657847fb45B0585bCDa3a6",
+        tokens={
+            "USDC": "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913",
+            "TOKEN_B": "0xfde4C96c8593536E31F229EA8f37b2ADa2699bb2",
+        },
+        pools={"0xc86B26d3ae2DBBc210dFe01771BFAc79c8132595": "weighted"},
+        gas_limits={"approve": 100000, "swap": 500000, "join": 800000, "initialize": 1000000},
+    ),
+}
+
+
+class ChainEngine:
+    """
+    One chain's connection, nonce stream, Permit2 nonces and chain clock. Engines share
+    nothing, so operations on different chains never wait on each other's rate limit or lock.
+    """
+
+    def __init__(self, profile, private_key=None):
+        self.profile = profile
+        self.w3 = Web3(ScheduledHTTPProvider(profile.rpc_url, rate=profile.rate, burst=profile.burst))
+        private_key = private_key or os.getenv("PRIVATE_KEY")
+        if not private_key:
+            raise Exception("Private key not found in environment variables")
+        self.account = Account.from_key(private_key)
+        self.address = self.account.address
+        self.chain_id = self.w3.eth.chain_id
+        self.nonces = NonceManager(self.w3, self.address)
+        self.permit2 = Permit2Tracker(self.w3, profile.permit2)
+        self.clock = ChainClock(self.w3)
+        self.router_contract = self.w3.eth.contract(address=profile.router, abi=load_abi("router"))
+        self.lock = threading.Lock()
+        # Held across a big-lane send, the usingBigBlocks flag is per account
+        self.lane_lock = threading.Lock()
+
+    def __repr__(self):
+        return f"ChainEngine({self.profile.name}, {self.address})"
+
+    def send(self, contract_function, operation, lane=None, wait=True):
+        """
+        Build, sign and send with the profile's gas strategy for the operation and lane.
+        A big-lane send sets usingBigBlocks on HyperCore first and restores it once the
+        receipt is in, so it always waits; if the flag cannot be set it fails before sending.
+        """
+        lane = lane or self.profile.default_lane(operation)
+        if lane != "big":
+            return self._send(contract_function, operation, lane, wait)
+        if "big" not in self.profile.lanes:
+            raise Exception(f"{self.profile.name} has no big block lane")
+        with self.lane_lock:
+            if not set_big_block_flag(self.account.key, True):
+                raise Exception(f"[{self.profile.name}] {operation} not sent: could not set usingBigBlocks")
+            try:
+                return self._send(contract_function, operation, lane, True)
+            finally:
+                set_big_block_flag(self.account.key, False)
+
+    def _send(self, contract_function, operation, lane, wait):
+        transaction = contract_function.build_transaction({
+            "from": self.address,
+            "chainId": self.chain_id,
+            "gas": self.profile.gas_limit(operation, lane),
+            "gasPrice": self.profile.gas_price(self.w3, lane),
+            "nonce": self.nonces.take(),
+        })
+        signed_tx = self.account.sign_transaction(transaction)
+        try:
+            tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        except Exception:
+            self.nonces.sync()
+            raise
+        print(f"[{self.profile.name}] {operation} sent: {Web3.to_hex(tx_hash)}")
+        if not wait:
+            return tx_hash
+        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+        if receipt.status != 1:
+            raise Exception(f"[{self.profile.name}] {operation} failed: {Web3.to_hex(tx_hash)}")
+        return receipt
+
+    def ensure_permit2_approvals(self, amounts):
+        """ERC20 approvals of Permit2 for {token: amount}, sent pipelined and awaited together"""
+        erc20_abi = load_abi("erc20")
+        tx_hashes = []
+        for token, amount in amounts.items():
+            token_contract = self.w3.eth.contract(address=token, abi=erc20_abi)
+            if token_contract.functions.allowance(self.address, self.profile.permit2).call() < amount:
+                tx_hashes.append(self.send(
+                    token_contract.functions.approve(self.profile.permit2, 2**256 - 1), "approve", wait=False
+                ))
+        for tx_hash in tx_hashes:
+            self.w3.eth.wait_for_transaction_receipt(tx_hash)
+
+    def sign_permit2_batch(self, amounts, expires_in=3600, sig_expires_in=600):
+        """Signed PermitBatch for {token: amount} to the router, nonces from the local tracker"""
+        expiration = self.clock.expiration(expires_in)
+        details = [
+            self.permit2.permit_details(self.address, token, self.profile.router, amount, expiration)
+            for token, amount in amounts.items()
+        ]
+        permit2_batch = {"details": details, "spender": self.profile.router,
+                         "sigDeadline": self.clock.sig_deadline(sig_expires_in)}
+        typed_data = permit2_batch_typed_data(self.chain_id, permit2_batch, self.profile.permit2)
+        signature = self.account.sign_typed_data(
+            domain_data=typed_data["domain"],
+            message_types=typed_data["types"],
+            message_data=typed_data["message"]
+        ).signature
+        return permit2_batch, signature
+
+    def permit_and_call(self, amounts, calls, operation, lane=None, wait=True):
+        """approve Permit2 if needed, then one permitBatchAndCall carrying the router calls"""
+        self.ensure_permit2_approvals(amounts)
+        permit2_batch, signature = self.sign_permit2_batch(amounts)
+        try:
+            return self.send(self.router_contract.functions.permitBatchAndCall(
+                [], [], permit2_batch, signature, [encode_calldata(c) for c in calls]
+            ), operation, lane, wait)
+        except Exception:
+            # The tracker already advanced these nonces; re-read whatever the chain has now
+            for token in amounts:
+                self.permit2.resync(self.address, token, self.profile.router)
+            raise
+
+    def initialize_pool(self, pool, tokens, amounts, min_bpt_out=0, lane=None, wait=True):
+        """Router.initialize through permitBatchAndCall, what init_join_hyper/base do"""
+        with self.lock:
+            initialize = self.router_contract.functions.initialize(pool, tokens, amounts, min_bpt_out, False, '0x')
+            return self.permit_and_call(dict(zip(tokens, amounts)), [initialize], "initialize", lane, wait)
+
+
+class MultiChainEngine:
+    """One ChainEngine per profile, running each chain's operations on its own worker"""
+
+    def __init__(self, names=("hyperevm", "base"), private_key=None):
+        self.engines = {name: ChainEngine(PROFILES[name], private_key) for name in names}
+        self.executor = ThreadPoolExecutor(max_workers=len(self.engines))
+
+    def __getitem__(self, name):
+        return self.engines[name]
+
+    def run(self, operations):
+        """
+        operations: {chain name: [callable(engine)]}. Chains run concurrently, operations of
+        one chain in order. Returns {chain name: [result or exception]}.
+        """
+        def run_chain(name, chain_operations):
+            results = []
+            for operation in chain_operations:
+                try:
+                    results.append(operation(self.engines[name]))
+                except Exception as e:
+                    print(f"[{name}] operation failed: {e}")
+                    results.append(e)
+            return results
+
+        futures = {name: self.executor.submit(run_chain, name, ops) for name, ops in operations.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show wallet state on every configured chain concurrently')
+    parser.add_argument('--chains', default=",".join(PROFILES), help='Comma separated profile names')
+    args = parser.parse_args()
+
+    engines = MultiChainEngine([c.strip() for c in args.chains.split(",")])
+
+    def status(engine):
+        balance = engine.w3.eth.get_balance(engine.address)
+        return f"chain id {engine.chain_id}, block {engine.w3.eth.block_number}, native balance {balance}"
+
+    for name, results in engines.run({name: [status] for name in engines.engines}).items():
+        print(f"{name}: {results[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import json
+import os
+from functools import lru_cache
+
+# HyperEVM endpoints and Balancer v3 deployment addresses used by the scripts
+HYPEREVM_RPC_URL = "https://rpc.hyperliquid.xyz/evm"
+ROUTER_ADDRESS = "0xA8920455934Da4D853faac1f94Fe7bEf72943eF1"
+PERMIT2_ADDRESS = "0x000000000022D473030F116dDEE9F6B43aC78BA3"
+WEIGHTED_FACTORY_ADDRESS = "0xE3881627B8DeeBCCF9c23B291430a549Fc0bE5F7"
+STABLE_FACTORY_ADDRESS = "0x96484f2aBF5e58b15176dbF1A799627B53F13B6d"
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# Tokens in our pools
+TOKENS = {
+    "USDT": "0xB8CE59FC3717ada4C02eaDF9682A9e934F625ebb",
+    "UETH": "0xBe6727B535545C67d5cAa73dEa54865B92CF7907",
+    "feUSD": "0x02c6a2fA58cC01A18B8D9E00eA48d65E4dF26c70",
+}
+
+# Pools we deployed (see notes.txt)
+KNOWN_POOLS = {
+    "0xb537c62307D25F1eb70b720F5850B8C638240F1B": "weighted",  # Weighted USDT-UETH
+    "0x278E31550A3708fb20A7A33bEd0CEcE79FE7ac00": "stable",    # Stable USDT-feUSD
+}
+
+MAX_UINT256 = 2**256 - 1
+MAX_UINT160 = 2**160 - 1
+MAX_UINT48 = 2**48 - 1
+
+ABI_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@lru_cache(maxsize=None)
+def load_abi(name):
+    """Load one of the *_abi.json files next to the scripts (parsed once per process)"""
+    with open(os.path.join(ABI_DIR, f"{name}_abi.json"), "r") as f:
+        return json.load(f)
+
+
+def encode_calldata(contract_function):
+    """
+    Calldata for a contract call (what the join scripts get from build_transaction()['data'],
+    without the chainId lookup build_transaction makes)
+    """
+    return contract_function._encode_transaction_data()
+
+
+# Function to get big block gas price for Hyperliquid
+def get_big_block_gas_price(w3):
+    try:
+        # Use custom RPC method for big block gas price
+        big_block_gas_price = w3.manager.request_blocking("eth_bigBlockGasPrice", [])
+        return int(big_block_gas_price, 16)
+    except Exception as e:
+        print(f"Failed to get big block gas price: {e}")
+        # Fallback to regular gas price * multiplier
+        regular_price = w3.eth.gas_price
+        fallback_price = int(regular_price * 3)
+        print(f"Using fallback big block gas price: {fallback_price}")
+        return fallback_price
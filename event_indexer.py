@@ -0,0 +1,301 @@
+from web3 import Web3
+import argparse
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from eth_abi import decode
+from chain_utils import HYPEREVM_RPC_URL, STABLE_FACTORY_ADDRESS, WEIGHTED_FACTORY_ADDRESS, load_abi
+from rpc_scheduler import BULK, ScheduledHTTPProvider, rpc_priority
+
+# Factories we index PoolCreated from, with the pool kind each one deploys
+FACTORIES = {
+    WEIGHTED_FACTORY_ADDRESS: "weighted",
+    STABLE_FACTORY_ADDRESS: "stable",
+}
+
+# Event signatures (Swap/LiquidityAdded/LiquidityRemoved are emitted by the Balancer v3 Vault,
+# Transfer by the pool itself since the pool is the BPT)
+POOL_CREATED = Web3.keccak(text="PoolCreated(address)")
+SWAP = Web3.keccak(text="Swap(address,address,address,uint256,uint256,uint256,uint256)")
+LIQUIDITY_ADDED = Web3.keccak(text="LiquidityAdded(address,address,uint8,uint256,uint256[],uint256[])")
+LIQUIDITY_REMOVED = Web3.keccak(text="LiquidityRemoved(address,address,uint8,uint256,uint256[],uint256[])")
+TRANSFER = Web3.keccak(text="Transfer(address,address,uint256)")
+
+# Error fragments endpoints use when a getLogs range returns too much data (geth, Alchemy,
+# Infura, QuickNode, Ankr, HyperEVM)
+RANGE_TOO_LARGE_MARKERS = (
+    "block range", "query returned more than", "response size exceeded", "too many logs",
+    "logs matched by query exceeds", "exceed maximum block range", "max results",
+)
+
+# Rate limit errors can mention limits and ranges too, halving the range only makes more requests
+RATE_LIMIT_MARKERS = (
+    "rate limit", "too many requests", "429 client error", "compute units", "request limit", "throughput",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pools (
+    address TEXT PRIMARY KEY,
+    factory TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS swaps (
+    pool TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    token_in TEXT NOT NULL,
+    token_out TEXT NOT NULL,
+    amount_in TEXT NOT NULL,
+    amount_out TEXT NOT NULL,
+    swap_fee_percentage TEXT NOT NULL,
+    swap_fee_amount TEXT NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE TABLE IF NOT EXISTS liquidity (
+    pool TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    kind INTEGER NOT NULL,
+    total_supply TEXT NOT NULL,
+    amounts TEXT NOT NULL,
+    swap_fee_amounts TEXT NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE TABLE IF NOT EXISTS transfers (
+    pool TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    number INTEGER PRIMARY KEY,
+    timestamp INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS progress (
+    name TEXT PRIMARY KEY,
+    block_number INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS swaps_pool_block ON swaps (pool, block_number);
+CREATE INDEX IF NOT EXISTS liquidity_pool_block ON liquidity (pool, block_number);
+CREATE INDEX IF NOT EXISTS transfers_pool_block ON transfers (pool, block_number);
+"""
+
+
+def _address_from_topic(topic):
+    return Web3.to_checksum_address("0x" + bytes(topic)[-20:].hex())
+
+
+def _address_topic(address):
+    return "0x" + "0" * 24 + address[2:].lower()
+
+
+def _is_range_error(error):
+    text = str(error).lower()
+    if any(marker in text for marker in RATE_LIMIT_MARKERS):
+        return False
+    return any(marker in text for marker in RANGE_TOO_LARGE_MARKERS)
+
+
+def get_logs_adaptive(w3, log_filter, from_block, to_block):
+    """eth_getLogs over [from_block, to_block], halving the range whenever the endpoint refuses it"""
+    try:
+        with rpc_priority(BULK):
+            return w3.eth.get_logs({**log_filter, 'fromBlock': from_block, 'toBlock': to_block})
+    except Exception as e:
+        if from_block >= to_block or not _is_range_error(e):
+            raise
+        middle = (from_block + to_block) // 2
+        return (get_logs_adaptive(w3, log_filter, from_block, middle)
+                + get_logs_adaptive(w3, log_filter, middle + 1, to_block))
+
+
+class EventIndexer:
+    """Backfills and tails factory and pool events into a local SQLite database"""
+
+    def __init__(self, w3, db_path="pool_events.db", max_range=1000, workers=8):
+        self.w3 = w3
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(SCHEMA)
+        self.max_range = max_range
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        factory_abi = load_abi("weighted_factory")
+        self.vault_address = w3.eth.contract(
+            address=WEIGHTED_FACTORY_ADDRESS, abi=factory_abi
+        ).functions.getVault().call()
+        print(f"Indexing Vault events from: {self.vault_address}")
+
+    # Fetching
+
+    def fetch_logs(self, log_filter, from_block, to_block):
+        """Split the range into windows and fetch them concurrently, logs come back in chain order"""
+        windows = [
+            (start, min(start + self.max_range - 1, to_block))
+            for start in range(from_block, to_block + 1, self.max_range)
+        ]
+        results = self.executor.map(lambda w: get_logs_adaptive(self.w3, log_filter, w[0], w[1]), windows)
+        logs = [log for window_logs in results for log in window_logs]
+        return sorted(logs, key=lambda log: (log['blockNumber'], log['logIndex']))
+
+    def pools(self):
+        return [row[0] for row in self.db.execute("SELECT address FROM pools ORDER BY block_number")]
+
+    def backfill(self, from_block, to_block):
+        """Index [from_block, to_block]: new pools first, then activity of every known pool"""
+        created = self.fetch_logs(
+            {'address': list(FACTORIES), 'topics': [Web3.to_hex(POOL_CREATED)]},
+            from_block, to_block
+        )
+        self._store_pools(created)
+
+        pools = self.pools()
+        if pools:
+            pool_topics = [_address_topic(p) for p in pools]
+            vault_logs = self.fetch_logs(
+                {'address': self.vault_address,
+                 'topics': [[Web3.to_hex(SWAP), Web3.to_hex(LIQUIDITY_ADDED), Web3.to_hex(LIQUIDITY_REMOVED)], pool_topics]},
+                from_block, to_block
+            )
+            transfer_logs = self.fetch_logs(
+                {'address': pools, 'topics': [Web3.to_hex(TRANSFER)]},
+                from_block, to_block
+            )
+            self._store_vault_logs(vault_logs)
+            self._store_transfers(transfer_logs)
+            self._store_block_timestamps({log['blockNumber'] for log in vault_logs + transfer_logs})
+
+        self.db.execute(
+            "INSERT OR REPLACE INTO progress (name, block_number) VALUES ('indexed', ?)", (to_block,)
+        )
+        self.db.commit()
+        print(f"Indexed blocks {from_block}-{to_block}: {len(created)} new pools, {len(pools)} pools tracked")
+
+    def last_indexed_block(self):
+        row = self.db.execute("SELECT block_number FROM progress WHERE name = 'indexed'").fetchone()
+        return row[0] if row else None
+
+    def tail(self, start_block=None, poll_interval=1.0):
+        """Keep the database in sync with the chain head"""
+        last = self.last_indexed_block()
+        if last is None:
+            last = (start_block or self.w3.eth.block_number) - 1
+        while True:
+            head = self.w3.eth.block_number
+            if head > last:
+                self.backfill(last + 1, head)
+                last = head
+            time.sleep(poll_interval)
+
+    # Decoding and storing
+
+    def _store_pools(self, logs):
+        rows = []
+        for log in logs:
+            pool = _address_from_topic(log['topics'][1])
+            factory = Web3.to_checksum_address(log['address'])
+            rows.append((pool, factory, FACTORIES.get(factory, "unknown"), log['blockNumber'], Web3.to_hex(log['transactionHash'])))
+        self.db.executemany("INSERT OR IGNORE INTO pools VALUES (?, ?, ?, ?, ?)", rows)
+
+    def _store_vault_logs(self, logs):
+        swaps, liquidity = [], []
+        for log in logs:
+            topic0 = bytes(log['topics'][0])
+            pool = _address_from_topic(log['topics'][1])
+            position = (pool, log['blockNumber'], log['logIndex'], Web3.to_hex(log['transactionHash']))
+            if topic0 == bytes(SWAP):
+                amount_in, amount_out, fee_percentage, fee_amount = decode(
+                    ['uint256', 'uint256', 'uint256', 'uint256'], bytes(log['data'])
+                )
+                swaps.append(position + (
+                    _address_from_topic(log['topics'][2]), _address_from_topic(log['topics'][3]),
+                    str(amount_in), str(amount_out), str(fee_percentage), str(fee_amount)
+                ))
+            else:
+                direction = "add" if topic0 == bytes(LIQUIDITY_ADDED) else "remove"
+                total_supply, amounts, swap_fee_amounts = decode(
+                    ['uint256', 'uint256[]', 'uint256[]'], bytes(log['data'])
+                )
+                liquidity.append(position + (
+                    direction, _address_from_topic(log['topics'][2]), int.from_bytes(bytes(log['topics'][3]), 'big'),
+                    str(total_supply), json.dumps([str(a) for a in amounts]), json.dumps([str(a) for a in swap_fee_amounts])
+                ))
+        self.db.executemany("INSERT OR IGNORE INTO swaps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", swaps)
+        self.db.executemany("INSERT OR IGNORE INTO liquidity VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", liquidity)
+
+    def _store_transfers(self, logs):
+        rows = []
+        for log in logs:
+            (value,) = decode(['uint256'], bytes(log['data']))
+            rows.append((
+                Web3.to_checksum_address(log['address']), log['blockNumber'], log['logIndex'], Web3.to_hex(log['transactionHash']),
+                _address_from_topic(log['topics'][1]), _address_from_topic(log['topics'][2]), str(value)
+            ))
+        self.db.executemany("INSERT OR IGNORE INTO transfers VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _store_block_timestamps(self, block_numbers):
+        if not block_numbers:
+            return
+        # Only the batch's block range, a primary key range scan however large the table grows
+        known = {row[0] for row in self.db.execute(
+            "SELECT number FROM blocks WHERE number BETWEEN ? AND ?", (min(block_numbers), max(block_numbers))
+        )}
+        missing = sorted(set(block_numbers) - known)
+
+        def fetch(number):
+            with rpc_priority(BULK):
+                return number, self.w3.eth.get_block(number)['timestamp']
+        self.db.executemany("INSERT OR IGNORE INTO blocks VALUES (?, ?)", list(self.executor.map(fetch, missing)))
+
+    # Queries
+
+    def pool_swaps(self, pool, from_block=0, to_block=None):
+        return self.db.execute(
+            "SELECT * FROM swaps WHERE pool = ? AND block_number BETWEEN ? AND ? ORDER BY block_number, log_index",
+            (pool, from_block, to_block if to_block is not None else 2**62)
+        ).fetchall()
+
+    def pool_liquidity(self, pool, from_block=0, to_block=None):
+        return self.db.execute(
+            "SELECT * FROM liquidity WHERE pool = ? AND block_number BETWEEN ? AND ? ORDER BY block_number, log_index",
+            (pool, from_block, to_block if to_block is not None else 2**62)
+        ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index Balancer pool events on HyperEVM into SQLite')
+    parser.add_argument('--from_block', type=int, default=0, help='First block to backfill from')
+    parser.add_argument('--to_block', type=int, help='Last block to backfill (default: chain head)')
+    parser.add_argument('--db', default='pool_events.db', help='SQLite database path')
+    parser.add_argument('--max_range', type=int, default=1000, help='Blocks per eth_getLogs window')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent eth_getLogs windows')
+    parser.add_argument('--tail', action='store_true', help='Keep following new blocks after the backfill')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    if not w3.is_connected():
+        raise Exception("Failed to connect to Ethereum node")
+
+    indexer = EventIndexer(w3, db_path=args.db, max_range=args.max_range, workers=args.workers)
+    start = indexer.last_indexed_block()
+    start = args.from_block if start is None else start + 1
+    end = args.to_block if args.to_block is not None else w3.eth.block_number
+    # Commit progress every batch of windows so an interrupted backfill resumes where it stopped
+    batch = args.max_range * args.workers * 10
+    for batch_start in range(start, end + 1, batch):
+        indexer.backfill(batch_start, min(batch_start + batch - 1, end))
+    if args.tail:
+        indexer.tail()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+from web3 import Web3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from eth_abi import decode
+from eth_utils.abi import collapse_if_tuple
+from chain_utils import HYPEREVM_RPC_URL, load_abi
+
+try:
+    from pyrevm import EVM, AccountInfo, BlockEnv
+except ImportError:  # optional, only needed to run the simulator
+    EVM = AccountInfo = BlockEnv = None
+
+# Errors raised inside the Vault and by OpenZeppelin tokens, neither ABI ships with the repo
+EXTRA_ERRORS = [
+    "Error(string)",
+    "Panic(uint256)",
+    "SwapLimit(uint256,uint256)",
+    "AmountInAboveMax(address,uint256,uint256)",
+    "AmountOutBelowMin(address,uint256,uint256)",
+    "BptAmountInAboveMax(uint256,uint256)",
+    "BptAmountOutBelowMin(uint256,uint256)",
+    "AmountGivenZero()",
+    "CannotSwapSameToken()",
+    "TradeAmountTooSmall()",
+    "BalanceNotSettled()",
+    "TokenNotRegistered(address)",
+    "PoolNotRegistered(address)",
+    "PoolNotInitialized(address)",
+    "PoolPaused(address)",
+    "VaultPaused()",
+    "PoolNotInRecoveryMode(address)",
+    "ERC20InsufficientBalance(address,uint256,uint256)",
+    "ERC20InsufficientAllowance(address,uint256,uint256)",
+]
+
+# ABIs whose custom errors a router transaction can surface
+ERROR_ABIS = ["router", "weighted_pool", "permit2"]
+
+# Standard precompiles (0x01-0x0a) have no state to load. HyperCore read precompiles
+# (0x0800+) answer from L1 state a local EVM does not have, calls to them cannot be simulated
+PRECOMPILE_LIMIT = 0x0a
+
+
+def _error_selectors():
+    signatures = list(EXTRA_ERRORS)
+    for name in ERROR_ABIS:
+        for item in load_abi(name):
+            if item.get("type") == "error":
+                types = ",".join(collapse_if_tuple(i) for i in item["inputs"])
+                signatures.append(f"{item['name']}({types})")
+    selectors = {}
+    for signature in signatures:
+        types = signature[signature.index("(") + 1:-1]
+        selectors[bytes(Web3.keccak(text=signature)[:4])] = (signature, [t for t in types.split(",") if t])
+    return selectors
+
+
+ERROR_SELECTORS = _error_selectors()
+
+
+def decode_revert(data):
+    """Human readable revert reason, e.g. 'SwapDeadline()' or 'MaxInRatio()' or 'Error(BAL#304)'"""
+    if not data:
+        return "reverted without data"
+    data = bytes(data)
+    entry = ERROR_SELECTORS.get(data[:4])
+    if entry is None:
+        return f"unknown error 0x{data.hex()}"
+    signature, types = entry
+    name = signature[:signature.index("(")]
+    try:
+        args = decode(types, data[4:]) if types else ()
+    except Exception:
+        return f"{signature} 0x{data[4:].hex()}"
+    return f"{name}({', '.join(str(a) for a in args)})"
+
+
+class SimulationResult:
+    """Outcome of a local run: success, gas used, return data or decoded error, balance deltas"""
+
+    def __init__(self, success, gas_used, output, error=None, balance_deltas=None):
+        self.success = success
+        self.gas_used = gas_used
+        self.output = output
+        self.error = error
+        self.balance_deltas = balance_deltas or {}
+
+    def __repr__(self):
+        status = "ok" if self.success else f"reverted: {self.error}"
+        return f"SimulationResult({status}, gas={self.gas_used}, deltas={self.balance_deltas})"
+
+
+class LocalSimulator:
+    """
+    In-process EVM pinned to one block.
+
+    prefetch() asks the node which accounts and storage slots a transaction touches
+    (eth_createAccessList), loads them with eth_getProof/eth_getCode and inserts them
+    in the local EVM. simulate() then runs the transaction locally and rolls the state
+    back, so any number of what-if variants against the same block cost no RPC calls.
+    State the access list missed is still read lazily from rpc_url at the pinned block.
+    """
+
+    def __init__(self, w3, rpc_url=HYPEREVM_RPC_URL, block_number=None, workers=8):
+        if EVM is None:
+            raise Exception("pyrevm is required for local simulation, install it with: pip install pyrevm")
+        self.w3 = w3
+        block = w3.eth.get_block(block_number if block_number is not None else 'latest')
+        self.block_number = block.number
+        self.timestamp = block.timestamp
+        self.evm = EVM(fork_url=rpc_url, fork_block=str(self.block_number))
+        self.evm.set_block_env(BlockEnv(number=block.number, timestamp=block.timestamp))
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.loaded = {}   # address -> set of loaded slots
+        self.erc20_abi = load_abi("erc20")
+
+    def _load_account(self, address, slots):
+        proof = self.w3.eth.get_proof(address, slots, self.block_number)
+        code = self.w3.eth.get_code(address, self.block_number)
+        return address, proof, bytes(code)
+
+    def prefetch(self, transaction):
+        """Load every account and storage slot the transaction reads at the pinned block"""
+        call = {k: transaction[k] for k in ("from", "to", "data", "value") if k in transaction}
+        response = self.w3.manager.request_blocking("eth_createAccessList", [call, hex(self.block_number)])
+        wanted = {Web3.to_checksum_address(call["from"]): set(), Web3.to_checksum_address(call["to"]): set()}
+        for entry in response["accessList"]:
+            address = Web3.to_checksum_address(entry["address"])
+            if int(address, 16) <= PRECOMPILE_LIMIT:
+                continue
+            wanted.setdefault(address, set()).update(Web3.to_hex(k) for k in entry["storageKeys"])
+
+        missing = {a: sorted(s - self.loaded.get(a, set())) for a, s in wanted.items()
+                   if a not in self.loaded or s - self.loaded[a]}
+        loaded = self.executor.map(lambda item: self._load_account(*item), missing.items())
+        for address, proof, code in loaded:
+            self.evm.insert_account_info(address, AccountInfo(balance=proof.balance, nonce=proof.nonce, code=code))
+            for slot in proof.storageProof:
+                self.evm.insert_account_storage(address, int(Web3.to_hex(slot.key), 16), slot.value)
+            self.loaded.setdefault(address, set()).update(missing[address])
+        return len(missing)
+
+    def _balance_of(self, token, owner):
+        data = self.w3.eth.contract(address=token, abi=self.erc20_abi).functions.balanceOf(owner)._encode_transaction_data()
+        return int.from_bytes(self.evm.message_call(owner, token, calldata=bytes.fromhex(data[2:])), "big")
+
+    def simulate(self, transaction, tokens=(), prefetch=None):
+        """
+        Run the transaction on the local EVM and roll it back.
+        tokens are ERC20s whose balance change for the sender is reported ("native" for HYPE/ETH).
+        prefetch defaults to only the first run against a target, variants after that find the
+        state warm and whatever they touch beyond it is read lazily.
+        """
+        if prefetch is None:
+            prefetch = Web3.to_checksum_address(transaction["to"]) not in self.loaded
+        if prefetch:
+            self.prefetch(transaction)
+        sender = Web3.to_checksum_address(transaction["from"])
+        data = transaction.get("data", "0x")
+        calldata = bytes.fromhex(data[2:]) if isinstance(data, str) else bytes(data)
+
+        checkpoint = self.evm.snapshot()
+        try:
+            before = {t: self._balance_of(t, sender) for t in tokens}
+            native_before = self.evm.get_balance(sender)
+            try:
+                output = self.evm.message_call(
+                    sender, transaction["to"], calldata=calldata, value=transaction.get("value", 0)
+                )
+            except RuntimeError as e:
+                return SimulationResult(False, self._gas_used(), None, decode_revert(_revert_data(e)))
+            gas_used = self._gas_used()
+            deltas = {t: self._balance_of(t, sender) - before[t] for t in tokens}
+            deltas["native"] = self.evm.get_balance(sender) - native_before
+            return SimulationResult(True, gas_used, bytes(output), balance_deltas=deltas)
+        finally:
+            self.evm.revert(checkpoint)
+
+    def _gas_used(self):
+        result = self.evm.result
+        return result.gas_used if result is not None else None
+
+
+def _revert_data(error):
+    """pyrevm reports reverts as RuntimeError('Revert { gas_used: .., output: 0x.. }')"""
+    message = str(error)
+    marker = "output: 0x"
+    if marker not in message:
+        return b""
+    hex_data = message[message.index(marker) + len(marker):].split()[0].rstrip("},")
+    return bytes.fromhex(hex_data)
+
+
+def simulate_transaction(w3, transaction, tokens=(), rpc_url=HYPEREVM_RPC_URL):
+    """One-shot simulation at the latest block"""
+    start = time.time()
+    result = LocalSimulator(w3, rpc_url).simulate(transaction, tokens)
+    print(f"Simulated locally in {(time.time() - start) * 1000:.0f} ms: {result}")
+    return result
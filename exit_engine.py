@@ -0,0 +1,394 @@
+from web3 import Web3
+import argparse
+import os
+from decimal import Decimal
+from eth_account import Account
+from dotenv import load_dotenv
+import pool_math
+from chain_clock import ChainClock
+from chain_utils import (
+    HYPEREVM_RPC_URL, KNOWN_POOLS, PERMIT2_ADDRESS, ROUTER_ADDRESS, TOKENS, WEIGHTED_FACTORY_ADDRESS,
+    encode_calldata, load_abi
+)
+from multicall import batch_call_with_block
+from pool_math import PoolMathError
+from pool_registry import indexed_pools
+from pool_state import pool_state_calls, pool_state_from_results, pool_static_info
+from rpc_scheduler import ScheduledHTTPProvider
+from signing_service import erc2612_permit_typed_data, permit2_batch_typed_data
+
+load_dotenv()
+
+# Only the Vault getter the exit engine needs, the Vault ABI is not shipped with the repo
+VAULT_ABI = [
+    {
+        "inputs": [{"internalType": "address", "name": "pool", "type": "address"}],
+        "name": "isPoolInRecoveryMode",
+        "outputs": [{"internalType": "bool", "name": "", "type": "bool"}],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+# Gas budget per router call inside permitBatchAndCall
+GAS_PER_CALL = 250000
+
+
+class Position:
+    """A wallet's BPT in one pool, with everything needed to quote and permit the exit"""
+
+    def __init__(self, state, bpt_balance, permit_nonce, domain_name, domain_version, recovery_mode):
+        self.state = state
+        self.bpt_balance = bpt_balance
+        self.permit_nonce = permit_nonce
+        self.domain_name = domain_name
+        self.domain_version = domain_version
+        self.recovery_mode = recovery_mode
+
+    @property
+    def pool(self):
+        return self.state.address
+
+
+class ExitQuote:
+    """
+    One way out of a position. amounts_out is what the wallet ends up holding per pool
+    token, swaps are (token_in, amount_in, amount_out) trades back into token_out
+    in the same pool after a proportional or recovery exit.
+    """
+
+    def __init__(self, kind, pool, bpt_in, amounts_out, token_out=None, swaps=None):
+        self.kind = kind
+        self.pool = pool
+        self.bpt_in = bpt_in
+        self.amounts_out = amounts_out
+        self.token_out = token_out
+        self.swaps = swaps or []
+        self.value = 0.0
+
+    def __repr__(self):
+        swaps = f" + {len(self.swaps)} swap(s)" if self.swaps else ""
+        return f"ExitQuote({self.kind}{swaps}, {self.pool}, bpt={self.bpt_in}, out={self.amounts_out})"
+
+
+def _vault_address(w3):
+    factory = w3.eth.contract(address=WEIGHTED_FACTORY_ADDRESS, abi=load_abi("weighted_factory"))
+    return factory.functions.getVault().call()
+
+
+def read_fleet_positions(w3, wallets, pools, vault_address=None):
+    """
+    BPT balances and permit nonces of every wallet in every pool, plus the pool states,
+    EIP-712 domains and recovery mode, in one batched read.
+    Returns {wallet: [Position]}, pools where a wallet holds no BPT are dropped.
+    """
+    vault = w3.eth.contract(address=vault_address or _vault_address(w3), abi=VAULT_ABI)
+    statics, calls, layout = {}, [], []
+    for pool in pools:
+        try:
+            statics[pool] = pool_static_info(w3, pool, KNOWN_POOLS.get(pool))
+        except Exception as e:
+            print(f"Skipping pool {pool}: {e}")
+            continue
+        pool_contract = w3.eth.contract(address=pool, abi=load_abi("weighted_pool"))
+        state_calls = pool_state_calls(w3, pool, statics[pool])
+        layout.append((pool, len(state_calls)))
+        calls += state_calls + [pool_contract.functions.eip712Domain(), vault.functions.isPoolInRecoveryMode(pool)]
+        for wallet in wallets:
+            calls += [pool_contract.functions.balanceOf(wallet), pool_contract.functions.nonces(wallet)]
+
+    block_number, results = batch_call_with_block(w3, calls)
+    positions, offset = {wallet: [] for wallet in wallets}, 0
+    for pool, state_count in layout:
+        state_results = results[offset:offset + state_count]
+        domain, recovery = results[offset + state_count:offset + state_count + 2]
+        offset += state_count + 2
+        wallet_results = results[offset:offset + 2 * len(wallets)]
+        offset += 2 * len(wallets)
+        if not any(wallet_results[::2]):
+            continue
+        state = pool_state_from_results(pool, statics[pool], state_results, block_number)
+        _fields, name, version = domain[:3]
+        for wallet, balance, nonce in zip(wallets, wallet_results[::2], wallet_results[1::2]):
+            if balance:
+                positions[wallet].append(Position(state, balance, nonce, name, version, bool(recovery)))
+    return positions
+
+
+def read_positions(w3, wallet, pools, vault_address=None):
+    """A single wallet's positions, see read_fleet_positions"""
+    return read_fleet_positions(w3, [wallet], pools, vault_address)[wallet]
+
+
+def _quote_proportional(state, bpt_in):
+    amounts_scaled = pool_math.proportional_amounts_out(state.balances_live, state.total_supply, bpt_in)
+    return [state.to_raw(i, a) for i, a in enumerate(amounts_scaled)]
+
+
+def _quote_recovery(state, bpt_in):
+    # Recovery mode works on raw balances, without rates, hooks or fees
+    return pool_math.proportional_amounts_out(state.balances_raw, state.total_supply, bpt_in)
+
+
+def _quote_single_token(state, bpt_in, token_index):
+    amount_scaled, _fee = pool_math.remove_liquidity_single_token_exact_in(
+        state, state.balances_live, token_index, bpt_in, state.total_supply, state.swap_fee
+    )
+    return state.to_raw(token_index, amount_scaled)
+
+
+def _after_exit(state, bpt_in, amounts_out):
+    after = state.copy()
+    after.balances_raw = [b - a for b, a in zip(after.balances_raw, amounts_out)]
+    after.total_supply -= bpt_in
+    return after
+
+
+def _swap_into(state, amounts, token_out):
+    """Swap every other token back into token_out in the same pool, returns (final amounts, swaps)"""
+    o = state.index(token_out)
+    amounts, swaps = list(amounts), []
+    for i, token in enumerate(state.tokens):
+        if i == o or amounts[i] == 0:
+            continue
+        amount_out = state.quote_exact_in(token, token_out, amounts[i])
+        state.apply_swap(token, token_out, amounts[i], amount_out)
+        swaps.append((token, amounts[i], amount_out))
+        amounts[o] += amount_out
+        amounts[i] = 0
+    return amounts, swaps
+
+
+def _value(state, amounts, reference):
+    """Value of raw amounts in raw units of the reference token, at the pool spot price"""
+    r = state.index(reference)
+    total = 0.0
+    for i, amount in enumerate(amounts):
+        if i == r:
+            total += amount
+        else:
+            price = state.spot_price(state.tokens[i], reference)
+            total += amount / 10 ** state.decimals[i] * price * 10 ** state.decimals[r]
+    return total
+
+
+def quote_exits(position, bpt_in, token_out=None):
+    """Every exit kind available for the position, valued at the pool's pre-exit spot price"""
+    state = position.state
+    # A token_out the pool does not hold is left to a later swap, the exit keeps the pool tokens
+    token_out = token_out if token_out and state.has_tokens(token_out) else None
+    reference = token_out or state.tokens[0]
+    quotes = []
+
+    candidates = [("proportional", _quote_proportional)]
+    if position.recovery_mode:
+        candidates.append(("recovery", _quote_recovery))
+    for kind, quote in candidates:
+        try:
+            amounts = quote(state, bpt_in)
+            swaps = []
+            if token_out is not None:
+                amounts, swaps = _swap_into(_after_exit(state, bpt_in, amounts), amounts, token_out)
+            quotes.append(ExitQuote(kind, state.address, bpt_in, amounts, token_out, swaps))
+        except PoolMathError:
+            continue
+
+    # Single token exits use pool math, which a paused or recovery-mode pool does not run
+    if token_out is not None and not position.recovery_mode:
+        o = state.index(token_out)
+        try:
+            amounts = [0] * len(state.tokens)
+            amounts[o] = _quote_single_token(state, bpt_in, o)
+            quotes.append(ExitQuote("single", state.address, bpt_in, amounts, token_out))
+        except PoolMathError:
+            pass
+
+    for q in quotes:
+        q.value = _value(state, q.amounts_out, reference)
+    return quotes
+
+
+def best_exit(position, bpt_in, token_out=None):
+    """The exit that leaves the most value in the wallet (fewer calls wins a tie)"""
+    quotes = quote_exits(position, bpt_in, token_out)
+    if not quotes:
+        raise PoolMathError(f"No exit available for pool {position.pool}")
+    return max(quotes, key=lambda q: (q.value, -len(q.swaps)))
+
+
+def _min(amount, slippage):
+    return int(Decimal(amount) * (1 - slippage))
+
+
+def build_exit_calls(router_contract, position, quote, slippage, deadline):
+    """Router calls for one exit, returns (calls, {token: amount pulled through Permit2})"""
+    state = position.state
+    if quote.kind == "single":
+        o = state.index(quote.token_out)
+        calls = [encode_calldata(router_contract.functions.removeLiquiditySingleTokenExactIn(
+            state.address, quote.bpt_in, quote.token_out, _min(quote.amounts_out[o], slippage), False, '0x'
+        ))]
+        return calls, {}
+
+    exit_amounts = (_quote_proportional if quote.kind == "proportional" else _quote_recovery)(state, quote.bpt_in)
+    min_amounts = [_min(a, slippage) for a in exit_amounts]
+    if quote.kind == "recovery":
+        calls = [encode_calldata(router_contract.functions.removeLiquidityRecovery(
+            state.address, quote.bpt_in, min_amounts
+        ))]
+    else:
+        calls = [encode_calldata(router_contract.functions.removeLiquidityProportional(
+            state.address, quote.bpt_in, min_amounts, False, '0x'
+        ))]
+
+    # Swaps spend the guaranteed minimum of each exit amount, so they never pull more than arrived
+    spend = {}
+    for token, _amount_in, amount_out in quote.swaps:
+        amount_in = min_amounts[state.index(token)]
+        calls.append(encode_calldata(router_contract.functions.swapSingleTokenExactIn(
+            state.address, token, quote.token_out, amount_in, _min(amount_out, slippage * 2), deadline, False, '0x'
+        )))
+        spend[token] = spend.get(token, 0) + amount_in
+    return calls, spend
+
+
+class ExitEngine:
+    """Quote, permit and send exits from many pools as one permitBatchAndCall"""
+
+    def __init__(self, w3, account, router_address=ROUTER_ADDRESS, slippage=Decimal('0.005'), chain_id=None):
+        self.w3 = w3
+        self.account = account
+        self.router_address = router_address
+        self.router_contract = w3.eth.contract(address=router_address, abi=load_abi("router"))
+        self.slippage = slippage
+        self.chain_id = chain_id if chain_id is not None else w3.eth.chain_id
+
+    def plan(self, positions, token_out=None, fraction=Decimal(1)):
+        """Best exit per position for `fraction` of its BPT"""
+        plans = []
+        for position in positions:
+            bpt_in = int(Decimal(position.bpt_balance) * fraction)
+            if bpt_in == 0:
+                continue
+            try:
+                plans.append((position, best_exit(position, bpt_in, token_out)))
+            except PoolMathError as e:
+                print(f"Skipping pool {position.pool}: {e}")
+        return plans
+
+    def sign_bpt_permit(self, position, amount, deadline):
+        permit = {
+            "token": position.pool,
+            "owner": self.account.address,
+            "spender": self.router_address,
+            "amount": amount,
+            "nonce": position.permit_nonce,
+            "deadline": deadline
+        }
+        typed_data = erc2612_permit_typed_data(
+            self.chain_id, position.pool, position.domain_name, position.domain_version, permit
+        )
+        signed = self.account.sign_typed_data(
+            domain_data=typed_data["domain"],
+            message_types=typed_data["types"],
+            message_data=typed_data["message"]
+        )
+        return permit, signed.signature
+
+    def build_transaction(self, plans, deadline, nonce=None, gas_price=None):
+        """One permitBatchAndCall: a BPT permit per pool, one Permit2 batch for the swaps, all exit calls"""
+        permits, signatures, calls, spend = [], [], [], {}
+        for position, quote in plans:
+            permit, signature = self.sign_bpt_permit(position, quote.bpt_in, deadline)
+            permits.append(permit)
+            signatures.append(signature)
+            exit_calls, exit_spend = build_exit_calls(self.router_contract, position, quote, self.slippage, deadline)
+            calls += exit_calls
+            for token, amount in exit_spend.items():
+                spend[token] = spend.get(token, 0) + amount
+
+        permit2_batch = {"details": [], "spender": self.router_address, "sigDeadline": deadline}
+        permit2_signature = b''
+        if spend:
+            permit2_contract = self.w3.eth.contract(address=PERMIT2_ADDRESS, abi=load_abi("permit2"))
+            for token, amount in spend.items():
+                _amount, _expiration, permit2_nonce = permit2_contract.functions.allowance(
+                    self.account.address, token, self.router_address
+                ).call()
+                permit2_batch["details"].append(
+                    {"token": token, "amount": amount, "expiration": deadline, "nonce": permit2_nonce}
+                )
+            typed_data = permit2_batch_typed_data(self.chain_id, permit2_batch)
+            permit2_signature = self.account.sign_typed_data(
+                domain_data=typed_data["domain"],
+                message_types=typed_data["types"],
+                message_data=typed_data["message"]
+            ).signature
+
+        return self.router_contract.functions.permitBatchAndCall(
+            permits, signatures, permit2_batch, permit2_signature, calls
+        ).build_transaction({
+            "from": self.account.address,
+            "chainId": self.chain_id,
+            "gas": GAS_PER_CALL * len(calls),
+            "gasPrice": gas_price if gas_price is not None else self.w3.eth.gas_price,
+            "nonce": nonce if nonce is not None else self.w3.eth.get_transaction_count(self.account.address)
+        })
+
+    def exit(self, plans, deadline):
+        transaction = self.build_transaction(plans, deadline)
+        signed_tx = self.account.sign_transaction(transaction)
+        return self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+
+
+def _token_address(value):
+    return Web3.to_checksum_address(TOKENS.get(value, value))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exit BPT positions across pools in one transaction')
+    parser.add_argument('--pools', nargs='*', help='Pool addresses (default: known and indexed pools)')
+    parser.add_argument('--token_out', help='Token symbol or address to end up in (default: keep pool tokens)')
+    parser.add_argument('--fraction', type=Decimal, default=Decimal(1), help='Share of each position to exit')
+    parser.add_argument('--slippage', type=Decimal, default=Decimal('0.005'), help='Allowed slippage')
+    parser.add_argument('--deadline', type=int, default=600, help='Deadline in seconds from now')
+    parser.add_argument('--dry_run', action='store_true', help='Only print the exit plan')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    if not w3.is_connected():
+        raise Exception("Failed to connect to Ethereum node")
+
+    private_key = os.getenv("PRIVATE_KEY")
+    if not private_key:
+        raise Exception("Private key not found in environment variables")
+    account = Account.from_key(private_key)
+    print(f"Using wallet: {account.address}")
+
+    if args.pools:
+        pools = [Web3.to_checksum_address(p) for p in args.pools]
+    else:
+        pools = list(dict.fromkeys([*KNOWN_POOLS, *(Web3.to_checksum_address(p) for p in indexed_pools())]))
+    positions = read_positions(w3, account.address, pools)
+    if not positions:
+        print("No BPT positions found")
+        return
+
+    token_out = _token_address(args.token_out) if args.token_out else None
+    engine = ExitEngine(w3, account, slippage=args.slippage)
+    plans = engine.plan(positions, token_out, args.fraction)
+    for position, quote in plans:
+        print(f"  {quote} value {quote.value:.0f}")
+    if args.dry_run or not plans:
+        return
+
+    clock = ChainClock(w3)
+    clock.sync()
+    tx_hash = engine.exit(plans, clock.deadline(args.deadline))
+    print(f"Transaction sent! Hash: {tx_hash.hex()}")
+    tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    print(f"Transaction status: {'Successful' if tx_receipt.status == 1 else 'Failed'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+from web3 import Web3
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from eth_account import Account
+from eth_account.messages import encode_typed_data
+from dotenv import load_dotenv
+
+try:
+    import msgpack
+except ImportError:  # only needed to hash L1 actions
+    msgpack = None
+
+load_dotenv()
+
+HYPERCORE_MAINNET_URL = "https://api.hyperliquid.xyz"
+HYPERCORE_TESTNET_URL = "https://api.hyperliquid-testnet.xyz"
+
+# L1 actions are signed as an EIP-712 "phantom agent" whose connectionId is the action hash
+L1_DOMAIN = {
+    "chainId": 1337,
+    "name": "Exchange",
+    "verifyingContract": "0x0000000000000000000000000000000000000000",
+    "version": "1",
+}
+AGENT_TYPES = {
+    "Agent": [
+        {"name": "source", "type": "string"},
+        {"name": "connectionId", "type": "bytes32"},
+    ]
+}
+# The exchange rejects nonces older than this (ms) relative to its clock
+NONCE_WINDOW_MS = 2 * 24 * 3600 * 1000
+
+
+def action_hash(action, nonce, vault_address=None, expires_after=None):
+    """keccak(msgpack(action) | nonce | vault flag [| vault] [| 0 | expiresAfter])"""
+    if msgpack is None:
+        raise Exception("msgpack is required to sign HyperCore actions, install it with: pip install msgpack")
+    data = msgpack.packb(action)
+    data += nonce.to_bytes(8, "big")
+    if vault_address is None:
+        data += b"\x00"
+    else:
+        data += b"\x01" + bytes.fromhex(vault_address[2:].lower())
+    if expires_after is not None:
+        data += b"\x00" + expires_after.to_bytes(8, "big")
+    return Web3.keccak(data)
+
+
+def l1_typed_data(connection_id, is_mainnet=True):
+    return {
+        "domain": L1_DOMAIN,
+        "types": AGENT_TYPES,
+        "primaryType": "Agent",
+        "message": {"source": "a" if is_mainnet else "b", "connectionId": bytes(connection_id)},
+    }
+
+
+def sign_l1_action(account, action, nonce, is_mainnet=True, vault_address=None, expires_after=None):
+    typed_data = l1_typed_data(action_hash(action, nonce, vault_address, expires_after), is_mainnet)
+    signed = account.sign_typed_data(
+        domain_data=typed_data["domain"],
+        message_types=typed_data["types"],
+        message_data=typed_data["message"]
+    )
+    return {"r": Web3.to_hex(signed.r), "s": Web3.to_hex(signed.s), "v": signed.v}
+
+
+def recover_l1_signer(action, nonce, signature, is_mainnet=True, vault_address=None, expires_after=None):
+    typed_data = l1_typed_data(action_hash(action, nonce, vault_address, expires_after), is_mainnet)
+    message = encode_typed_data(
+        domain_data=typed_data["domain"],
+        message_types=typed_data["types"],
+        message_data=typed_data["message"]
+    )
+    return Account.recover_message(message, vrs=(signature["v"], int(signature["r"], 16), int(signature["s"], 16)))
+
+
+def evm_user_modify(using_big_blocks):
+    """Action toggling which HyperEVM block size the user's transactions go to"""
+    return {"type": "evmUserModify", "usingBigBlocks": bool(using_big_blocks)}
+
+
+class ActionNonces:
+    """Millisecond nonces, strictly increasing per signer even when many are taken at once"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last = 0
+
+    def take(self):
+        with self.lock:
+            self.last = max(self.last + 1, int(time.time() * 1000))
+            return self.last
+
+
+class HyperCoreClient:
+    """
+    Signs and submits HyperCore L1 actions for one account.
+
+    submit() sends one action. batch() signs several with consecutive nonces and posts
+    them in order over one keep-alive session, each after the previous one is answered
+    (the exchange takes one action per request). Only actions that do not depend on each
+    other should be batched with concurrent=True, the exchange may apply them in any order.
+    """
+
+    def __init__(self, private_key=None, base_url=HYPERCORE_MAINNET_URL, is_mainnet=None, vault_address=None,
+                 max_workers=4):
+        private_key = private_key or os.getenv("PRIVATE_KEY")
+        if not private_key:
+            raise Exception("Private key not found in environment variables")
+        self.account = Account.from_key(private_key)
+        self.address = self.account.address
+        self.base_url = base_url.rstrip("/")
+        self.is_mainnet = base_url == HYPERCORE_MAINNET_URL if is_mainnet is None else is_mainnet
+        self.vault_address = vault_address
+        self.nonces = ActionNonces()
+        self.session = requests.Session()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _payload(self, action):
+        nonce = self.nonces.take()
+        signature = sign_l1_action(self.account, action, nonce, self.is_mainnet, self.vault_address)
+        return {"action": action, "nonce": nonce, "signature": signature, "vaultAddress": self.vault_address}
+
+    def _post(self, payload):
+        response = self.session.post(f"{self.base_url}/exchange", json=payload, timeout=10)
+        response.raise_for_status()
+        result = response.json()
+        if result.get("status") != "ok":
+            raise Exception(f"HyperCore rejected {payload['action']['type']}: {result.get('response')}")
+        return result
+
+    def submit(self, action):
+        return self._post(self._payload(action))
+
+    def batch(self, actions, concurrent=False):
+        """Sign every action (consecutive nonces) then send them in order, or concurrently; results in order"""
+        payloads = [self._payload(action) for action in actions]
+        if not concurrent:
+            results = []
+            for payload in payloads:
+                try:
+                    results.append(self._post(payload))
+                except Exception as e:
+                    results.append(e)
+            return results
+        futures = [self.pool.submit(self._post, payload) for payload in payloads]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def set_big_blocks(self, using_big_blocks=True):
+        return self.submit(evm_user_modify(using_big_blocks))
+
+
+class LocalExchange:
+    """
+    Stand-in for the /exchange endpoint: checks the signature and nonce like the real
+    exchange and keeps the resulting user state, so clients can be exercised offline.
+    """
+
+    def __init__(self, is_mainnet=True):
+        self.is_mainnet = is_mainnet
+        self.used_nonces = {}    # signer -> set of nonces
+        self.users = {}          # signer -> {"usingBigBlocks": bool}
+        self.actions = []
+        self.lock = threading.Lock()
+
+    def handle(self, payload):
+        action, nonce = payload["action"], payload["nonce"]
+        signer = recover_l1_signer(action, nonce, payload["signature"], self.is_mainnet, payload.get("vaultAddress"))
+        with self.lock:
+            if abs(nonce - int(time.time() * 1000)) > NONCE_WINDOW_MS:
+                return {"status": "err", "response": "Nonce outside the allowed window"}
+            used = self.used_nonces.setdefault(signer, set())
+            if nonce in used:
+                return {"status": "err", "response": "Nonce already used"}
+            used.add(nonce)
+            if action.get("type") == "evmUserModify":
+                self.users.setdefault(signer, {})["usingBigBlocks"] = bool(action["usingBigBlocks"])
+            else:
+                return {"status": "err", "response": f"Unsupported action {action.get('type')}"}
+            self.actions.append((signer, action, nonce))
+        return {"status": "ok", "response": {"type": "default"}}
+
+
+class LocalExchangeHandler(BaseHTTPRequestHandler):
+    exchange = None
+
+    def _reply(self, code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/exchange":
+                self._reply(200, self.exchange.handle(body))
+            else:
+                self._reply(404, {"error": "not found"})
+        except Exception as e:
+            self._reply(400, {"status": "err", "response": str(e)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_local_exchange(port=0, is_mainnet=True):
+    """Start the stand-in exchange in a thread, returns (server, base_url), state in server.exchange"""
+    exchange = LocalExchange(is_mainnet)
+    handler = type("Handler", (LocalExchangeHandler,), {"exchange": exchange})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.exchange = exchange
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def set_big_block_flag(private_key, using_big_blocks=True, base_url=HYPERCORE_MAINNET_URL):
+    """What the deploy scripts call before sending big-block transactions"""
+    try:
+        client = HyperCoreClient(private_key, base_url)
+        client.set_big_blocks(using_big_blocks)
+        print(f"HyperCore usingBigBlocks={using_big_blocks} set for {client.address}")
+        return True
+    except Exception as e:
+        print(f"Failed to set big block flag: {e}")
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sign and send HyperCore evmUserModify')
+    parser.add_argument('--big_blocks', choices=['on', 'off'], required=True, help='Send transactions to big blocks')
+    parser.add_argument('--testnet', action='store_true', help='Use the HyperCore testnet API')
+    parser.add_argument('--local', action='store_true', help='Send to a local stand-in exchange instead')
+    args = parser.parse_args()
+
+    if args.local:
+        server, base_url = serve_local_exchange(is_mainnet=not args.testnet)
+    else:
+        base_url = HYPERCORE_TESTNET_URL if args.testnet else HYPERCORE_MAINNET_URL
+    client = HyperCoreClient(base_url=base_url, is_mainnet=not args.testnet)
+    print(json.dumps(client.set_big_blocks(args.big_blocks == 'on')))
+    if args.local:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
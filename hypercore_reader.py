@@ -0,0 +1,169 @@
+from web3 import Web3
+import argparse
+import threading
+import time
+from decimal import Decimal
+from eth_abi import encode
+from chain_utils import HYPEREVM_RPC_URL, TOKENS
+from multicall import MULTICALL3_ADDRESS, raw_batch_call
+from rpc_scheduler import ScheduledHTTPProvider
+from token_amount import get_tokens
+
+# HyperCore read precompiles, called with the abi-encoded arguments (no selector)
+SPOT_BALANCE_PRECOMPILE = "0x0000000000000000000000000000000000000801"
+MARK_PX_PRECOMPILE = "0x0000000000000000000000000000000000000806"
+ORACLE_PX_PRECOMPILE = "0x0000000000000000000000000000000000000807"
+SPOT_PX_PRECOMPILE = "0x0000000000000000000000000000000000000808"
+
+# query kind -> (precompile, argument types, output types)
+QUERIES = {
+    "markPx": (MARK_PX_PRECOMPILE, ["uint32"], ["uint64"]),
+    "oraclePx": (ORACLE_PX_PRECOMPILE, ["uint32"], ["uint64"]),
+    "spotPx": (SPOT_PX_PRECOMPILE, ["uint32"], ["uint64"]),
+    "spotBalance": (SPOT_BALANCE_PRECOMPILE, ["address", "uint64"], ["(uint64,uint64,uint64)"]),
+}
+
+# Where the USD price of our EVM tokens comes from: ("usd",) for dollar stables,
+# ("oraclePx", perp index, szDecimals) or ("spotPx", spot index, base szDecimals)
+PRICE_SOURCES = {
+    TOKENS["USDT"]: ("usd",),
+    TOKENS["feUSD"]: ("usd",),
+    TOKENS["UETH"]: ("oraclePx", 1, 4),   # ETH perp oracle price
+}
+
+_GET_BLOCK_NUMBER = Web3.keccak(text="getBlockNumber()")[:4]
+
+
+def scale_price(kind, raw, sz_decimals):
+    """Precompile prices have 6 (perp) or 8 (spot) minus szDecimals decimals"""
+    decimals = (8 if kind == "spotPx" else 6) - sz_decimals
+    return Decimal(raw) / (Decimal(10) ** decimals)
+
+
+class HyperCoreReader:
+    """
+    Batched HyperCore reads through the EVM precompiles.
+
+    Every lookup for a block goes into one aggregate3 call (plus getBlockNumber so the
+    results are tagged with the block they were read at). Results are cached for that
+    block: later reads at the same block only fetch what is missing, the first read at a
+    newer block drops the cache. Reads at 'latest' (block_number None) use the cache while
+    it is younger than max_age seconds, about a small block.
+    """
+
+    def __init__(self, w3, price_sources=None, max_age=1.0):
+        self.w3 = w3
+        self.price_sources = dict(PRICE_SOURCES if price_sources is None else price_sources)
+        self.max_age = max_age
+        self.cache = {}
+        self.cache_block = None
+        self.cache_time = 0.0
+        self.lock = threading.Lock()
+
+    def read(self, queries, block_number=None):
+        """
+        queries: ("oraclePx", index), ("markPx", index), ("spotPx", index) or
+        ("spotBalance", user, token index). Returns {query: value} (None when the call failed).
+        """
+        queries = [tuple(q) for q in queries]
+        with self.lock:
+            if block_number is None and time.monotonic() - self.cache_time < self.max_age:
+                block_number = self.cache_block
+            if block_number is not None and block_number == self.cache_block:
+                missing = [q for q in dict.fromkeys(queries) if q not in self.cache]
+            else:
+                missing = list(dict.fromkeys(queries))
+        if missing:
+            requests = []
+            for kind, *args in missing:
+                target, arg_types, output_types = QUERIES[kind]
+                requests.append((target, encode(arg_types, args), output_types))
+            requests.append((MULTICALL3_ADDRESS, _GET_BLOCK_NUMBER, ["uint256"]))
+            results = raw_batch_call(self.w3, requests, 'latest' if block_number is None else block_number)
+            read_block = results[-1]
+            with self.lock:
+                if read_block != self.cache_block:
+                    self.cache = {}
+                    self.cache_block = read_block
+                    self.cache_time = time.monotonic()
+                self.cache.update(zip(missing, results[:-1]))
+        with self.lock:
+            return {q: self.cache.get(q) for q in queries}
+
+    def usd_prices(self, tokens, block_number=None):
+        """{token: Decimal USD price} for EVM tokens with a configured price source, one batched read"""
+        lookups = {}
+        for token in tokens:
+            source = self.price_sources.get(token)
+            if source is None:
+                raise Exception(f"No HyperCore price source configured for {token}")
+            if source[0] != "usd":
+                lookups[token] = (source[0], source[1])
+        values = self.read(list(lookups.values()), block_number)
+        prices = {}
+        for token in tokens:
+            source = self.price_sources[token]
+            if source[0] == "usd":
+                prices[token] = Decimal(1)
+                continue
+            raw = values[lookups[token]]
+            if not raw:
+                raise Exception(f"HyperCore {source[0]} {source[1]} returned no price")
+            prices[token] = scale_price(source[0], raw, source[2])
+        return prices
+
+    def spot_balances(self, user, token_indices, block_number=None):
+        """{token index: (total, hold, entryNtl)} of a HyperCore spot account"""
+        user = Web3.to_checksum_address(user)
+        values = self.read([("spotBalance", user, i) for i in token_indices], block_number)
+        return {i: values[("spotBalance", user, i)] for i in token_indices}
+
+    def fair_amount_out(self, token_in, token_out, amount_in, block_number=None):
+        """Raw amount of token_out worth raw amount_in of token_in at HyperCore prices"""
+        prices = self.usd_prices([token_in, token_out], block_number)
+        info_in, info_out = get_tokens(self.w3, [token_in, token_out])
+        value = info_in.to_human(amount_in) * prices[token_in]
+        return int(value / prices[token_out] * info_out.scale)
+
+    def min_amount_out(self, token_in, token_out, amount_in, slippage=Decimal('0.005'), block_number=None,
+                       state=None):
+        """
+        Swap limit: fair value less the slippage tolerance. With the PoolState the swap goes
+        through, the pool fee and the quoted price impact are taken off the fair value first,
+        so the tolerance is only spent on price moves.
+        """
+        fair = Decimal(self.fair_amount_out(token_in, token_out, amount_in, block_number))
+        if state is not None:
+            info_in, info_out = get_tokens(self.w3, [token_in, token_out])
+            spot_out = info_in.to_human(amount_in) * Decimal(state.spot_price(token_in, token_out)) * info_out.scale
+            if spot_out > 0:
+                fair *= min(Decimal(state.quote_exact_in(token_in, token_out, amount_in)) / spot_out, Decimal(1))
+        return int(fair * (1 - Decimal(slippage)))
+
+    def price_ratio(self, token_a, token_b, block_number=None):
+        """Units of token_b per unit of token_a (what a 50/50 pool of the pair should hold per unit)"""
+        prices = self.usd_prices([token_a, token_b], block_number)
+        return prices[token_a] / prices[token_b]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show HyperCore reference prices for our tokens')
+    parser.add_argument('--user', help='Also show HyperCore spot balances of this address')
+    parser.add_argument('--token_indices', default='0', help='Comma separated HyperCore token indices for --user')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    reader = HyperCoreReader(w3)
+    prices = reader.usd_prices(list(reader.price_sources))
+    symbols = {address: symbol for symbol, address in TOKENS.items()}
+    for token, price in prices.items():
+        print(f"{symbols.get(token, token)}: ${price}")
+    if args.user:
+        indices = [int(i) for i in args.token_indices.split(",")]
+        for index, balance in reader.spot_balances(args.user, indices).items():
+            print(f"Token {index}: {balance}")
+    print(f"Read at block {reader.cache_block}")
+
+
+if __name__ == "__main__":
+    main()
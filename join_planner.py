@@ -0,0 +1,305 @@
+from web3 import Web3
+import argparse
+import os
+from decimal import Decimal
+from eth_account import Account
+from dotenv import load_dotenv
+import pool_math
+from chain_clock import ChainClock
+from chain_utils import (
+    HYPEREVM_RPC_URL, KNOWN_POOLS, MAX_UINT256, PERMIT2_ADDRESS, ROUTER_ADDRESS, encode_calldata, load_abi
+)
+from multicall import batch_call_with_block
+from pool_math import PoolMathError
+from pool_state import pool_state_calls, pool_state_from_results, pool_static_info
+from rpc_scheduler import ScheduledHTTPProvider
+from signing_service import permit2_batch_typed_data
+
+load_dotenv()
+
+# Relative step used to measure the zero-impact BPT value of a deposit
+IDEAL_STEP = 10**12
+# Headroom on exact-BPT-out maximums, so a swap landing before the join does not trip AmountInAboveMax
+JOIN_BUFFER = Decimal('0.001')
+
+
+class JoinInputs:
+    """Pool state and the wallet's balances/allowances, all read at the same block"""
+
+    def __init__(self, state, balances, permit2_approvals, permit2_allowances):
+        self.state = state
+        self.balances = balances                      # wallet token balances, pool token order
+        self.permit2_approvals = permit2_approvals    # ERC20 allowance wallet -> Permit2
+        self.permit2_allowances = permit2_allowances  # Permit2 (amount, expiration, nonce) wallet -> router
+
+
+class JoinPlan:
+    """What to send: a proportional join plus at most one leg that deposits the leftovers"""
+
+    def __init__(self, pool, bpt_out, amounts_in, max_amounts_in=None):
+        self.pool = pool
+        self.bpt_out = bpt_out
+        self.amounts_in = amounts_in
+        self.max_amounts_in = list(amounts_in) if max_amounts_in is None else max_amounts_in
+        self.extra_kind = None        # None, "unbalanced" or "single"
+        self.extra_amounts = None
+        self.extra_token = None
+        self.extra_bpt_out = 0
+        self.extra_impact = 0.0
+
+    @property
+    def total_amounts_in(self):
+        """Most the plan can pull per token (what Permit2 has to allow)"""
+        if self.extra_amounts is None:
+            return list(self.max_amounts_in)
+        return [a + b for a, b in zip(self.max_amounts_in, self.extra_amounts)]
+
+    def __repr__(self):
+        extra = f", then {self.extra_kind} for {self.extra_bpt_out} BPT (impact {self.extra_impact:.4%})" if self.extra_kind else ""
+        return f"JoinPlan(proportional {self.bpt_out} BPT for {self.amounts_in}{extra})"
+
+
+def read_join_inputs(w3, pool_address, wallet, router_address=ROUTER_ADDRESS):
+    """One batched read of the pool state plus wallet balances and approvals for every pool token"""
+    static = pool_static_info(w3, pool_address)
+    erc20_abi = load_abi("erc20")
+    permit2_contract = w3.eth.contract(address=PERMIT2_ADDRESS, abi=load_abi("permit2"))
+    tokens = [w3.eth.contract(address=t, abi=erc20_abi) for t in static["tokens"]]
+
+    calls = pool_state_calls(w3, pool_address, static)
+    state_count = len(calls)
+    calls += [t.functions.balanceOf(wallet) for t in tokens]
+    calls += [t.functions.allowance(wallet, PERMIT2_ADDRESS) for t in tokens]
+    calls += [permit2_contract.functions.allowance(wallet, t.address, router_address) for t in tokens]
+
+    block_number, results = batch_call_with_block(w3, calls)
+    n = len(tokens)
+    state = pool_state_from_results(pool_address, static, results[:state_count], block_number)
+    rest = results[state_count:]
+    return JoinInputs(state, list(rest[:n]), list(rest[n:2 * n]), list(rest[2 * n:]))
+
+
+def proportional_amounts_in_raw(state, bpt_out):
+    """Raw amounts the Vault pulls for addLiquidityProportional (rounded up like the Vault)"""
+    amounts_scaled = pool_math.proportional_amounts_in(state.balances_live, state.total_supply, bpt_out)
+    return [state.to_raw_up(i, amount) for i, amount in enumerate(amounts_scaled)]
+
+
+def max_proportional_bpt(state, balances):
+    """Largest BPT amount whose proportional cost fits in the wallet balances"""
+    upper = min(
+        balance * state.total_supply // pool_balance
+        for balance, pool_balance in zip(balances, state.balances_raw) if pool_balance > 0
+    )
+    lo, hi = 0, upper
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if all(a <= b for a, b in zip(proportional_amounts_in_raw(state, mid), balances)):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _after_proportional(state, amounts_in, bpt_out):
+    after = state.copy()
+    after.balances_raw = [b + a for b, a in zip(after.balances_raw, amounts_in)]
+    after.total_supply += bpt_out
+    return after
+
+
+def _ideal_bpt(state, amounts_scaled):
+    """BPT a deposit would be worth with no price impact (first-order invariant growth)"""
+    live = state.balances_live
+    invariant = state.compute_invariant(live)
+    nudged = [b + a * IDEAL_STEP // pool_math.ONE for b, a in zip(live, amounts_scaled)]
+    growth = state.compute_invariant(nudged) - invariant
+    return state.total_supply * growth * pool_math.ONE // (invariant * IDEAL_STEP)
+
+
+def _unbalanced_option(state, leftovers):
+    amounts_scaled = [state.to_scaled18(i, a) for i, a in enumerate(leftovers)]
+    bpt_out, _fees = pool_math.add_liquidity_unbalanced(
+        state, state.balances_live, amounts_scaled, state.total_supply, state.swap_fee
+    )
+    ideal = _ideal_bpt(state, amounts_scaled)
+    return bpt_out, (1 - bpt_out / ideal) if ideal else 1.0
+
+
+def _single_token_option(state, token_index, budget):
+    """Largest exact BPT out for addLiquiditySingleTokenExactOut paid with at most `budget` of one token"""
+    def cost(bpt):
+        amount_scaled, _fee = pool_math.add_liquidity_single_token_exact_out(
+            state, state.balances_live, token_index, bpt, state.total_supply, state.swap_fee
+        )
+        return state.to_raw_up(token_index, amount_scaled)
+
+    lo, hi = 0, budget * state.total_supply // max(state.balances_raw[token_index], 1)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        try:
+            affordable = cost(mid) <= budget
+        except PoolMathError:
+            affordable = False
+        if affordable:
+            lo = mid
+        else:
+            hi = mid - 1
+    if lo == 0:
+        return 0, 1.0
+    amounts_scaled = [0] * len(state.tokens)
+    amounts_scaled[token_index] = state.to_scaled18(token_index, cost(lo))
+    ideal = _ideal_bpt(state, amounts_scaled)
+    return lo, (1 - lo / ideal) if ideal else 1.0
+
+
+def _with_buffer(amount, buffer, cap):
+    return min(int(Decimal(amount) * (1 + buffer)) + 1, cap)
+
+
+def plan_join(inputs, mode="proportional", max_impact=0.01, buffer=JOIN_BUFFER):
+    """
+    Largest proportional join whose buffered maximums are affordable, and in "best" mode
+    the leftover deposit (unbalanced or single token) that gives the most BPT within
+    max_impact. Exact-BPT-out legs are sized on budgets shrunk by buffer, their maximums
+    keep the buffer so the join survives small moves before inclusion.
+    """
+    state = inputs.state
+    budgets = [int(Decimal(b) / (1 + buffer)) for b in inputs.balances]
+    bpt_out = max_proportional_bpt(state, budgets)
+    amounts_in = proportional_amounts_in_raw(state, bpt_out)
+    max_amounts_in = [_with_buffer(a, buffer, b) if a else 0 for a, b in zip(amounts_in, inputs.balances)]
+    plan = JoinPlan(state.address, bpt_out, amounts_in, max_amounts_in)
+    if mode != "best":
+        return plan
+
+    leftovers = [b - a for b, a in zip(inputs.balances, max_amounts_in)]
+    after = _after_proportional(state, amounts_in, bpt_out)
+    options = []
+    if any(leftovers):
+        try:
+            bpt, impact = _unbalanced_option(after, leftovers)
+            options.append(("unbalanced", bpt, impact, list(leftovers), None))
+        except PoolMathError:
+            pass
+        for i, leftover in enumerate(leftovers):
+            if leftover <= 0:
+                continue
+            bpt, impact = _single_token_option(after, i, int(Decimal(leftover) / (1 + buffer)))
+            if bpt > 0:
+                spent = [0] * len(leftovers)
+                spent[i] = leftover
+                options.append(("single", bpt, impact, spent, state.tokens[i]))
+
+    options = [o for o in options if o[1] > 0 and o[2] <= max_impact]
+    if options:
+        kind, bpt, impact, amounts, token = max(options, key=lambda o: o[1])
+        plan.extra_kind, plan.extra_bpt_out, plan.extra_impact = kind, bpt, impact
+        plan.extra_amounts, plan.extra_token = amounts, token
+    return plan
+
+
+def build_join_calls(router_contract, plan, slippage=Decimal('0.001')):
+    """Router calls for the plan (the leftover leg alone when no proportional BPT fits), for permitBatchAndCall"""
+    calls = []
+    if plan.bpt_out > 0:
+        calls.append(encode_calldata(router_contract.functions.addLiquidityProportional(
+            plan.pool, plan.max_amounts_in, plan.bpt_out, False, '0x'
+        )))
+    if plan.extra_kind == "unbalanced":
+        min_bpt = int(Decimal(plan.extra_bpt_out) * (1 - slippage))
+        calls.append(encode_calldata(router_contract.functions.addLiquidityUnbalanced(
+            plan.pool, plan.extra_amounts, min_bpt, False, '0x'
+        )))
+    elif plan.extra_kind == "single":
+        max_amount_in = sum(plan.extra_amounts)
+        calls.append(encode_calldata(router_contract.functions.addLiquiditySingleTokenExactOut(
+            plan.pool, plan.extra_token, max_amount_in, plan.extra_bpt_out, False, '0x'
+        )))
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Join a pool with as much of the wallet balance as possible')
+    parser.add_argument('--pool', default=next(iter(KNOWN_POOLS)), help='Pool address')
+    parser.add_argument('--mode', choices=['proportional', 'best'], default='proportional',
+                        help='proportional only, or also deposit the leftovers when the impact is small')
+    parser.add_argument('--max_impact', type=float, default=0.01, help='Max price impact for the leftover leg')
+    parser.add_argument('--dry_run', action='store_true', help='Only print the plan')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    if not w3.is_connected():
+        raise Exception("Failed to connect to Ethereum node")
+
+    private_key = os.getenv("PRIVATE_KEY")
+    if not private_key:
+        raise Exception("Private key not found in environment variables")
+    account = Account.from_key(private_key)
+    wallet_address = account.address
+    print(f"Using wallet: {wallet_address}")
+
+    pool_address = Web3.to_checksum_address(args.pool)
+    inputs = read_join_inputs(w3, pool_address, wallet_address)
+    plan = plan_join(inputs, args.mode, args.max_impact)
+    print(plan)
+    if plan.bpt_out == 0 and plan.extra_kind is None:
+        raise Exception("Wallet balances are too small to join this pool")
+    if args.dry_run:
+        return
+
+    erc20_abi = load_abi("erc20")
+    nonce = w3.eth.get_transaction_count(wallet_address)
+    totals = plan.total_amounts_in
+    for token, approved, amount in zip(inputs.state.tokens, inputs.permit2_approvals, totals):
+        if approved < amount:
+            print(f"Approving {token} for Permit2...")
+            approve_tx = w3.eth.contract(address=token, abi=erc20_abi).functions.approve(
+                PERMIT2_ADDRESS, MAX_UINT256
+            ).build_transaction({
+                "from": wallet_address,
+                "gas": 100000,
+                "gasPrice": w3.eth.gas_price,
+                "nonce": nonce
+            })
+            signed_tx = account.sign_transaction(approve_tx)
+            tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            w3.eth.wait_for_transaction_receipt(tx_hash)
+            nonce += 1
+
+    clock = ChainClock(w3)
+    clock.sync()
+    permit2_batch = {
+        "details": [
+            {"token": token, "amount": amount, "expiration": clock.expiration(3600), "nonce": allowance[2]}
+            for token, amount, allowance in zip(inputs.state.tokens, totals, inputs.permit2_allowances)
+            if amount > 0
+        ],
+        "spender": ROUTER_ADDRESS,
+        "sigDeadline": clock.sig_deadline()
+    }
+    typed_data = permit2_batch_typed_data(w3.eth.chain_id, permit2_batch)
+    signed_message = account.sign_typed_data(
+        domain_data=typed_data["domain"],
+        message_types=typed_data["types"],
+        message_data=typed_data["message"]
+    )
+
+    router_contract = w3.eth.contract(address=ROUTER_ADDRESS, abi=load_abi("router"))
+    transaction = router_contract.functions.permitBatchAndCall(
+        [], [], permit2_batch, signed_message.signature, build_join_calls(router_contract, plan)
+    ).build_transaction({
+        "from": wallet_address,
+        "gas": 800000,
+        "gasPrice": w3.eth.gas_price,
+        "nonce": nonce
+    })
+    signed_tx = account.sign_transaction(transaction)
+    tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+    print(f"Transaction sent! Hash: {tx_hash.hex()}")
+    tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    print(f"Transaction status: {'Successful' if tx_receipt.status == 1 else 'Failed'}")
+
+
+if __name__ == "__main__":
+    main()
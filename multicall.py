@@ -0,0 +1,84 @@
+from eth_abi import decode
+from eth_utils.abi import collapse_if_tuple
+from chain_utils import encode_calldata
+
+# Multicall3 is deployed at the same address on HyperEVM and Base
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"}
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"}
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "getBlockNumber",
+        "outputs": [{"internalType": "uint256", "name": "blockNumber", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+# Calls per eth_call, keeps each request well under the node's gas cap for eth_call
+MAX_CALLS_PER_BATCH = 300
+
+
+def raw_batch_call(w3, requests, block_identifier='latest'):
+    """
+    Run (target, calldata, output_types) requests in aggregate3 eth_calls.
+    Failed calls come back as None, single-value outputs are unwrapped.
+    """
+    multicall = w3.eth.contract(address=MULTICALL3_ADDRESS, abi=MULTICALL3_ABI)
+    results = []
+    for start in range(0, len(requests), MAX_CALLS_PER_BATCH):
+        chunk = requests[start:start + MAX_CALLS_PER_BATCH]
+        responses = multicall.functions.aggregate3(
+            [(target, True, calldata) for target, calldata, _ in chunk]
+        ).call(block_identifier=block_identifier)
+        for (_target, _calldata, output_types), (success, data) in zip(chunk, responses):
+            if not success or (output_types and not data):
+                results.append(None)
+                continue
+            values = decode(output_types, data)
+            results.append(values[0] if len(values) == 1 else values)
+    return results
+
+
+def batch_call(w3, contract_functions, block_identifier='latest'):
+    """Run bound contract calls (contract.functions.f(args)) in one round trip, None for reverts"""
+    requests = [
+        (fn.address, encode_calldata(fn), [collapse_if_tuple(o) for o in fn.abi['outputs']])
+        for fn in contract_functions
+    ]
+    return raw_batch_call(w3, requests, block_identifier)
+
+
+def batch_call_with_block(w3, contract_functions, block_identifier='latest'):
+    """batch_call plus the block number the results were read at, returns (block_number, results)"""
+    multicall = w3.eth.contract(address=MULTICALL3_ADDRESS, abi=MULTICALL3_ABI)
+    results = batch_call(w3, list(contract_functions) + [multicall.functions.getBlockNumber()], block_identifier)
+    return results[-1], results[:-1]
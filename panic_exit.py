@@ -0,0 +1,186 @@
+from web3 import Web3
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from eth_account import Account
+from dotenv import load_dotenv
+from chain_clock import ChainClock
+from chain_utils import HYPEREVM_RPC_URL, KNOWN_POOLS
+from exit_engine import GAS_PER_CALL, ExitEngine, ExitQuote, _quote_proportional, _quote_recovery, read_fleet_positions
+from pool_registry import indexed_pools
+from rpc_scheduler import ScheduledHTTPProvider
+from signing_service import SigningService
+from wallet_fleet import load_private_keys
+
+load_dotenv()
+
+# HyperEVM small blocks (about one per second) have a 2M gas limit, anything bigger
+# waits for a big block (about one per minute), so every exit transaction must fit
+SMALL_BLOCK_GAS_LIMIT = 2_000_000
+MAX_EXITS_PER_TX = SMALL_BLOCK_GAS_LIMIT // GAS_PER_CALL
+
+# Errors a node returns when another endpoint already delivered the same signed transaction
+DUPLICATE_MARKERS = ("already known", "nonce too low", "known transaction", "already imported")
+
+
+def load_rpc_urls():
+    """Endpoints to broadcast to: RPC_URLS (comma separated) or the public HyperEVM RPC"""
+    urls = os.getenv("RPC_URLS")
+    if urls:
+        return [u.strip() for u in urls.split(",") if u.strip()]
+    return [HYPEREVM_RPC_URL]
+
+
+def panic_quote(position):
+    """removeLiquidityRecovery when the pool allows it (works even if the pool is paused), else proportional"""
+    state = position.state
+    if position.recovery_mode:
+        return ExitQuote("recovery", state.address, position.bpt_balance, _quote_recovery(state, position.bpt_balance))
+    return ExitQuote("proportional", state.address, position.bpt_balance,
+                     _quote_proportional(state, position.bpt_balance))
+
+
+class PanicExit:
+    """
+    Pulls every BPT position of every fleet wallet out of every pool.
+
+    All reads happen in one aggregated multicall, all exits are signed before the first
+    one is sent, and each signed transaction is broadcast to every endpoint at once.
+    Exits use small-block sized transactions at a multiple of the small block gas price,
+    so wallets must not have the big block flag set. With a SigningService (signer) the
+    transactions are signed on its worker processes.
+    """
+
+    def __init__(self, private_keys, rpc_urls, slippage=Decimal('0.05'), gas_multiplier=3, deadline=300,
+                 signer=None):
+        self.accounts = [Account.from_key(k) for k in private_keys]
+        self.endpoints = [Web3(ScheduledHTTPProvider(url)) for url in rpc_urls]
+        self.w3 = self.endpoints[0]
+        self.slippage = slippage
+        self.gas_multiplier = gas_multiplier
+        self.deadline = deadline
+        self.clock = ChainClock(self.w3)
+        self.signer = signer
+        self.executor = ThreadPoolExecutor(max_workers=max(8, len(self.accounts) * len(self.endpoints)))
+        self.signed = []
+
+    def prepare(self, pools):
+        """Read positions and sign every exit transaction, returns the number of transactions"""
+        start = time.time()
+        addresses = [a.address for a in self.accounts]
+        positions = read_fleet_positions(self.w3, addresses, pools)
+        chain_id = self.w3.eth.chain_id
+        gas_price = int(self.w3.eth.gas_price * self.gas_multiplier)
+        self.clock.sync()
+        deadline = self.clock.deadline(self.deadline)
+        nonces = dict(zip(addresses, self.executor.map(
+            lambda address: self.w3.eth.get_transaction_count(address, 'pending'), addresses
+        )))
+
+        built = []   # (account, pools, transaction)
+        for account in self.accounts:
+            plans = [(p, panic_quote(p)) for p in positions[account.address]]
+            if not plans:
+                continue
+            engine = ExitEngine(self.w3, account, slippage=self.slippage, chain_id=chain_id)
+            for i in range(0, len(plans), MAX_EXITS_PER_TX):
+                chunk = plans[i:i + MAX_EXITS_PER_TX]
+                transaction = engine.build_transaction(chunk, deadline, nonces[account.address], gas_price)
+                nonces[account.address] += 1
+                built.append((account, [q.pool for _p, q in chunk], transaction))
+        if self.signer is not None:
+            # One batch per wallet, every wallet's batch in flight at once
+            batches = {account.address: self.signer.sign_transactions(
+                account.address, [t for a, _p, t in built if a is account]
+            ) for account in self.accounts}
+            results = {address: iter(batch.result()) for address, batch in batches.items()}
+            signed = [next(results[account.address]) for account, _pools, _t in built]
+        else:
+            signed = [account.sign_transaction(transaction) for account, _pools, transaction in built]
+        self.signed = [(account.address, pools, signed_tx) for (account, pools, _t), signed_tx in zip(built, signed)]
+        print(f"Prepared {len(self.signed)} exit transaction(s) in {(time.time() - start) * 1000:.0f} ms")
+        return len(self.signed)
+
+    @staticmethod
+    def _send(w3, signed_tx):
+        """One endpoint, returns the error or None if it accepted (or already had) the transaction"""
+        try:
+            w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            return None
+        except Exception as e:
+            if any(marker in str(e).lower() for marker in DUPLICATE_MARKERS):
+                return None
+            return e
+
+    def fire(self, wait=True):
+        """
+        Broadcast every prepared exit, returns [(wallet, pools, tx hash, status, seconds, error)].
+        Each (transaction, endpoint) pair is its own task, so no task waits on another and the
+        pool cannot fill up with waiters. A transaction counts as sent if any endpoint took it;
+        a failed broadcast or receipt wait only marks its own row.
+        """
+        start = time.time()
+        sends = [[self.executor.submit(self._send, w3, signed_tx) for w3 in self.endpoints]
+                 for _w, _p, signed_tx in self.signed]
+        errors = []
+        for futures in sends:
+            endpoint_errors = [future.result() for future in futures]
+            errors.append(endpoint_errors[0] if all(e is not None for e in endpoint_errors) else None)
+        print(f"Broadcast {errors.count(None)}/{len(sends)} transaction(s) in {(time.time() - start) * 1000:.0f} ms")
+
+        def confirm(tx_hash):
+            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120, poll_latency=0.2)
+            return receipt.status, time.time() - start
+
+        confirms = [
+            self.executor.submit(confirm, signed_tx.hash) if wait and error is None else None
+            for (_w, _p, signed_tx), error in zip(self.signed, errors)
+        ]
+        results = []
+        for (wallet, pools, signed_tx), error, future in zip(self.signed, errors, confirms):
+            status = seconds = None
+            if future is not None:
+                try:
+                    status, seconds = future.result()
+                except Exception as e:
+                    error = e
+            results.append((wallet, pools, signed_tx.hash, status, seconds, error))
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exit every BPT position of every fleet wallet, now')
+    parser.add_argument('--slippage', type=Decimal, default=Decimal('0.05'), help='Allowed slippage on exit amounts')
+    parser.add_argument('--gas_multiplier', type=float, default=3, help='Multiple of the current gas price to pay')
+    parser.add_argument('--dry_run', action='store_true', help='Prepare and sign, but do not send')
+    args = parser.parse_args()
+
+    start = time.time()
+    private_keys = load_private_keys()
+    signer = SigningService(private_keys) if len(private_keys) > 1 else None
+    panic = PanicExit(private_keys, load_rpc_urls(), args.slippage, args.gas_multiplier, signer=signer)
+    pools = list(dict.fromkeys([*KNOWN_POOLS, *(Web3.to_checksum_address(p) for p in indexed_pools())]))
+    prepared = panic.prepare(pools)
+    if signer is not None:
+        signer.close()
+    if not prepared:
+        print("No BPT positions found")
+        return
+    if args.dry_run:
+        for wallet, pools, signed_tx in panic.signed:
+            print(f"  {wallet}: {len(pools)} exit(s), {signed_tx.hash.hex()}")
+        return
+
+    for wallet, pools, tx_hash, status, seconds, error in panic.fire():
+        if error is not None:
+            print(f"  {wallet}: {len(pools)} exit(s) {tx_hash.hex()} error: {error}")
+        else:
+            print(f"  {wallet}: {len(pools)} exit(s) {tx_hash.hex()} "
+                  f"{'Successful' if status == 1 else 'Failed'} after {seconds:.1f} s")
+    print(f"Time to exit: {time.time() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
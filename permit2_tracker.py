@@ -0,0 +1,186 @@
+from web3 import Web3
+import argparse
+import threading
+from eth_abi import decode
+from chain_utils import HYPEREVM_RPC_URL, MAX_UINT48, PERMIT2_ADDRESS, ROUTER_ADDRESS, TOKENS, load_abi
+from event_indexer import _address_from_topic, _address_topic, get_logs_adaptive
+from multicall import batch_call_with_block
+from rpc_scheduler import ScheduledHTTPProvider
+
+# Permit2 AllowanceTransfer events
+APPROVAL = Web3.keccak(text="Approval(address,address,address,uint160,uint48)")
+PERMIT = Web3.keccak(text="Permit(address,address,address,uint160,uint48,uint48)")
+NONCE_INVALIDATION = Web3.keccak(text="NonceInvalidation(address,address,address,uint48,uint48)")
+LOCKDOWN = Web3.keccak(text="Lockdown(address,address,address)")
+
+
+def _key(owner, token, spender):
+    return owner.lower(), token.lower(), spender.lower()
+
+
+class Permit2Tracker:
+    """
+    Local copy of Permit2 allowances: (owner, token, spender) -> [amount, expiration, nonce].
+
+    seed() reads every tracked key in one multicall. permit_details() hands out the
+    next nonce and advances it locally, so concurrent operations sign consecutive
+    nonces without asking the node. reconcile() applies Permit2 Approval, Permit,
+    NonceInvalidation and Lockdown logs, which also catches permits signed elsewhere.
+    """
+
+    def __init__(self, w3, permit2_address=PERMIT2_ADDRESS):
+        self.w3 = w3
+        self.permit2_address = permit2_address
+        self.permit2_contract = w3.eth.contract(address=permit2_address, abi=load_abi("permit2"))
+        self.allowances = {}
+        self.lock = threading.Lock()
+        # First use of a key is read once, concurrent first users wait for that read
+        self.seed_lock = threading.Lock()
+        self.last_block = None
+
+    def seed(self, keys):
+        """
+        Read (owner, token, spender) allowances in one batched call. A key already tracked keeps
+        its locally reserved nonces (the nonce is the larger of ours and the chain's) and its
+        local amount, unless the chain is ahead of us.
+        """
+        keys = list(keys)
+        block_number, results = batch_call_with_block(
+            self.w3, [self.permit2_contract.functions.allowance(o, t, s) for o, t, s in keys]
+        )
+        with self.lock:
+            for (owner, token, spender), allowance in zip(keys, results):
+                if allowance is None:
+                    raise Exception(f"Failed to read Permit2 allowance of {owner} for {token}/{spender}")
+                key = _key(owner, token, spender)
+                local = self.allowances.get(key)
+                if local is None or allowance[2] > local[2]:
+                    self.allowances[key] = list(allowance)
+            self.last_block = block_number if self.last_block is None else min(self.last_block, block_number)
+        return block_number
+
+    def get(self, owner, token, spender):
+        """(amount, expiration, nonce), seeding the key on first use"""
+        key = _key(owner, token, spender)
+        with self.lock:
+            if key in self.allowances:
+                return tuple(self.allowances[key])
+        with self.seed_lock:
+            with self.lock:
+                seeded = key in self.allowances
+            if not seeded:
+                self.seed([(owner, token, spender)])
+        with self.lock:
+            return tuple(self.allowances[key])
+
+    def next_nonce(self, owner, token, spender):
+        """Reserve the nonce for the next signed permit of this key"""
+        self.get(owner, token, spender)
+        with self.lock:
+            allowance = self.allowances[_key(owner, token, spender)]
+            nonce = allowance[2]
+            allowance[2] += 1
+            return nonce
+
+    def permit_details(self, owner, token, spender, amount, expiration=MAX_UINT48):
+        """PermitDetails for a PermitBatch with a reserved nonce, the allowance is updated as if it landed"""
+        nonce = self.next_nonce(owner, token, spender)
+        with self.lock:
+            allowance = self.allowances[_key(owner, token, spender)]
+            allowance[0], allowance[1] = amount, expiration
+        return {"token": token, "amount": amount, "expiration": expiration, "nonce": nonce}
+
+    def approved(self, owner, token, spender, amount, expiration):
+        """We sent Permit2.approve for the key (the nonce does not change)"""
+        self.get(owner, token, spender)
+        with self.lock:
+            allowance = self.allowances[_key(owner, token, spender)]
+            allowance[0], allowance[1] = amount, expiration
+
+    def spend(self, owner, token, spender, amount):
+        """The spender pulled tokens through the allowance (Permit2 emits no event for this)"""
+        with self.lock:
+            allowance = self.allowances.get(_key(owner, token, spender))
+            if allowance is not None and allowance[0] < 2**160 - 1:
+                allowance[0] = max(allowance[0] - amount, 0)
+
+    def refund(self, owner, token, spender, amount):
+        """A spend booked ahead of its transaction did not happen after all"""
+        with self.lock:
+            allowance = self.allowances.get(_key(owner, token, spender))
+            if allowance is not None and allowance[0] < 2**160 - 1:
+                allowance[0] = min(allowance[0] + amount, 2**160 - 1)
+
+    def resync(self, owner, token, spender):
+        """Forget local state for a key after a permit that did not land, and re-read it"""
+        with self.lock:
+            self.allowances.pop(_key(owner, token, spender), None)
+        return self.get(owner, token, spender)
+
+    def _apply(self, log):
+        topics = log['topics']
+        topic = bytes(topics[0])
+        owner = _address_from_topic(topics[1])
+        data = bytes(log['data'])
+        if topic == bytes(LOCKDOWN):
+            token, spender = decode(['address', 'address'], data)
+            key = _key(owner, token, spender)
+        else:
+            key = _key(owner, _address_from_topic(topics[2]), _address_from_topic(topics[3]))
+        allowance = self.allowances.get(key)
+        if allowance is None:
+            return
+        if topic == bytes(PERMIT):
+            amount, expiration, nonce = decode(['uint160', 'uint48', 'uint48'], data)
+            allowance[0], allowance[1] = amount, expiration
+            # Locally reserved nonces can be ahead of the chain, never move backwards
+            allowance[2] = max(allowance[2], nonce + 1)
+        elif topic == bytes(APPROVAL):
+            amount, expiration = decode(['uint160', 'uint48'], data)
+            allowance[0], allowance[1] = amount, expiration
+        elif topic == bytes(NONCE_INVALIDATION):
+            new_nonce, _old_nonce = decode(['uint48', 'uint48'], data)
+            allowance[2] = max(allowance[2], new_nonce)
+        elif topic == bytes(LOCKDOWN):
+            allowance[0] = 0
+
+    def reconcile(self, to_block=None):
+        """Apply Permit2 logs of tracked owners since the last seed/reconcile, returns logs applied"""
+        if not self.allowances or self.last_block is None:
+            return 0
+        to_block = self.w3.eth.block_number if to_block is None else to_block
+        if to_block <= self.last_block:
+            return 0
+        owners = sorted({key[0] for key in self.allowances})
+        logs = get_logs_adaptive(self.w3, {
+            'address': self.permit2_address,
+            'topics': [
+                [Web3.to_hex(APPROVAL), Web3.to_hex(PERMIT), Web3.to_hex(NONCE_INVALIDATION), Web3.to_hex(LOCKDOWN)],
+                [_address_topic(Web3.to_checksum_address(o)) for o in owners]
+            ]
+        }, self.last_block + 1, to_block)
+        with self.lock:
+            for log in logs:
+                self._apply(log)
+            self.last_block = to_block
+        return len(logs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show Permit2 allowances and nonces for the router')
+    parser.add_argument('--owner', required=True, help='Wallet address')
+    parser.add_argument('--spender', default=ROUTER_ADDRESS, help='Spender (default: router)')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    tracker = Permit2Tracker(w3)
+    owner = Web3.to_checksum_address(args.owner)
+    spender = Web3.to_checksum_address(args.spender)
+    tracker.seed([(owner, token, spender) for token in TOKENS.values()])
+    for symbol, token in TOKENS.items():
+        amount, expiration, nonce = tracker.get(owner, token, spender)
+        print(f"{symbol}: amount {amount}, expiration {expiration}, nonce {nonce}")
+
+
+if __name__ == "__main__":
+    main()
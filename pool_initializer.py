@@ -0,0 +1,193 @@
+from web3 import Web3
+import argparse
+from decimal import Decimal
+from chain_profiles import PROFILES, ChainEngine
+from chain_utils import load_abi
+from hypercore_reader import HyperCoreReader
+from multicall import batch_call, raw_batch_call
+from pool_math import ONE
+from pool_state import STABLE_POOL_ABI, PoolState, pool_static_info
+
+GET_RATE = Web3.keccak(text="getRate()")[:4]
+# Reference balance (scaled18) the stable ratios are solved at, prices do not depend on the scale
+STABLE_REFERENCE_BALANCE = 10**24
+# Relative spot price error the stable solver stops at
+STABLE_PRICE_TOLERANCE = Decimal("1e-9")
+# Router.initialize calls per permitBatchAndCall
+MAX_POOLS_PER_TX = 4
+
+
+class InitPlan:
+    """Deposit amounts that open a pool at the reference prices"""
+
+    def __init__(self, pool, kind, tokens, amounts, prices, decimals):
+        self.pool = pool
+        self.kind = kind
+        self.tokens = tokens
+        self.amounts = amounts
+        self.prices = prices
+        self.decimals = decimals
+
+    @property
+    def value(self):
+        return sum(Decimal(a) / 10 ** d * p for a, d, p in zip(self.amounts, self.decimals, self.prices))
+
+    def __repr__(self):
+        return f"InitPlan({self.pool}, {self.kind}, amounts={self.amounts}, value={self.value:.2f})"
+
+
+def read_init_inputs(w3, pools):
+    """
+    {pool: (static info, amp, token rates)} for freshly deployed pools: one batched read for
+    token info and amp of every pool, one for the rate providers that are set.
+    """
+    statics = {pool: pool_static_info(w3, pool) for pool in pools}
+    calls = []
+    for pool in pools:
+        calls.append(w3.eth.contract(address=pool, abi=load_abi("weighted_pool")).functions.getTokenInfo())
+        calls.append(w3.eth.contract(address=pool, abi=STABLE_POOL_ABI).functions.getAmplificationParameter())
+    results = batch_call(w3, calls)
+
+    providers = set()
+    token_infos = {}
+    for i, pool in enumerate(pools):
+        token_info = results[2 * i]
+        if token_info is None:
+            raise Exception(f"Failed to read token info of {pool}")
+        _tokens, infos, balances_raw, _last_live = token_info
+        if any(balances_raw):
+            raise Exception(f"{pool} is already initialized")
+        token_infos[pool] = [info[1] for info in infos]
+        providers.update(p for p in token_infos[pool] if int(p, 16) != 0)
+    providers = sorted(providers)
+    rates = dict(zip(providers, raw_batch_call(w3, [(p, GET_RATE, ["uint256"]) for p in providers])))
+
+    inputs = {}
+    for i, pool in enumerate(pools):
+        amp = results[2 * i + 1][0] if statics[pool]["kind"] == "stable" else None
+        token_rates = [ONE if int(p, 16) == 0 else rates[p] for p in token_infos[pool]]
+        if None in token_rates:
+            raise Exception(f"Failed to read a rate provider of {pool}")
+        inputs[pool] = (statics[pool], amp, token_rates)
+    return inputs
+
+
+def weighted_init_amounts(weights, decimals, prices, budget):
+    """Value share of token i equals its weight: B_i = budget * w_i / p_i, so B_j/w_j : B_i/w_i = p_i : p_j"""
+    return [
+        int(Decimal(budget) * Decimal(w) / ONE / Decimal(p) * 10 ** d)
+        for w, d, p in zip(weights, decimals, prices)
+    ]
+
+
+def _stable_balance_for_price(state, i, target):
+    """Live balance of token i (others fixed) at which its spot price in token 0 is target"""
+    low, high = STABLE_REFERENCE_BALANCE // 1000, STABLE_REFERENCE_BALANCE * 1000
+    for _ in range(200):
+        middle = (low + high) // 2
+        state.balances_raw[i] = state.to_raw(i, middle)
+        price = Decimal(state.spot_price(state.tokens[i], state.tokens[0]))
+        # More of token i makes it cheaper in token 0
+        if price > target:
+            low = middle
+        else:
+            high = middle
+        if abs(price - target) <= target * STABLE_PRICE_TOLERANCE or high - low <= 1:
+            break
+    return state.balances_raw[i]
+
+
+def stable_init_amounts(amp, tokens, decimals, rates, prices, budget, swap_fee=0):
+    """
+    Balances whose marginal prices (on the StableSwap curve) match the references, scaled to
+    the budget. At the peg (prices proportional to rates) this is the equal live balance point.
+    """
+    n = len(tokens)
+    state = PoolState("init", "stable", tokens, decimals, [0] * n, rates, swap_fee, 0, amp=amp)
+    state.balances_raw = [state.to_raw(i, STABLE_REFERENCE_BALANCE) for i in range(n)]
+    targets = [Decimal(prices[i]) / Decimal(prices[0]) for i in range(n)]
+    # Token prices interact through the invariant, a few Gauss-Seidel rounds settle them
+    for _ in range(3 if n > 2 else 1):
+        for i in range(1, n):
+            _stable_balance_for_price(state, i, targets[i])
+    value = sum(Decimal(b) / 10 ** d * Decimal(p) for b, d, p in zip(state.balances_raw, decimals, prices))
+    scale = Decimal(budget) / value
+    return [int(Decimal(b) * scale) for b in state.balances_raw]
+
+
+def plan_initialization(w3, pools, budget, prices):
+    """InitPlan per pool, prices: {token: Decimal reference price} in one unit (e.g. USD), budget in that unit"""
+    plans = []
+    for pool, (static, amp, rates) in read_init_inputs(w3, pools).items():
+        token_prices = []
+        for token in static["tokens"]:
+            if token not in prices:
+                raise Exception(f"No reference price for {token} in {pool}")
+            token_prices.append(Decimal(prices[token]))
+        if static["kind"] == "weighted":
+            amounts = weighted_init_amounts(static["weights"], static["decimals"], token_prices, budget)
+        else:
+            amounts = stable_init_amounts(amp, static["tokens"], static["decimals"], rates, token_prices, budget)
+        plans.append(InitPlan(pool, static["kind"], static["tokens"], amounts, token_prices, static["decimals"]))
+    return plans
+
+
+def initialize_pools(engine, plans, min_bpt_out=0, max_per_tx=None, wait=True):
+    """
+    Router.initialize for every plan through permitBatchAndCall on a ChainEngine, several
+    pools per transaction (on chains with big blocks) with one Permit2 batch for the summed amounts.
+    """
+    if max_per_tx is None:
+        max_per_tx = MAX_POOLS_PER_TX if "big" in engine.profile.lanes else 1
+    receipts = []
+    for start in range(0, len(plans), max_per_tx):
+        chunk = plans[start:start + max_per_tx]
+        spend = {}
+        calls = []
+        for plan in chunk:
+            for token, amount in zip(plan.tokens, plan.amounts):
+                spend[token] = spend.get(token, 0) + amount
+            calls.append(engine.router_contract.functions.initialize(
+                plan.pool, plan.tokens, plan.amounts, min_bpt_out, False, '0x'
+            ))
+        receipts.append(engine.permit_and_call(spend, calls, "initialize", wait=wait))
+    return receipts
+
+
+def parse_prices(text):
+    """'0xToken=1.0,0xOther=3450' -> {checksum address: Decimal}"""
+    prices = {}
+    for item in filter(None, (t.strip() for t in text.split(","))):
+        token, price = item.split("=")
+        prices[Web3.to_checksum_address(token)] = Decimal(price)
+    return prices
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Initialize fresh pools at reference prices')
+    parser.add_argument('--pools', required=True, help='Comma separated pool addresses')
+    parser.add_argument('--budget', required=True, help='Value to deposit per pool, in the price unit (USD)')
+    parser.add_argument('--chain', default='hyperevm', help='Chain profile')
+    parser.add_argument('--prices', default='', help='token=price overrides, HyperCore prices are used otherwise (hyperevm)')
+    parser.add_argument('--dry_run', action='store_true', help='Only print the deposit amounts')
+    args = parser.parse_args()
+
+    engine = ChainEngine(PROFILES[args.chain])
+    pools = [Web3.to_checksum_address(p.strip()) for p in args.pools.split(",")]
+    prices = parse_prices(args.prices)
+    if args.chain == 'hyperevm':
+        tokens = {t for pool in pools for t in pool_static_info(engine.w3, pool)["tokens"]}
+        reader = HyperCoreReader(engine.w3)
+        prices = {**reader.usd_prices([t for t in tokens if t not in prices]), **prices}
+
+    plans = plan_initialization(engine.w3, pools, Decimal(args.budget), prices)
+    for plan in plans:
+        print(plan)
+    if args.dry_run:
+        return
+    for receipt in initialize_pools(engine, plans):
+        print(f"Initialized in block {receipt.blockNumber}: {Web3.to_hex(receipt.transactionHash)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+from decimal import Context, Decimal, localcontext
+
+# Local port of the Balancer v3 pool math (FixedPoint, WeightedMath, StableMath, BasePoolMath).
+# Everything works on 18-decimal fixed point integers ("scaled18"), like the Vault does.
+# Weighted pow uses Decimal instead of LogExpMath, with the same relative error margin the
+# contracts apply, so results can differ from the chain by a few wei but never round in our favour.
+
+# Precision of the Decimal pow, kept local so importing this module leaves the global context alone
+POW_CONTEXT = Context(prec=60)
+
+ONE = 10**18
+TWO = 2 * ONE
+FOUR = 4 * ONE
+MAX_POW_RELATIVE_ERROR = 10000  # 1e-14, same as FixedPoint.sol
+
+# WeightedMath limits
+MAX_IN_RATIO = 3 * 10**17   # 30%
+MAX_OUT_RATIO = 3 * 10**17  # 30%
+
+# StableMath constants
+AMP_PRECISION = 1000
+
+
+class PoolMathError(Exception):
+    """Raised where the pool contract would revert (MaxInRatio, MaxOutRatio, no convergence...)"""
+
+
+# FixedPoint
+
+def mul_down(a, b):
+    return a * b // ONE
+
+
+def mul_up(a, b):
+    product = a * b
+    return 0 if product == 0 else (product - 1) // ONE + 1
+
+
+def div_down(a, b):
+    if b == 0:
+        raise PoolMathError("ZeroDivision")
+    return a * ONE // b
+
+
+def div_up(a, b):
+    if b == 0:
+        raise PoolMathError("ZeroDivision")
+    return 0 if a == 0 else (a * ONE - 1) // b + 1
+
+
+def div_up_raw(a, b):
+    return 0 if a == 0 else (a - 1) // b + 1
+
+
+def mul_div_up(a, b, c):
+    product = a * b
+    return 0 if product == 0 else (product - 1) // c + 1
+
+
+def complement(x):
+    return ONE - x if x < ONE else 0
+
+
+def _pow(x, y):
+    with localcontext(POW_CONTEXT):
+        return int((Decimal(x) / ONE) ** (Decimal(y) / ONE) * ONE)
+
+
+def pow_down(x, y):
+    # Exact cases FixedPoint.powDown handles without LogExpMath (50/50 and 80/20 pools)
+    if y == ONE:
+        return x
+    if y == TWO:
+        return mul_down(x, x)
+    if y == FOUR:
+        square = mul_down(x, x)
+        return mul_down(square, square)
+    raw = _pow(x, y)
+    max_error = mul_up(raw, MAX_POW_RELATIVE_ERROR) + 1
+    return raw - max_error if raw >= max_error else 0
+
+
+def pow_up(x, y):
+    if y == ONE:
+        return x
+    if y == TWO:
+        return mul_up(x, x)
+    if y == FOUR:
+        square = mul_up(x, x)
+        return mul_up(square, square)
+    raw = _pow(x, y)
+    return raw + mul_up(raw, MAX_POW_RELATIVE_ERROR) + 1
+
+
+# WeightedMath
+
+def weighted_invariant_down(weights, balances):
+    invariant = ONE
+    for weight, balance in zip(weights, balances):
+        invariant = mul_down(invariant, pow_down(balance, weight))
+    if invariant == 0:
+        raise PoolMathError("ZeroInvariant")
+    return invariant
+
+
+def weighted_invariant_up(weights, balances):
+    invariant = ONE
+    for weight, balance in zip(weights, balances):
+        invariant = mul_up(invariant, pow_up(balance, weight))
+    if invariant == 0:
+        raise PoolMathError("ZeroInvariant")
+    return invariant
+
+
+def weighted_out_given_exact_in(balance_in, weight_in, balance_out, weight_out, amount_in):
+    if amount_in > mul_down(balance_in, MAX_IN_RATIO):
+        raise PoolMathError("MaxInRatio")
+    denominator = balance_in + amount_in
+    base = div_up(balance_in, denominator)
+    exponent = div_down(weight_in, weight_out)
+    power = pow_up(base, exponent)
+    return mul_down(balance_out, complement(power))
+
+
+def weighted_in_given_exact_out(balance_in, weight_in, balance_out, weight_out, amount_out):
+    if amount_out > mul_down(balance_out, MAX_OUT_RATIO):
+        raise PoolMathError("MaxOutRatio")
+    base = div_up(balance_out, balance_out - amount_out)
+    exponent = div_up(weight_out, weight_in)
+    power = pow_up(base, exponent)
+    return mul_up(balance_in, power - ONE)
+
+
+def weighted_balance_given_invariant(balance, weight, invariant_ratio):
+    return mul_up(balance, pow_up(invariant_ratio, div_up(ONE, weight)))
+
+
+# StableMath (amp includes AMP_PRECISION, as returned by getAmplificationParameter)
+
+def stable_invariant(amp, balances):
+    total = sum(balances)
+    if total == 0:
+        return 0
+    n = len(balances)
+    invariant = total
+    amp_times_total = amp * n
+    for _ in range(255):
+        d_p = invariant
+        for balance in balances:
+            d_p = d_p * invariant // (balance * n)
+        previous = invariant
+        invariant = (
+            ((amp_times_total * total) // AMP_PRECISION + d_p * n) * invariant
+        ) // (
+            ((amp_times_total - AMP_PRECISION) * invariant) // AMP_PRECISION + (n + 1) * d_p
+        )
+        if abs(invariant - previous) <= 1:
+            return invariant
+    raise PoolMathError("StableInvariantDidNotConverge")
+
+
+def stable_balance(amp, balances, invariant, token_index):
+    n = len(balances)
+    amp_times_total = amp * n
+    total = balances[0]
+    p_d = balances[0] * n
+    for j in range(1, n):
+        p_d = p_d * balances[j] * n // invariant
+        total += balances[j]
+    total -= balances[token_index]
+    inv2 = invariant * invariant
+    c = div_up_raw(inv2 * AMP_PRECISION, amp_times_total * p_d) * balances[token_index]
+    b = total + (invariant * AMP_PRECISION) // amp_times_total
+    token_balance = div_up_raw(inv2 + c, invariant + b)
+    for _ in range(255):
+        previous = token_balance
+        token_balance = div_up_raw(token_balance * token_balance + c, token_balance * 2 + b - invariant)
+        if abs(token_balance - previous) <= 1:
+            return token_balance
+    raise PoolMathError("StableGetBalanceDidNotConverge")
+
+
+def stable_out_given_exact_in(amp, balances, token_in, token_out, amount_in, invariant):
+    balances = list(balances)
+    balances[token_in] += amount_in
+    final_out = stable_balance(amp, balances, invariant, token_out)
+    balances[token_in] -= amount_in
+    return balances[token_out] - final_out - 1
+
+
+def stable_in_given_exact_out(amp, balances, token_in, token_out, amount_out, invariant):
+    balances = list(balances)
+    balances[token_out] -= amount_out
+    final_in = stable_balance(amp, balances, invariant, token_in)
+    balances[token_out] += amount_out
+    return final_in - balances[token_in] + 1
+
+
+# BasePoolMath (pool is anything with compute_invariant(balances, round_up) and
+# compute_balance(balances, token_index, invariant_ratio), see pool_state.PoolState)
+
+def proportional_amounts_in(balances, total_supply, bpt_amount_out):
+    return [mul_div_up(balance, bpt_amount_out, total_supply) for balance in balances]
+
+
+def proportional_amounts_out(balances, total_supply, bpt_amount_in):
+    return [balance * bpt_amount_in // total_supply for balance in balances]
+
+
+def add_liquidity_unbalanced(pool, balances, exact_amounts, total_supply, swap_fee):
+    """BPT out and per-token swap fees for addLiquidityUnbalanced"""
+    new_balances = [b + a for b, a in zip(balances, exact_amounts)]
+    current_invariant = pool.compute_invariant(balances, round_up=True)
+    new_invariant = pool.compute_invariant(new_balances, round_up=False)
+    invariant_ratio = div_down(new_invariant, current_invariant)
+    fees = [0] * len(balances)
+    for i, balance in enumerate(balances):
+        proportional_balance = mul_down(invariant_ratio, balance)
+        if new_balances[i] > proportional_balance:
+            fees[i] = mul_up(new_balances[i] - proportional_balance, swap_fee)
+            new_balances[i] -= fees[i]
+    invariant_with_fees = pool.compute_invariant(new_balances, round_up=False)
+    if invariant_with_fees <= current_invariant:
+        return 0, fees
+    bpt_out = total_supply * (invariant_with_fees - current_invariant) // current_invariant
+    return bpt_out, fees
+
+
+def add_liquidity_single_token_exact_out(pool, balances, token_index, exact_bpt_out, total_supply, swap_fee):
+    """Token amount in (including fee) for addLiquiditySingleTokenExactOut"""
+    new_supply = exact_bpt_out + total_supply
+    invariant_ratio = div_up(new_supply, total_supply)
+    new_balance = pool.compute_balance(balances, token_index, invariant_ratio)
+    amount_in = new_balance - balances[token_index]
+    non_taxable_balance = mul_div_up(new_supply, balances[token_index], total_supply)
+    taxable_amount = amount_in + balances[token_index] - non_taxable_balance
+    fee = div_up(taxable_amount, complement(swap_fee)) - taxable_amount
+    return amount_in + fee, fee
+
+
+def remove_liquidity_single_token_exact_in(pool, balances, token_index, exact_bpt_in, total_supply, swap_fee):
+    """Token amount out (after fee) for removeLiquiditySingleTokenExactIn"""
+    new_supply = total_supply - exact_bpt_in
+    invariant_ratio = div_up(new_supply, total_supply)
+    new_balance = pool.compute_balance(balances, token_index, invariant_ratio)
+    amount_out = balances[token_index] - new_balance
+    balance_before_tax = mul_div_up(new_supply, balances[token_index], total_supply)
+    fee = mul_up(balance_before_tax - new_balance, swap_fee)
+    return amount_out - fee, fee
@@ -0,0 +1,57 @@
+from web3 import Web3
+import time
+from chain_utils import WEIGHTED_FACTORY_ADDRESS, load_abi
+from event_indexer import LIQUIDITY_ADDED, LIQUIDITY_REMOVED, SWAP, _address_from_topic, _address_topic, get_logs_adaptive
+
+
+class PoolMirror:
+    """
+    Keeps a PoolRegistry in step with the chain.
+
+    Each new block range costs one eth_getLogs on the Vault, and only the pools that
+    swapped or changed liquidity in it are re-read.
+    """
+
+    def __init__(self, w3, registry, vault_address=None):
+        self.w3 = w3
+        self.registry = registry
+        if vault_address is None:
+            factory = w3.eth.contract(address=WEIGHTED_FACTORY_ADDRESS, abi=load_abi("weighted_factory"))
+            vault_address = factory.functions.getVault().call()
+        self.vault_address = vault_address
+        self.last_block = w3.eth.block_number
+
+    def changed_pools(self, from_block, to_block):
+        """Registry pools touched by Vault Swap/LiquidityAdded/LiquidityRemoved events in the range"""
+        pools = list(self.registry.states)
+        if not pools:
+            return set()
+        logs = get_logs_adaptive(self.w3, {
+            'address': self.vault_address,
+            'topics': [
+                [Web3.to_hex(SWAP), Web3.to_hex(LIQUIDITY_ADDED), Web3.to_hex(LIQUIDITY_REMOVED)],
+                [_address_topic(p) for p in pools]
+            ]
+        }, from_block, to_block)
+        return {_address_from_topic(log['topics'][1]) for log in logs}
+
+    def sync(self):
+        """Bring the registry up to the chain head, returns (head block, set of refreshed pools)"""
+        head = self.w3.eth.block_number
+        if head <= self.last_block:
+            return head, set()
+        changed = self.changed_pools(self.last_block + 1, head)
+        for pool in changed:
+            self.registry.refresh(self.w3, pool)
+        self.last_block = head
+        return head, changed
+
+    def follow(self, on_block, poll_interval=0.5):
+        """Call on_block(block_number, changed_pools) once for every new head"""
+        notified = self.last_block
+        while True:
+            head, changed = self.sync()
+            if head > notified:
+                notified = head
+                on_block(head, changed)
+            time.sleep(poll_interval)
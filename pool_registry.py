@@ -0,0 +1,249 @@
+from web3 import Web3
+import argparse
+import heapq
+import os
+import sqlite3
+import time
+from decimal import Decimal
+from eth_account import Account
+from dotenv import load_dotenv
+from chain_clock import ChainClock
+from chain_utils import (
+    HYPEREVM_RPC_URL, KNOWN_POOLS, PERMIT2_ADDRESS, ROUTER_ADDRESS, STABLE_FACTORY_ADDRESS,
+    TOKENS, WEIGHTED_FACTORY_ADDRESS, encode_calldata, load_abi
+)
+from pool_math import PoolMathError
+from pool_state import fetch_pool_state
+from rpc_scheduler import ScheduledHTTPProvider
+from signing_service import permit2_batch_typed_data
+
+load_dotenv()
+
+
+class PoolRegistry:
+    """Pools we can route through, with their local state and the token graph they form"""
+
+    def __init__(self):
+        self.states = {}   # pool address -> PoolState
+        self.graph = {}    # token (lowercase) -> list of (pool address, other token)
+
+    def add(self, state):
+        self.states[state.address] = state
+        for token_in in state.tokens:
+            for token_out in state.tokens:
+                if token_in != token_out:
+                    self.graph.setdefault(token_in.lower(), []).append((state.address, token_out))
+
+    def refresh(self, w3, pool_address):
+        """Re-read one pool after it changed, the graph edges stay the same"""
+        old = self.states[pool_address]
+        self.states[pool_address] = fetch_pool_state(w3, pool_address, old.kind)
+
+    def quote_path(self, path, amount_in):
+        """Chain local quotes along [(pool, token_in, token_out), ...], None if any hop would revert"""
+        amount = amount_in
+        for pool, token_in, token_out in path:
+            try:
+                amount = self.states[pool].quote_exact_in(token_in, token_out, amount)
+            except PoolMathError:
+                return None
+            if amount <= 0:
+                return None
+        return amount
+
+    def paths(self, token_in, token_out, max_hops=3):
+        """Every simple path of at most max_hops pools from token_in to token_out"""
+        results = []
+        target = token_out.lower()
+
+        def walk(token, path, used_pools, seen_tokens):
+            for pool, next_token in self.graph.get(token.lower(), []):
+                if pool in used_pools or next_token.lower() in seen_tokens:
+                    continue
+                hop_path = path + [(pool, token, next_token)]
+                if next_token.lower() == target:
+                    results.append(hop_path)
+                elif len(hop_path) < max_hops:
+                    walk(next_token, hop_path, used_pools | {pool}, seen_tokens | {next_token.lower()})
+
+        walk(token_in, [], frozenset(), frozenset({token_in.lower()}))
+        return results
+
+    def best_paths(self, token_in, token_out, amount_in, k=3, max_hops=3):
+        """The k paths with the highest local amount out, as (amount_out, path)"""
+        quoted = []
+        for path in self.paths(token_in, token_out, max_hops):
+            amount_out = self.quote_path(path, amount_in)
+            if amount_out is not None:
+                quoted.append((amount_out, path))
+        return heapq.nlargest(k, quoted, key=lambda q: q[0])
+
+
+def factory_pools(w3):
+    """Pools created by the weighted and stable factories, with their kind"""
+    factory_abi = load_abi("weighted_factory")
+    pools = {}
+    for factory_address, kind in ((WEIGHTED_FACTORY_ADDRESS, "weighted"), (STABLE_FACTORY_ADDRESS, "stable")):
+        factory = w3.eth.contract(address=factory_address, abi=factory_abi)
+        for pool in factory.functions.getPools().call():
+            pools[pool] = kind
+    return pools
+
+
+def indexed_pools(db_path="pool_events.db"):
+    """Pools from the event indexer database (PoolCreated events)"""
+    if not os.path.exists(db_path):
+        return {}
+    db = sqlite3.connect(db_path)
+    pools = {address: kind for address, kind in db.execute("SELECT address, kind FROM pools")}
+    db.close()
+    return pools
+
+
+def build_registry(w3, pools):
+    registry = PoolRegistry()
+    for address, kind in pools.items():
+        try:
+            registry.add(fetch_pool_state(w3, Web3.to_checksum_address(address), kind))
+        except Exception as e:
+            # Uninitialized or paused pools cannot be routed through
+            print(f"Skipping pool {address}: {e}")
+    return registry
+
+
+def haircut_path(registry, path, amount_in, slippage):
+    """
+    Hop inputs and the final quote when every hop after the first spends the previous
+    hop's quote less slippage. Returns (amounts_in per hop, quotes per hop), None if a hop reverts.
+    """
+    amounts_in, quotes = [], []
+    amount = amount_in
+    for pool, token_in, token_out in path:
+        try:
+            quoted = registry.states[pool].quote_exact_in(token_in, token_out, amount)
+        except PoolMathError:
+            return None
+        amounts_in.append(amount)
+        quotes.append(quoted)
+        amount = int(Decimal(quoted) * (1 - Decimal(slippage)))
+    return amounts_in, quotes
+
+
+def build_path_calls(router_contract, path, amount_in, slippage, deadline, registry, min_final_out=None):
+    """
+    Sequential swapSingleTokenExactIn calls for a path.
+
+    Each hop's output lands in the wallet and the next hop spends a slightly smaller
+    exact amount of it (quote less slippage), which is also the previous hop's min out.
+    The last hop's min out is its own quote on that reduced input, less slippage, so the
+    calls go through on unchanged state. min_final_out overrides it (e.g. amount_in + min
+    profit for cycles). Returns (calls, amounts_in per hop, final min amount out).
+    """
+    haircut = haircut_path(registry, path, amount_in, slippage)
+    if haircut is None:
+        raise PoolMathError("A hop of the path would revert")
+    amounts_in, quotes = haircut
+    calls = []
+    for index, ((pool, token_in, token_out), amount, quoted) in enumerate(zip(path, amounts_in, quotes)):
+        min_amount_out = int(Decimal(quoted) * (1 - Decimal(slippage)))
+        if index == len(path) - 1 and min_final_out is not None:
+            min_amount_out = min_final_out
+        calls.append(encode_calldata(router_contract.functions.swapSingleTokenExactIn(
+            pool, token_in, token_out, amount, min_amount_out, deadline, False, '0x'
+        )))
+    return calls, amounts_in, min_amount_out
+
+
+def _token_address(value):
+    return Web3.to_checksum_address(TOKENS.get(value, value))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Route a swap over up to 3 pools using local quotes')
+    parser.add_argument('--token_in', required=True, help='Token symbol (USDT, UETH, feUSD) or address')
+    parser.add_argument('--token_out', required=True, help='Token symbol (USDT, UETH, feUSD) or address')
+    parser.add_argument('--amount', required=True, help='Amount to swap (in human-readable format)')
+    parser.add_argument('--k', type=int, default=3, help='Number of best paths to show')
+    parser.add_argument('--max_hops', type=int, default=3, help='Maximum pools per path')
+    parser.add_argument('--slippage', type=Decimal, default=Decimal('0.005'), help='Allowed slippage per hop')
+    parser.add_argument('--deadline', type=int, default=3600, help='Deadline in seconds from now')
+    parser.add_argument('--source', choices=['indexer', 'factories'], default='indexer',
+                        help='Where the pool list comes from')
+    parser.add_argument('--dry_run', action='store_true', help='Only print the paths')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    if not w3.is_connected():
+        raise Exception("Failed to connect to Ethereum node")
+
+    pools = dict(KNOWN_POOLS)
+    pools.update(factory_pools(w3) if args.source == 'factories' else indexed_pools())
+    registry = build_registry(w3, pools)
+    print(f"Registry: {len(registry.states)} pools, {len(registry.graph)} tokens")
+
+    token_in = _token_address(args.token_in)
+    token_out = _token_address(args.token_out)
+    erc20_abi = load_abi("erc20")
+    token_in_decimals = w3.eth.contract(address=token_in, abi=erc20_abi).functions.decimals().call()
+    amount_in = int(Decimal(args.amount) * Decimal(10 ** token_in_decimals))
+
+    start = time.time()
+    best = registry.best_paths(token_in, token_out, amount_in, args.k, args.max_hops)
+    print(f"Path search took {(time.time() - start) * 1000:.1f} ms")
+    if not best:
+        raise Exception(f"No route from {token_in} to {token_out}")
+    for amount_out, path in best:
+        print(f"  out {amount_out}: " + " -> ".join(f"{p[1][:8]}..[{p[0][:8]}]" for p in path) + f" -> {token_out[:8]}")
+    if args.dry_run:
+        return
+
+    private_key = os.getenv("PRIVATE_KEY")
+    if not private_key:
+        raise Exception("Private key not found in environment variables")
+    account = Account.from_key(private_key)
+
+    _expected_out, path = best[0]
+    router_contract = w3.eth.contract(address=ROUTER_ADDRESS, abi=load_abi("router"))
+    permit2_contract = w3.eth.contract(address=PERMIT2_ADDRESS, abi=load_abi("permit2"))
+    clock = ChainClock(w3)
+    clock.sync()
+    deadline = clock.deadline(args.deadline)
+    calls, amounts_in, min_amount_out = build_path_calls(
+        router_contract, path, amount_in, args.slippage, deadline, registry
+    )
+
+    # One Permit2 detail per distinct token spent along the path
+    spend = {}
+    for (pool, hop_token_in, hop_token_out), hop_amount in zip(path, amounts_in):
+        spend[hop_token_in] = spend.get(hop_token_in, 0) + hop_amount
+    details = []
+    for token, amount in spend.items():
+        _amount, _expiration, nonce = permit2_contract.functions.allowance(account.address, token, ROUTER_ADDRESS).call()
+        details.append({"token": token, "amount": amount, "expiration": deadline, "nonce": nonce})
+    permit2_batch = {"details": details, "spender": ROUTER_ADDRESS, "sigDeadline": deadline}
+
+    typed_data = permit2_batch_typed_data(w3.eth.chain_id, permit2_batch)
+    signed_message = account.sign_typed_data(
+        domain_data=typed_data["domain"],
+        message_types=typed_data["types"],
+        message_data=typed_data["message"]
+    )
+
+    transaction = router_contract.functions.permitBatchAndCall(
+        [], [], permit2_batch, signed_message.signature, calls
+    ).build_transaction({
+        'from': account.address,
+        'nonce': w3.eth.get_transaction_count(account.address),
+        'gas': 300000 * len(calls),
+        'gasPrice': w3.eth.gas_price
+    })
+    print(f"Routing {amount_in} over {len(path)} hops, min out {min_amount_out}")
+    signed_tx = account.sign_transaction(transaction)
+    tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+    print(f"Transaction sent! Hash: {tx_hash.hex()}")
+    tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    print(f"Transaction status: {'Successful' if tx_receipt.status == 1 else 'Failed'}")
+
+
+if __name__ == "__main__":
+    main()
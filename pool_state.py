@@ -0,0 +1,226 @@
+import copy
+import pool_math
+from pool_math import ONE, PoolMathError
+from chain_utils import load_abi
+from multicall import batch_call, batch_call_with_block
+
+# getAmplificationParameter is not in weighted_pool_abi.json, only stable pools have it
+STABLE_POOL_ABI = [
+    {
+        "inputs": [],
+        "name": "getAmplificationParameter",
+        "outputs": [
+            {"internalType": "uint256", "name": "value", "type": "uint256"},
+            {"internalType": "bool", "name": "isUpdating", "type": "bool"},
+            {"internalType": "uint256", "name": "precision", "type": "uint256"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+
+class PoolState:
+    """
+    Local snapshot of a Balancer v3 weighted or stable pool.
+
+    Balances are kept raw and as live scaled18 values (decimals and token rate applied),
+    quotes follow the Vault: fee taken from the amount in, pool math on scaled18,
+    result converted back to raw rounding against the user.
+    """
+
+    def __init__(self, address, kind, tokens, decimals, balances_raw, token_rates, swap_fee,
+                 total_supply, weights=None, amp=None, aggregate_swap_fee=0, block_number=None):
+        self.address = address
+        self.kind = kind
+        self.tokens = list(tokens)
+        self.decimals = list(decimals)
+        self.scaling_factors = [10 ** (18 - d) for d in decimals]
+        self.token_rates = list(token_rates)
+        self.balances_raw = list(balances_raw)
+        self.swap_fee = swap_fee
+        self.aggregate_swap_fee = aggregate_swap_fee
+        self.total_supply = total_supply
+        self.weights = list(weights) if weights is not None else None
+        self.amp = amp
+        self.block_number = block_number
+
+    def __repr__(self):
+        return f"PoolState({self.address}, {self.kind}, balances={self.balances_raw}, block={self.block_number})"
+
+    def copy(self):
+        return copy.deepcopy(self)
+
+    def index(self, token):
+        token = token.lower()
+        for i, t in enumerate(self.tokens):
+            if t.lower() == token:
+                return i
+        raise PoolMathError(f"InvalidToken {token} for pool {self.address}")
+
+    def has_tokens(self, *tokens):
+        addresses = {t.lower() for t in self.tokens}
+        return all(t.lower() in addresses for t in tokens)
+
+    # Scaling
+
+    def to_scaled18(self, i, raw):
+        return raw * self.scaling_factors[i] * self.token_rates[i] // ONE
+
+    def to_scaled18_up(self, i, raw):
+        return pool_math.mul_div_up(raw, self.scaling_factors[i] * self.token_rates[i], ONE)
+
+    def to_raw(self, i, scaled):
+        return scaled * ONE // (self.scaling_factors[i] * self.token_rates[i])
+
+    def to_raw_up(self, i, scaled):
+        return pool_math.mul_div_up(scaled, ONE, self.scaling_factors[i] * self.token_rates[i])
+
+    @property
+    def balances_live(self):
+        return [self.to_scaled18(i, b) for i, b in enumerate(self.balances_raw)]
+
+    # Pool callbacks (same interface the contracts expose to the Vault)
+
+    def compute_invariant(self, balances, round_up=False):
+        if self.kind == "weighted":
+            if round_up:
+                return pool_math.weighted_invariant_up(self.weights, balances)
+            return pool_math.weighted_invariant_down(self.weights, balances)
+        invariant = pool_math.stable_invariant(self.amp, balances)
+        return invariant + 1 if round_up and invariant > 0 else invariant
+
+    def compute_balance(self, balances, token_index, invariant_ratio):
+        if self.kind == "weighted":
+            return pool_math.weighted_balance_given_invariant(
+                balances[token_index], self.weights[token_index], invariant_ratio
+            )
+        invariant = pool_math.mul_up(self.compute_invariant(balances, round_up=True), invariant_ratio)
+        return pool_math.stable_balance(self.amp, balances, invariant, token_index)
+
+    def on_swap_exact_in(self, balances, i, o, amount_in_scaled):
+        if self.kind == "weighted":
+            return pool_math.weighted_out_given_exact_in(
+                balances[i], self.weights[i], balances[o], self.weights[o], amount_in_scaled
+            )
+        invariant = self.compute_invariant(balances)
+        return pool_math.stable_out_given_exact_in(self.amp, balances, i, o, amount_in_scaled, invariant)
+
+    def on_swap_exact_out(self, balances, i, o, amount_out_scaled):
+        if self.kind == "weighted":
+            return pool_math.weighted_in_given_exact_out(
+                balances[i], self.weights[i], balances[o], self.weights[o], amount_out_scaled
+            )
+        invariant = self.compute_invariant(balances)
+        return pool_math.stable_in_given_exact_out(self.amp, balances, i, o, amount_out_scaled, invariant)
+
+    # Quotes in raw token units
+
+    def quote_exact_in(self, token_in, token_out, amount_in):
+        """Raw amount out for swapSingleTokenExactIn"""
+        i, o = self.index(token_in), self.index(token_out)
+        amount_scaled = self.to_scaled18(i, amount_in)
+        amount_scaled -= pool_math.mul_up(amount_scaled, self.swap_fee)
+        out_scaled = self.on_swap_exact_in(self.balances_live, i, o, amount_scaled)
+        return self.to_raw(o, out_scaled)
+
+    def quote_exact_out(self, token_in, token_out, amount_out):
+        """Raw amount in for swapSingleTokenExactOut"""
+        i, o = self.index(token_in), self.index(token_out)
+        out_scaled = self.to_scaled18_up(o, amount_out)
+        in_scaled = self.on_swap_exact_out(self.balances_live, i, o, out_scaled)
+        in_scaled = pool_math.div_up(in_scaled, pool_math.complement(self.swap_fee))
+        return self.to_raw_up(i, in_scaled)
+
+    def spot_price(self, token_in, token_out):
+        """Marginal human units of token_out per token_in, fee excluded"""
+        i, o = self.index(token_in), self.index(token_out)
+        live = self.balances_live
+        if self.kind == "weighted":
+            price = (live[o] * self.weights[i]) / (live[i] * self.weights[o])
+        else:
+            # Numerical derivative of the invariant curve on a tiny trade
+            size = max(live[i] // 10**9, 1)
+            price = self.on_swap_exact_in(live, i, o, size) / size
+        # Scaled18 values already carry the decimals, undo the token rates to get token units
+        return price * self.token_rates[i] / self.token_rates[o]
+
+    def apply_swap(self, token_in, token_out, amount_in, amount_out):
+        """Move balances as the Vault would after a swap (protocol share of the fee leaves the pool)"""
+        i, o = self.index(token_in), self.index(token_out)
+        fee = pool_math.mul_up(amount_in, self.swap_fee)
+        self.balances_raw[i] += amount_in - pool_math.mul_down(fee, self.aggregate_swap_fee)
+        self.balances_raw[o] -= amount_out
+
+
+# Tokens, decimals, kind and weights never change for a pool, read them once per process
+_static_info = {}
+
+
+def pool_static_info(w3, pool_address, kind=None):
+    """Tokens, decimals, kind and weights of a pool (two batched reads the first time, cached after)"""
+    if pool_address not in _static_info:
+        pool_contract = w3.eth.contract(address=pool_address, abi=load_abi("weighted_pool"))
+        stable_contract = w3.eth.contract(address=pool_address, abi=STABLE_POOL_ABI)
+        tokens, weights, amp = batch_call(w3, [
+            pool_contract.functions.getTokens(),
+            pool_contract.functions.getNormalizedWeights(),
+            stable_contract.functions.getAmplificationParameter(),
+        ])
+        if tokens is None:
+            raise Exception(f"{pool_address} is not a Balancer v3 pool")
+        if kind is None:
+            kind = "weighted" if weights is not None else "stable"
+        erc20_abi = load_abi("erc20")
+        decimals = batch_call(w3, [w3.eth.contract(address=t, abi=erc20_abi).functions.decimals() for t in tokens])
+        _static_info[pool_address] = {
+            "tokens": list(tokens),
+            "decimals": list(decimals),
+            "kind": kind,
+            "weights": list(weights) if kind == "weighted" else None,
+        }
+    return _static_info[pool_address]
+
+
+def pool_state_calls(w3, pool_address, static):
+    """The calls that read a pool's changing state, to be batched with other reads"""
+    pool_contract = w3.eth.contract(address=pool_address, abi=load_abi("weighted_pool"))
+    calls = [
+        pool_contract.functions.getTokenInfo(),
+        pool_contract.functions.getCurrentLiveBalances(),
+        pool_contract.functions.getStaticSwapFeePercentage(),
+        pool_contract.functions.getAggregateFeePercentages(),
+        pool_contract.functions.totalSupply(),
+    ]
+    if static["kind"] == "stable":
+        stable_contract = w3.eth.contract(address=pool_address, abi=STABLE_POOL_ABI)
+        calls.append(stable_contract.functions.getAmplificationParameter())
+    return calls
+
+
+def pool_state_from_results(pool_address, static, results, block_number=None):
+    """Build a PoolState from the results of pool_state_calls"""
+    token_info, balances_live, swap_fee, aggregate_fees, total_supply = results[:5]
+    if token_info is None or balances_live is None:
+        raise Exception(f"Failed to read state of pool {pool_address}")
+    _tokens, _token_info, balances_raw, _last_live = token_info
+    decimals = static["decimals"]
+
+    # Rates are implied by live vs raw balances, which saves a rate provider call per token
+    token_rates = []
+    for raw, live, d in zip(balances_raw, balances_live, decimals):
+        token_rates.append(live * ONE // (raw * 10 ** (18 - d)) if raw else ONE)
+
+    amp = results[5][0] if static["kind"] == "stable" else None
+    return PoolState(
+        pool_address, static["kind"], static["tokens"], decimals, balances_raw, token_rates, swap_fee,
+        total_supply, weights=static["weights"], amp=amp, aggregate_swap_fee=aggregate_fees[0],
+        block_number=block_number
+    )
+
+
+def fetch_pool_state(w3, pool_address, kind=None, block_identifier='latest'):
+    """Read everything the local math needs from a pool contract in one batched call"""
+    static = pool_static_info(w3, pool_address, kind)
+    block_number, results = batch_call_with_block(w3, pool_state_calls(w3, pool_address, static), block_identifier)
+    return pool_state_from_results(pool_address, static, results, block_number)
@@ -0,0 +1,402 @@
+from web3 import Web3
+import argparse
+import json
+import os
+import sqlite3
+import time
+import numpy as np
+from eth_abi import decode
+from eth_account import Account
+from dotenv import load_dotenv
+import pool_math
+from chain_utils import HYPEREVM_RPC_URL, KNOWN_POOLS, WEIGHTED_FACTORY_ADDRESS, load_abi
+from event_indexer import (
+    LIQUIDITY_ADDED, LIQUIDITY_REMOVED, SWAP, TRANSFER, _address_from_topic, _address_topic, get_logs_adaptive
+)
+from hypercore_reader import HyperCoreReader
+from multicall import batch_call_with_block
+from pool_state import pool_state_calls, pool_state_from_results, pool_static_info
+from rpc_scheduler import ScheduledHTTPProvider
+
+load_dotenv()
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+class PoolPosition:
+    """
+    Our BPT in one pool with the pool state it is valued against. held is what we would
+    have if we had kept the deposited tokens instead (reduced pro rata when BPT leaves),
+    fees is our share of the LP swap fees, both raw per pool token.
+    """
+
+    def __init__(self, state, bpt_balance):
+        self.state = state
+        self.bpt_balance = bpt_balance
+        self.held = [0] * len(state.tokens)
+        self.fees = [0.0] * len(state.tokens)
+
+    @property
+    def pool(self):
+        return self.state.address
+
+    @property
+    def share(self):
+        return self.bpt_balance / self.state.total_supply if self.state.total_supply else 0.0
+
+    def amounts(self):
+        """Raw pool tokens our BPT is a claim on"""
+        return [self.share * b for b in self.state.balances_raw]
+
+    def __repr__(self):
+        return f"PoolPosition({self.pool}, bpt={self.bpt_balance}, share={self.share:.6%})"
+
+
+def read_pool_positions(w3, wallet, pools, block_identifier='latest'):
+    """Pool states and our BPT balance in every pool, one batched read. Returns (block, {pool: PoolPosition})"""
+    statics, calls, layout = {}, [], []
+    for pool in pools:
+        statics[pool] = pool_static_info(w3, pool, KNOWN_POOLS.get(pool))
+        pool_contract = w3.eth.contract(address=pool, abi=load_abi("weighted_pool"))
+        state_calls = pool_state_calls(w3, pool, statics[pool])
+        layout.append((pool, len(state_calls)))
+        calls += state_calls + [pool_contract.functions.balanceOf(wallet)]
+
+    block_number, results = batch_call_with_block(w3, calls, block_identifier)
+    positions, offset = {}, 0
+    for pool, state_count in layout:
+        state = pool_state_from_results(pool, statics[pool], results[offset:offset + state_count], block_number)
+        positions[pool] = PoolPosition(state, results[offset + state_count] or 0)
+        offset += state_count + 1
+    return block_number, positions
+
+
+class PositionTracker:
+    """
+    LP positions of one wallet, kept current from Vault and BPT events.
+
+    Swaps and liquidity changes are applied to the local pool states as they are
+    indexed, nothing is re-read. Exposure, held amounts and fees are also kept as
+    per-token totals across all pools and only touched pools are folded back in, so a
+    block costs two eth_getLogs, one price read and a dot product over tokens, whatever
+    the number of pools. Token rates are those of the initial read (resync() re-reads).
+    """
+
+    def __init__(self, w3, wallet, pools, prices=None, db_path="pool_events.db", vault_address=None):
+        self.w3 = w3
+        self.wallet = Web3.to_checksum_address(wallet)
+        self.pools = [Web3.to_checksum_address(p) for p in pools]
+        self.prices = prices or HyperCoreReader(w3).usd_prices
+        if vault_address is None:
+            factory = w3.eth.contract(address=WEIGHTED_FACTORY_ADDRESS, abi=load_abi("weighted_factory"))
+            vault_address = factory.functions.getVault().call()
+        self.vault_address = vault_address
+        self.db_path = db_path
+        self.last_block = None
+        self.positions = {}
+        self.last_report = None
+        self.indexed = False
+        # Pools whose BPT balance has no known deposit behind all of it, hold and IL are not reported for them
+        self.uncovered = set()
+
+        self.tokens = list(dict.fromkeys(t for pool in self.pools for t in pool_static_info(w3, pool)["tokens"]))
+        self.token_index = {t: k for k, t in enumerate(self.tokens)}
+        self.scales = np.array([10.0 ** d for d in self._token_decimals()])
+        # Per-token totals (human units) and each pool's contribution to them
+        self.exposure = np.zeros(len(self.tokens))
+        self.held = np.zeros(len(self.tokens))
+        self.fees = np.zeros(len(self.tokens))
+        self.contributions = {}
+        self.load()
+
+    def _token_decimals(self):
+        decimals = {}
+        for pool in self.pools:
+            static = pool_static_info(self.w3, pool)
+            decimals.update(zip(static["tokens"], static["decimals"]))
+        return [decimals[t] for t in self.tokens]
+
+    # Seeding
+
+    def load(self):
+        """Positions as of the last indexed block, held amounts and fees from the indexed history"""
+        start = self._last_indexed_block()
+        self.indexed = start is not None
+        if start is None:
+            start = self.w3.eth.block_number
+        # Replay on empty states: BPT, supply and balances are rebuilt from the events
+        _block, current = read_pool_positions(self.w3, self.wallet, self.pools, start)
+        for pool, position in current.items():
+            replay = position.state.copy()
+            replay.balances_raw = [0] * len(replay.tokens)
+            replay.total_supply = 0
+            self.positions[pool] = PoolPosition(replay, 0)
+        self._replay_db(start)
+        # The read at the start block is authoritative for balances, replay only supplies held and fees
+        for pool, position in current.items():
+            position.held = self.positions[pool].held
+            position.fees = self.positions[pool].fees
+            self.positions[pool] = position
+        self.last_block = start
+        self.uncovered = set() if self.indexed else {pool for pool, p in self.positions.items() if p.bpt_balance}
+        self.exposure[:] = self.held[:] = self.fees[:] = 0
+        self.contributions = {}
+        self._fold(self.pools)
+
+    def seed_held(self, receipt):
+        """
+        Held amounts from our LiquidityAdded events in a receipt, for a position joined with
+        no indexed history (load() starts at the head then and never sees the deposit).
+        With indexed history sync() replays the deposit and this does nothing. A pool only
+        counts as covered when the receipt minted all of our BPT in it, BPT we held before
+        has no deposit to compare against.
+        """
+        if self.indexed:
+            return
+        touched, minted = set(), {}
+        for log in receipt.logs:
+            address, topic0 = Web3.to_checksum_address(log['address']), bytes(log['topics'][0])
+            if address == self.vault_address and topic0 == bytes(LIQUIDITY_ADDED):
+                pool, _handler, args = self._decode(log)
+                if pool in self.positions and args[2] == self.wallet:
+                    position = self.positions[pool]
+                    position.held = [h + a for h, a in zip(position.held, args[4])]
+                    touched.add(pool)
+            elif address in self.positions and topic0 == bytes(TRANSFER):
+                _pool, _handler, (pool, sender, recipient, value) = self._decode(log)
+                if sender == ZERO_ADDRESS and recipient == self.wallet:
+                    minted[pool] = minted.get(pool, 0) + value
+        for pool in touched:
+            if minted.get(pool, 0) >= self.positions[pool].bpt_balance:
+                self.uncovered.discard(pool)
+        self._fold(touched)
+
+    def _last_indexed_block(self):
+        if not os.path.exists(self.db_path):
+            return None
+        db = sqlite3.connect(self.db_path)
+        row = db.execute("SELECT block_number FROM progress WHERE name = 'indexed'").fetchone()
+        db.close()
+        return row[0] if row else None
+
+    def _replay_db(self, to_block):
+        if not os.path.exists(self.db_path):
+            return
+        db = sqlite3.connect(self.db_path)
+        marks = ",".join("?" * len(self.pools))
+        events = []
+        for row in db.execute(f"SELECT * FROM swaps WHERE pool IN ({marks}) AND block_number <= ?", (*self.pools, to_block)):
+            pool, block, index, _tx, token_in, token_out, amount_in, amount_out, fee_pct, fee_amount = row
+            events.append((block, index, self._on_swap,
+                           (pool, token_in, token_out, int(amount_in), int(amount_out), int(fee_pct), int(fee_amount))))
+        for row in db.execute(f"SELECT * FROM liquidity WHERE pool IN ({marks}) AND block_number <= ?", (*self.pools, to_block)):
+            pool, block, index, _tx, direction, provider, _kind, supply, amounts, fee_amounts = row
+            events.append((block, index, self._on_liquidity,
+                           (pool, direction, provider, int(supply),
+                            [int(a) for a in json.loads(amounts)], [int(a) for a in json.loads(fee_amounts)])))
+        for row in db.execute(f"SELECT * FROM transfers WHERE pool IN ({marks}) AND block_number <= ?", (*self.pools, to_block)):
+            pool, block, index, _tx, sender, recipient, value = row
+            events.append((block, index, self._on_transfer, (pool, sender, recipient, int(value))))
+        db.close()
+        for _block, _index, handler, args in sorted(events, key=lambda e: (e[0], e[1])):
+            handler(*args)
+
+    # Event handlers (same for indexed rows and live logs)
+
+    def _on_swap(self, pool, token_in, token_out, amount_in, amount_out, fee_pct, fee_amount):
+        position = self.positions[pool]
+        state = position.state
+        i, o = state.index(token_in), state.index(token_out)
+        aggregate_fee = pool_math.mul_down(fee_amount, state.aggregate_swap_fee)
+        position.fees[i] += (fee_amount - aggregate_fee) * position.share
+        state.balances_raw[i] += amount_in - aggregate_fee
+        state.balances_raw[o] -= amount_out
+        state.swap_fee = fee_pct
+
+    def _on_liquidity(self, pool, direction, provider, total_supply, amounts, fee_amounts):
+        position = self.positions[pool]
+        state = position.state
+        # Only the aggregate share of the fee leaves the pool, the rest stays with LPs as on a swap
+        aggregate_fees = [pool_math.mul_down(f, state.aggregate_swap_fee) for f in fee_amounts]
+        for i, (f, aggregate_fee) in enumerate(zip(fee_amounts, aggregate_fees)):
+            position.fees[i] += (f - aggregate_fee) * position.share
+        if direction == "add":
+            state.balances_raw = [b + a - f for b, a, f in zip(state.balances_raw, amounts, aggregate_fees)]
+            if provider == self.wallet:
+                position.held = [h + a for h, a in zip(position.held, amounts)]
+        else:
+            state.balances_raw = [b - a - f for b, a, f in zip(state.balances_raw, amounts, aggregate_fees)]
+        state.total_supply = total_supply
+
+    def _on_transfer(self, pool, sender, recipient, value):
+        position = self.positions[pool]
+        if sender == self.wallet and position.bpt_balance:
+            # Held amounts leave with the BPT pro rata, whether burned or sent away
+            kept = 1 - value / position.bpt_balance
+            position.held = [int(h * kept) for h in position.held]
+            position.bpt_balance -= value
+        if recipient == self.wallet:
+            if sender != ZERO_ADDRESS:
+                # BPT received from someone else counts as a deposit of what it is a claim on
+                share = value / position.state.total_supply if position.state.total_supply else 0
+                position.held = [int(h + share * b) for h, b in zip(position.held, position.state.balances_raw)]
+            position.bpt_balance += value
+
+    # Per-block update
+
+    def _fold(self, pools):
+        """Replace the contribution of the given pools in the per-token totals"""
+        for pool in pools:
+            position = self.positions[pool]
+            index = [self.token_index[t] for t in position.state.tokens]
+            contribution = (
+                np.array(position.amounts()) / self.scales[index],
+                np.array(position.held, dtype=float) / self.scales[index],
+                np.array(position.fees) / self.scales[index],
+            )
+            old = self.contributions.get(pool)
+            for total, new, previous in zip((self.exposure, self.held, self.fees), contribution, old or (0, 0, 0)):
+                total[index] += new - previous
+            self.contributions[pool] = contribution
+
+    def _decode(self, log):
+        topic0 = bytes(log['topics'][0])
+        if topic0 == bytes(TRANSFER):
+            (value,) = decode(['uint256'], bytes(log['data']))
+            pool = Web3.to_checksum_address(log['address'])
+            return pool, self._on_transfer, (pool, _address_from_topic(log['topics'][1]), _address_from_topic(log['topics'][2]), value)
+        pool = _address_from_topic(log['topics'][1])
+        if topic0 == bytes(SWAP):
+            amount_in, amount_out, fee_pct, fee_amount = decode(['uint256'] * 4, bytes(log['data']))
+            return pool, self._on_swap, (pool, _address_from_topic(log['topics'][2]), _address_from_topic(log['topics'][3]),
+                                         amount_in, amount_out, fee_pct, fee_amount)
+        direction = "add" if topic0 == bytes(LIQUIDITY_ADDED) else "remove"
+        total_supply, amounts, fee_amounts = decode(['uint256', 'uint256[]', 'uint256[]'], bytes(log['data']))
+        return pool, self._on_liquidity, (pool, direction, _address_from_topic(log['topics'][2]), total_supply,
+                                          list(amounts), list(fee_amounts))
+
+    def sync(self):
+        """Apply the events since the last block and revalue, returns the report"""
+        head = self.w3.eth.block_number
+        if head > self.last_block:
+            vault_logs = get_logs_adaptive(self.w3, {
+                'address': self.vault_address,
+                'topics': [
+                    [Web3.to_hex(SWAP), Web3.to_hex(LIQUIDITY_ADDED), Web3.to_hex(LIQUIDITY_REMOVED)],
+                    [_address_topic(p) for p in self.pools]
+                ]
+            }, self.last_block + 1, head)
+            transfer_logs = get_logs_adaptive(self.w3, {
+                'address': self.pools, 'topics': [Web3.to_hex(TRANSFER)]
+            }, self.last_block + 1, head)
+            touched = set()
+            for log in sorted(vault_logs + transfer_logs, key=lambda log: (log['blockNumber'], log['logIndex'])):
+                pool, handler, args = self._decode(log)
+                handler(*args)
+                touched.add(pool)
+            self._fold(touched)
+            self.last_block = head
+        self.last_report = self.report()
+        return self.last_report
+
+    def resync(self):
+        """Re-read every pool and BPT balance (picks up rate and fee setting changes), keeps held and fees"""
+        block_number, current = read_pool_positions(self.w3, self.wallet, self.pools, self.last_block)
+        for pool, position in current.items():
+            position.held = self.positions[pool].held
+            position.fees = self.positions[pool].fees
+            self.positions[pool] = position
+        self._fold(self.pools)
+
+    # Valuation
+
+    def _price_vector(self):
+        prices = self.prices(self.tokens, self.last_block)
+        return np.array([float(prices[t]) for t in self.tokens])
+
+    def report(self):
+        """
+        Value of the LP positions against holding the deposits, in the price unit (USD).
+        Hold and IL are None while any pool is uncovered (listed under "uncovered").
+        """
+        prices = self._price_vector()
+        value = float(self.exposure @ prices)
+        hold_value = None if self.uncovered else float(self.held @ prices)
+        fees_value = float(self.fees @ prices)
+        return {
+            "block": self.last_block,
+            "value": value,
+            "hold_value": hold_value,
+            "fees_value": fees_value,
+            # LP against hold, with and without the fees the pool paid us
+            "impermanent_loss": _loss(value, hold_value),
+            "impermanent_loss_ex_fees": _loss(value - fees_value, hold_value),
+            "uncovered": sorted(self.uncovered),
+        }
+
+    def pool_report(self, pool):
+        """Same figures for one pool"""
+        position = self.positions[pool]
+        prices = self._price_vector()[[self.token_index[t] for t in position.state.tokens]]
+        exposure, held, fees = self.contributions[pool]
+        value, hold_value, fees_value = float(exposure @ prices), float(held @ prices), float(fees @ prices)
+        if pool in self.uncovered:
+            hold_value = None
+        return {
+            "pool": pool,
+            "bpt_balance": position.bpt_balance,
+            "share": position.share,
+            "swap_fee": position.state.swap_fee / pool_math.ONE,
+            "aggregate_swap_fee": position.state.aggregate_swap_fee / pool_math.ONE,
+            "value": value,
+            "hold_value": hold_value,
+            "fees_value": fees_value,
+            "impermanent_loss": _loss(value, hold_value),
+        }
+
+    def follow(self, on_block=None, poll_interval=0.5):
+        """Revalue on every new head, on_block(report) after each"""
+        while True:
+            previous = self.last_block
+            report = self.sync()
+            if self.last_block > previous and on_block:
+                on_block(report)
+            time.sleep(poll_interval)
+
+
+def _loss(value, hold_value):
+    if hold_value is None:
+        return None
+    return value / hold_value - 1 if hold_value else 0.0
+
+
+def format_report(report):
+    if report['hold_value'] is None:
+        return (f"Block {report['block']}: value ${report['value']:,.2f}, fees ${report['fees_value']:,.2f}, "
+                f"no hold or IL ({len(report['uncovered'])} pool(s) hold BPT with no known deposit)")
+    return (f"Block {report['block']}: value ${report['value']:,.2f}, hold ${report['hold_value']:,.2f}, "
+            f"fees ${report['fees_value']:,.2f}, IL {report['impermanent_loss']:+.4%} "
+            f"(ex fees {report['impermanent_loss_ex_fees']:+.4%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Track LP position value, impermanent loss and fees earned')
+    parser.add_argument('--wallet', help='Wallet to track (default: PRIVATE_KEY account)')
+    parser.add_argument('--pools', help='Comma separated pool addresses (default: our pools)')
+    parser.add_argument('--db', default='pool_events.db', help='Event indexer database with the position history')
+    parser.add_argument('--follow', action='store_true', help='Keep revaluing on every new block')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    wallet = args.wallet or Account.from_key(os.getenv("PRIVATE_KEY")).address
+    pools = args.pools.split(",") if args.pools else list(KNOWN_POOLS)
+    tracker = PositionTracker(w3, wallet, pools, db_path=args.db)
+    print(format_report(tracker.sync()))
+    for pool in tracker.pools:
+        print(tracker.pool_report(pool))
+    if args.follow:
+        tracker.follow(lambda report: print(format_report(report)))
+
+
+if __name__ == "__main__":
+    main()
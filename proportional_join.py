@@ -1,4 +1,9 @@
 from web3 import Web3
+from rpc_scheduler import ScheduledHTTPProvider
+from permit2_tracker import Permit2Tracker
+from chain_clock import ChainClock
+from join_planner import plan_join, read_join_inputs
+from position_tracker import PositionTracker, format_report
 import json
 import os
 from eth_account import Account
@@ -7,7 +12,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 base_rpc_url = "https://rpc.hyperliquid.xyz/evm"
-w3 = Web3(Web3.HTTPProvider(base_rpc_url))
+w3 = Web3(ScheduledHTTPProvider(base_rpc_url))
 
 pool_address = "0xb537c62307D25F1eb70b720F5850B8C638240F1B"
 router_address = "0xA8920455934Da4D853faac1f94Fe7bEf72943eF1"
@@ -24,11 +29,6 @@ print(f"Using wallet: {wallet_address}")
 token_a_address = "0xB8CE59FC3717ada4C02eaDF9682A9e934F625ebb"
 token_b_address = "0xBe6727B535545C67d5cAa73dEa54865B92CF7907"
 
-# Specify the desired BPT amount you want to receive
-# If you want a specific amount of BPT tokens, set this value
-# For example, 1 BPT with 18 decimals would be 1 * 10^18
-desired_bpt_amount = 50000000000000000  # 1 BPT with 18 decimals
-
 # Load the pool ABI
 with open('weighted_pool_abi.json', 'r') as f:
     pool_abi = json.load(f)
@@ -43,34 +43,19 @@ with open('router_abi.json', 'r') as f:
 # Initialize the router contract
 router_contract = w3.eth.contract(address=router_address, abi=router_abi)
 
-# First, call queryAddLiquidityProportional to get the token amounts needed
-try:
-    print(f"Querying for token amounts needed for {desired_bpt_amount} BPT...")
-    query_result = router_contract.functions.queryAddLiquidityProportional(
-        pool_address,
-        desired_bpt_amount,
-        "0x0000000000000000000000000000000000000000",
-        "0x"
-    ).call()
-    
-    # query_result should contain the token amounts needed
-    # The structure depends on the contract implementation, but it might be an array of token amounts
-    print(f"Query result: {query_result}")
-    
-    # Extract token amounts from the query result
-    # The exact structure might need adjustment based on the actual return value
-    token_amounts = query_result
-    token_a_amount = token_amounts[0]
-    token_b_amount = token_amounts[1]
-    
-    print(f"Token A amount needed: {token_a_amount}")
-    print(f"Token B amount needed: {token_b_amount}")
-except Exception as e:
-    print(f"Error querying add liquidity proportional: {e}")
-    # Fallback to default values if query fails
-    # token_a_amount = 1000000000000000
-    # token_b_amount = 1000000  # Default fallback amount
-    # print(f"Using fallback amounts - Token A: {token_a_amount}, Token B: {token_b_amount}")
+# Size the join from one batched read of pool and wallet balances: the largest proportional
+# BPT amount the wallet can afford, with amounts rounded up exactly like the Vault
+join_inputs = read_join_inputs(w3, pool_address, wallet_address, router_address)
+join_plan = plan_join(join_inputs)
+desired_bpt_amount = join_plan.bpt_out
+if desired_bpt_amount == 0:
+    raise Exception("Wallet balances are too small to join this pool")
+# Maximums carry a small buffer over the exact amounts, a swap landing first must not revert the join
+token_a_amount, token_b_amount = join_plan.max_amounts_in
+
+print(f"BPT amount out: {desired_bpt_amount}")
+print(f"Token A max amount in: {token_a_amount}")
+print(f"Token B max amount in: {token_b_amount}")
 
 # Load token ABIs
 with open('erc20_abi.json', 'r') as f:
@@ -148,20 +133,17 @@ else:
 # Initialize permit2 contract
 permit2_contract = w3.eth.contract(address=permit2_address, abi=permit2_abi)
 
-# Query current allowances from Permit2 contract
-try:
-    token_a_allowance = permit2_contract.functions.allowance(wallet_address, token_a_address, router_address).call()
-    token_a_nonce = token_a_allowance[2]  # Extract nonce from allowance tuple
-    print(f"Token A Permit2 allowance: {token_a_allowance}, Nonce: {token_a_nonce}")
-except Exception as e:
-    print(f"Error getting Token A Permit2 allowance: {e}")
-
-try:
-    token_b_allowance = permit2_contract.functions.allowance(wallet_address, token_b_address, router_address).call()
-    token_b_nonce = token_b_allowance[2]  # Extract nonce from allowance tuple
-    print(f"Token B Permit2 allowance: {token_b_allowance}, Nonce: {token_b_nonce}")
-except Exception as e:
-    print(f"Error getting Token B Permit2 allowance: {e}")
+# Permit2 nonces come from the local tracker: one batched read for both tokens, and a failed
+# read stops the script here instead of leaving the nonces undefined
+permit2_tracker = Permit2Tracker(w3, permit2_address)
+permit2_tracker.seed([
+    (wallet_address, token_a_address, router_address),
+    (wallet_address, token_b_address, router_address)
+])
+token_a_nonce = permit2_tracker.next_nonce(wallet_address, token_a_address, router_address)
+token_b_nonce = permit2_tracker.next_nonce(wallet_address, token_b_address, router_address)
+print(f"Token A Permit2 nonce: {token_a_nonce}")
+print(f"Token B Permit2 nonce: {token_b_nonce}")
 
 # Parameters for addLiquidityProportional
 add_liquidity_proportional_params = {
@@ -181,23 +163,28 @@ add_liquidity_proportional_calldata = router_contract.functions.addLiquidityProp
     add_liquidity_proportional_params["userData"]
 ).build_transaction({'gas': 0, 'gasPrice': 0, 'nonce': 0})['data']
 
+# The allowance and signature only need to outlive this transaction, derived from the local chain clock
+chain_clock = ChainClock(w3)
+permit2_expiration = chain_clock.expiration(3600)
+sig_deadline = chain_clock.sig_deadline(600)
+
 permit2_batch = {
     "details": [
         {
             "token": token_a_address,
             "amount": token_a_amount,
-            "expiration": 281474976710655,
+            "expiration": permit2_expiration,
             "nonce": token_a_nonce
         },
         {
             "token": token_b_address,
             "amount": token_b_amount,
-            "expiration": 281474976710655,
+            "expiration": permit2_expiration,
             "nonce": token_b_nonce
         }
     ],
     "spender": router_address,
-    "sigDeadline": 115792089237316195423570985008687907853269984665640564039457584007913129639935  # Max deadline
+    "sigDeadline": sig_deadline
 }
 
 PERMIT2_DOMAIN = {
@@ -270,4 +257,14 @@ signed_tx = w3.eth.account.sign_transaction(transaction, private_key)
 tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
 print(f"Transaction sent! Hash: {tx_hash.hex()}")
 tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-print(f"Transaction status: {'Successful' if tx_receipt.status == 1 else 'Failed'}")
\ No newline at end of file
+print(f"Transaction status: {'Successful' if tx_receipt.status == 1 else 'Failed'}")
+
+# Report the position the join left us with instead of the raw BPT amount: value, impermanent
+# loss against holding the deposits and fees earned, from the indexed events. Without indexed
+# history the deposit comes from this receipt, so hold and IL are only reported when this
+# join minted all of the wallet's BPT in the pool.
+if tx_receipt.status == 1:
+    tracker = PositionTracker(w3, wallet_address, [pool_address])
+    tracker.seed_held(tx_receipt)
+    print(format_report(tracker.sync()))
+    print(tracker.pool_report(pool_address))
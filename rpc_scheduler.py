@@ -0,0 +1,199 @@
+from web3 import Web3
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+# Priority classes (lower value is served first)
+CRITICAL = 0   # transaction submission and nonce reads
+QUOTE = 1      # eth_call quotes, gas prices, estimates, receipt polling
+BULK = 2       # analytics / backfill (eth_getLogs, historical blocks)
+
+# Default priority per JSON-RPC method, anything not listed is a QUOTE
+METHOD_PRIORITIES = {
+    "eth_sendRawTransaction": CRITICAL,
+    "eth_getTransactionCount": CRITICAL,
+    "eth_chainId": CRITICAL,
+    "eth_call": QUOTE,
+    "eth_getTransactionReceipt": QUOTE,
+    "eth_estimateGas": QUOTE,
+    "eth_gasPrice": QUOTE,
+    "eth_bigBlockGasPrice": QUOTE,
+    "eth_createAccessList": QUOTE,
+    "eth_getLogs": BULK,
+    "eth_getBlockReceipts": BULK,
+    "eth_getStorageAt": BULK,
+    "eth_getProof": BULK,
+}
+
+# Error fragments returned by the public HyperEVM RPC when it throttles us
+RATE_LIMIT_MARKERS = ("429", "rate limit", "too many requests", "-32005")
+
+_local = threading.local()
+
+
+@contextmanager
+def rpc_priority(priority):
+    """Run every RPC request made by this thread inside the block at the given priority"""
+    previous = getattr(_local, "priority", None)
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+
+    def try_take(self, reserve=0):
+        """Take one token, returns 0 on success or the seconds to wait before trying again"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens - reserve >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 + reserve - self.tokens) / self.rate
+
+    def pause(self, seconds):
+        """Empty the bucket and stop handing out tokens for a while (server told us to slow down)"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, now + seconds)
+
+
+class RpcScheduler:
+    """
+    Per-endpoint request scheduler.
+
+    Callers queue by (priority, arrival order) and are released one at a time as the
+    token bucket allows, so a critical call never waits behind queued bulk reads.
+    Bulk requests also leave `bulk_reserve` tokens untouched for critical traffic.
+    """
+
+    def __init__(self, rate=10, burst=20, bulk_reserve=5, max_retries=5, backoff=1.0):
+        # A bulk request needs bulk_reserve + 1 tokens in a bucket that never holds more than burst
+        if bulk_reserve > burst - 1:
+            raise ValueError(f"bulk_reserve ({bulk_reserve}) must leave at least one token of burst ({burst})")
+        self.config = {"rate": rate, "burst": burst, "bulk_reserve": bulk_reserve,
+                       "max_retries": max_retries, "backoff": backoff}
+        self.bucket = TokenBucket(rate, burst)
+        self.bulk_reserve = bulk_reserve
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self.stats = {CRITICAL: 0, QUOTE: 0, BULK: 0, "throttled": 0}
+
+    def acquire(self, priority):
+        """Block until this caller is at the head of the queue and a token is available"""
+        ticket = (priority, next(self._seq))
+        reserve = self.bulk_reserve if priority >= BULK else 0
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                if self._waiting[0] == ticket:
+                    wait = self.bucket.try_take(reserve)
+                    if wait == 0:
+                        heapq.heappop(self._waiting)
+                        self.stats[priority] = self.stats.get(priority, 0) + 1
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def throttled(self, attempt):
+        """Called when the endpoint rejected a request for rate limiting"""
+        with self._cond:
+            self.stats["throttled"] += 1
+            self.bucket.pause(self.backoff * (2 ** attempt))
+            self._cond.notify_all()
+
+    def run(self, priority, func, *args):
+        """Run func(*args) under the rate limit, re-queueing it if the endpoint throttles us"""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(priority)
+            try:
+                response = func(*args)
+            except Exception as e:
+                if attempt < self.max_retries and is_rate_limit_error(e):
+                    self.throttled(attempt)
+                    continue
+                raise
+            if attempt < self.max_retries and isinstance(response, dict) and is_rate_limit_error(response.get("error")):
+                self.throttled(attempt)
+                continue
+            return response
+
+
+def is_rate_limit_error(error):
+    """Detect the different shapes a rate limit error takes (HTTP 429, JSON-RPC error object, message)"""
+    if not error:
+        return False
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    text = str(error).lower()
+    return any(marker in text for marker in RATE_LIMIT_MARKERS)
+
+
+# One scheduler per endpoint URL, shared by every provider in the process
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(rpc_url, **kwargs):
+    """
+    Return the shared scheduler for an endpoint, creating it on first use.
+    Settings left as None take the existing (or default) value, settings that
+    conflict with the scheduler already created for the URL raise.
+    """
+    kwargs = {k: v for k, v in kwargs.items() if v is not None}
+    with _schedulers_lock:
+        scheduler = _schedulers.get(rpc_url)
+        if scheduler is None:
+            scheduler = _schedulers[rpc_url] = RpcScheduler(**kwargs)
+            return scheduler
+        conflicts = {k: v for k, v in kwargs.items() if scheduler.config[k] != v}
+        if conflicts:
+            raise ValueError(f"Scheduler for {rpc_url} already exists with {scheduler.config}, got {conflicts}")
+        return scheduler
+
+
+class ScheduledHTTPProvider(Web3.HTTPProvider):
+    """HTTPProvider that routes every request through the endpoint's RpcScheduler"""
+
+    def __init__(self, endpoint_uri, rate=None, burst=None, bulk_reserve=None, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self.scheduler = get_scheduler(
+            str(endpoint_uri), rate=rate, burst=burst, bulk_reserve=bulk_reserve
+        )
+
+    def make_request(self, method, params):
+        priority = getattr(_local, "priority", None)
+        if priority is None:
+            priority = METHOD_PRIORITIES.get(method, QUOTE)
+        return self.scheduler.run(priority, super().make_request, method, params)
+
+
+def scheduled_web3(rpc_url, **kwargs):
+    """Web3 instance whose requests share the endpoint's rate limit with the rest of the process"""
+    return Web3(ScheduledHTTPProvider(rpc_url, **kwargs))
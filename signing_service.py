@@ -0,0 +1,218 @@
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from eth_account import Account
+from dotenv import load_dotenv
+from chain_utils import PERMIT2_ADDRESS
+
+load_dotenv()
+
+# Permit2 EIP-712 types, same definition the join scripts sign inline
+PERMIT2_TYPES = {
+    "PermitBatch": [
+        {"name": "details", "type": "PermitDetails[]"},
+        {"name": "spender", "type": "address"},
+        {"name": "sigDeadline", "type": "uint256"}
+    ],
+    "PermitDetails": [
+        {"name": "token", "type": "address"},
+        {"name": "amount", "type": "uint160"},
+        {"name": "expiration", "type": "uint48"},
+        {"name": "nonce", "type": "uint48"}
+    ]
+}
+
+
+def permit2_domain(chain_id, permit2_address=PERMIT2_ADDRESS):
+    return {
+        "name": "Permit2",
+        "chainId": chain_id,
+        "verifyingContract": permit2_address
+    }
+
+
+def permit2_batch_typed_data(chain_id, permit_batch, permit2_address=PERMIT2_ADDRESS):
+    """Typed-data payload for a Permit2 PermitBatch, ready for sign_typed_data"""
+    return {
+        "types": PERMIT2_TYPES,
+        "domain": permit2_domain(chain_id, permit2_address),
+        "primaryType": "PermitBatch",
+        "message": permit_batch
+    }
+
+
+# EIP-2612 permit, signed for BPT so the router can burn it inside permitBatchAndCall
+ERC2612_PERMIT_TYPES = {
+    "Permit": [
+        {"name": "owner", "type": "address"},
+        {"name": "spender", "type": "address"},
+        {"name": "value", "type": "uint256"},
+        {"name": "nonce", "type": "uint256"},
+        {"name": "deadline", "type": "uint256"}
+    ]
+}
+
+
+def erc2612_permit_typed_data(chain_id, token, name, version, permit):
+    """Typed-data payload for an EIP-2612 permit, permit is a router PermitApproval dict"""
+    return {
+        "types": ERC2612_PERMIT_TYPES,
+        "domain": {
+            "name": name,
+            "version": version,
+            "chainId": chain_id,
+            "verifyingContract": token
+        },
+        "primaryType": "Permit",
+        "message": {
+            "owner": permit["owner"],
+            "spender": permit["spender"],
+            "value": permit["amount"],
+            "nonce": permit["nonce"],
+            "deadline": permit["deadline"]
+        }
+    }
+
+
+# What sign_transactions returns per transaction, the fields callers use of eth_account's SignedTransaction
+SignedTx = namedtuple("SignedTx", ["raw_transaction", "hash"])
+
+
+# Worker process state: accounts are built once per worker from the keys passed
+# to the pool initializer, so tasks only carry the wallet address
+_worker_accounts = {}
+
+
+def _init_worker(private_keys):
+    for key in private_keys:
+        account = Account.from_key(key)
+        _worker_accounts[account.address.lower()] = account
+
+
+def _worker_account(address):
+    account = _worker_accounts.get(address.lower())
+    if account is None:
+        raise Exception(f"Signing worker has no key for {address}")
+    return account
+
+
+def _sign_transactions(address, transactions):
+    account = _worker_account(address)
+    signed = []
+    for tx in transactions:
+        signed_tx = account.sign_transaction(tx)
+        signed.append(SignedTx(bytes(signed_tx.raw_transaction), bytes(signed_tx.hash)))
+    return signed
+
+
+def _sign_typed_data(address, payloads):
+    account = _worker_account(address)
+    signatures = []
+    for payload in payloads:
+        signed_message = account.sign_typed_data(
+            domain_data=payload["domain"],
+            message_types={k: v for k, v in payload["types"].items() if k != "EIP712Domain"},
+            message_data=payload["message"]
+        )
+        signatures.append(bytes(signed_message.signature))
+    return signatures
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class SignedBatch:
+    """Future-like handle over the chunks of one signing request, results keep input order"""
+
+    def __init__(self, futures):
+        self.futures = futures
+
+    def done(self):
+        return all(f.done() for f in self.futures)
+
+    def result(self, timeout=None):
+        results = []
+        for future in self.futures:
+            results.extend(future.result(timeout))
+        return results
+
+
+class SigningService:
+    """
+    Process pool that signs transactions and EIP-712 payloads off the main thread.
+
+    Keys are handed to every worker once at start-up. Batches are split into chunks
+    and signed in parallel, each call returns immediately with a SignedBatch.
+    """
+
+    def __init__(self, private_keys, processes=None, chunk_size=32):
+        self.addresses = [Account.from_key(key).address for key in private_keys]
+        self.chunk_size = chunk_size
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes or os.cpu_count(),
+            initializer=_init_worker,
+            initargs=(list(private_keys),)
+        )
+
+    def sign_transactions(self, address, transactions):
+        """Sign unsigned transaction dicts, result is a list of SignedTx(raw_transaction, hash)"""
+        return SignedBatch([
+            self.executor.submit(_sign_transactions, address, chunk)
+            for chunk in _chunks(list(transactions), self.chunk_size)
+        ])
+
+    def sign_typed_data(self, address, payloads):
+        """Sign typed-data payloads ({domain, types, message}), result is a list of signatures"""
+        return SignedBatch([
+            self.executor.submit(_sign_typed_data, address, chunk)
+            for chunk in _chunks(list(payloads), self.chunk_size)
+        ])
+
+    def sign_permit2_batches(self, address, chain_id, permit_batches):
+        """Sign Permit2 PermitBatch messages for permitBatchAndCall"""
+        return self.sign_typed_data(address, [permit2_batch_typed_data(chain_id, b) for b in permit_batches])
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    private_key = os.getenv("PRIVATE_KEY")
+    if not private_key:
+        raise Exception("Private key not provided. Set PRIVATE_KEY environment variable.")
+    account = Account.from_key(private_key)
+    address = account.address
+
+    # Ladder of dummy legacy transactions to compare inline and pooled signing
+    transactions = [{
+        'to': address,
+        'value': 0,
+        'nonce': nonce,
+        'gas': 21000,
+        'gasPrice': 10**9,
+        'chainId': 999,
+    } for nonce in range(500)]
+
+    start = time.time()
+    for tx in transactions:
+        account.sign_transaction(tx)
+    print(f"Inline signing: {time.time() - start:.2f}s for {len(transactions)} transactions")
+
+    with SigningService([private_key]) as service:
+        # Warm the workers up so start-up cost is not part of the measurement
+        service.sign_transactions(address, transactions[:1]).result()
+        start = time.time()
+        signed = service.sign_transactions(address, transactions).result()
+        print(f"Pooled signing: {time.time() - start:.2f}s for {len(signed)} transactions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+from web3 import Web3
+import argparse
+import os
+import sqlite3
+from decimal import Decimal
+from eth_account import Account
+from dotenv import load_dotenv
+from chain_clock import ChainClock
+from chain_utils import HYPEREVM_RPC_URL, KNOWN_POOLS, PERMIT2_ADDRESS, ROUTER_ADDRESS, TOKENS, encode_calldata, load_abi
+from pool_math import PoolMathError
+from pool_state import fetch_pool_state
+from rpc_scheduler import ScheduledHTTPProvider
+
+load_dotenv()
+
+
+def _quote(state, token_in, token_out, amount):
+    """Local quote, None where the pool would revert (MaxInRatio and friends)"""
+    if amount <= 0:
+        return 0
+    try:
+        return state.quote_exact_in(token_in, token_out, amount)
+    except PoolMathError:
+        return None
+
+
+def _capacity(state, token_in, token_out, amount_in):
+    """Largest input (up to amount_in) the pool accepts without reverting"""
+    if _quote(state, token_in, token_out, amount_in) is not None:
+        return amount_in
+    lo, hi = 0, amount_in
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if _quote(state, token_in, token_out, mid) is None:
+            hi = mid
+        else:
+            lo = mid
+    return lo
+
+
+def _marginal(state, token_in, token_out, x, step):
+    """Marginal amount out per unit in at input x (finite difference)"""
+    q0 = _quote(state, token_in, token_out, x)
+    q1 = _quote(state, token_in, token_out, x + step)
+    if q0 is None or q1 is None:
+        return 0.0
+    return (q1 - q0) / step
+
+
+def _allocation_at(state, token_in, token_out, price, capacity, step, iterations=32):
+    """Input at which this pool's marginal price falls to `price`"""
+    if capacity <= 0 or _marginal(state, token_in, token_out, 0, step) < price:
+        return 0
+    if _marginal(state, token_in, token_out, capacity - step, step) >= price:
+        return capacity
+    lo, hi = 0, capacity
+    for _ in range(iterations):
+        mid = (lo + hi) // 2
+        if _marginal(state, token_in, token_out, mid, step) >= price:
+            lo = mid
+        else:
+            hi = mid
+        if hi - lo <= step:
+            break
+    return lo
+
+
+def optimal_split(states, token_in, token_out, amount_in, iterations=40):
+    """
+    Split amount_in across pools so every used pool ends at the same marginal price.
+
+    Bisects on the common marginal price: each pool takes the input that brings its
+    marginal price down to it, until the allocations add up to amount_in.
+    Returns a list of (state, amount_in, expected_out) legs with non-zero input.
+    """
+    states = [s for s in states if s.has_tokens(token_in, token_out)]
+    if not states:
+        raise Exception(f"No pool holds both {token_in} and {token_out}")
+    step = max(amount_in // 10**5, 1)
+    capacities = [_capacity(s, token_in, token_out, amount_in) for s in states]
+    if sum(capacities) < amount_in:
+        raise Exception(f"Pools can absorb at most {sum(capacities)} of {amount_in}")
+
+    lo = 0.0
+    hi = max(_marginal(s, token_in, token_out, 0, step) for s in states)
+    allocation = capacities
+    for _ in range(iterations):
+        price = (lo + hi) / 2
+        candidate = [_allocation_at(s, token_in, token_out, price, c, step) for s, c in zip(states, capacities)]
+        if sum(candidate) >= amount_in:
+            allocation, lo = candidate, price
+        else:
+            hi = price
+
+    # Trim the overshoot from the legs with the lowest marginal price at their allocation
+    excess = sum(allocation) - amount_in
+    order = sorted(range(len(states)), key=lambda k: _marginal(states[k], token_in, token_out, allocation[k], step))
+    for k in order:
+        if excess <= 0:
+            break
+        cut = min(excess, allocation[k])
+        allocation[k] -= cut
+        excess -= cut
+
+    legs = [
+        (state, amount, _quote(state, token_in, token_out, amount))
+        for state, amount in zip(states, allocation) if amount > 0
+    ]
+
+    # Never do worse than sending everything through the single best pool
+    singles = [(s, amount_in, _quote(s, token_in, token_out, amount_in)) for s in states]
+    singles = [leg for leg in singles if leg[2] is not None]
+    if singles:
+        best_single = max(singles, key=lambda leg: leg[2])
+        if best_single[2] >= sum(leg[2] for leg in legs):
+            return [best_single]
+    return legs
+
+
+def build_split_calls(router_contract, legs, token_in, token_out, slippage, deadline):
+    """swapSingleTokenExactIn calldata for each leg, min out = local quote less slippage"""
+    calls = []
+    for state, amount, expected_out in legs:
+        min_amount_out = int(Decimal(expected_out) * (1 - Decimal(slippage)))
+        calls.append(encode_calldata(router_contract.functions.swapSingleTokenExactIn(
+            state.address, token_in, token_out, amount, min_amount_out, deadline, False, '0x'
+        )))
+    return calls
+
+
+def load_candidate_pools(db_path="pool_events.db"):
+    """Our pools plus everything the event indexer has found, with the pool kind when known"""
+    pools = dict(KNOWN_POOLS)
+    if os.path.exists(db_path):
+        db = sqlite3.connect(db_path)
+        for address, kind in db.execute("SELECT address, kind FROM pools"):
+            pools.setdefault(address, kind)
+        db.close()
+    return pools
+
+
+def _token_address(value):
+    return Web3.to_checksum_address(TOKENS.get(value, value))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Swap through several pools of the same pair in one router multicall')
+    parser.add_argument('--token_in', required=True, help='Token symbol (USDT, UETH, feUSD) or address')
+    parser.add_argument('--token_out', required=True, help='Token symbol (USDT, UETH, feUSD) or address')
+    parser.add_argument('--amount', required=True, help='Amount to swap (in human-readable format)')
+    parser.add_argument('--slippage', type=Decimal, default=Decimal('0.005'), help='Allowed slippage per leg (0.005 = 0.5%%)')
+    parser.add_argument('--deadline', type=int, default=3600, help='Deadline in seconds from now')
+    parser.add_argument('--pools', nargs='*', help='Pool addresses to consider (default: known and indexed pools)')
+    parser.add_argument('--dry_run', action='store_true', help='Only print the split')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    if not w3.is_connected():
+        raise Exception("Failed to connect to Ethereum node")
+
+    token_in = _token_address(args.token_in)
+    token_out = _token_address(args.token_out)
+    token_in_contract = w3.eth.contract(address=token_in, abi=load_abi("erc20"))
+    token_in_decimals = token_in_contract.functions.decimals().call()
+    amount_in = int(Decimal(args.amount) * Decimal(10 ** token_in_decimals))
+
+    pools = {p: None for p in args.pools} if args.pools else load_candidate_pools()
+    states = []
+    for address, kind in pools.items():
+        state = fetch_pool_state(w3, Web3.to_checksum_address(address), kind)
+        if state.has_tokens(token_in, token_out):
+            states.append(state)
+    print(f"Pools holding the pair: {[s.address for s in states]}")
+
+    legs = optimal_split(states, token_in, token_out, amount_in)
+    for state, amount, expected_out in legs:
+        print(f"  {state.address} ({state.kind}): in {amount}, expected out {expected_out}")
+    print(f"Total expected out: {sum(leg[2] for leg in legs)}")
+    if args.dry_run:
+        return
+
+    private_key = os.getenv("PRIVATE_KEY")
+    if not private_key:
+        raise Exception("Private key not found in environment variables")
+    account = Account.from_key(private_key)
+
+    # The router pulls token_in through Permit2, the allowance must cover every leg
+    permit2_contract = w3.eth.contract(address=PERMIT2_ADDRESS, abi=load_abi("permit2"))
+    allowance, expiration, _nonce = permit2_contract.functions.allowance(account.address, token_in, ROUTER_ADDRESS).call()
+    clock = ChainClock(w3)
+    clock.sync()
+    if allowance < amount_in or expiration < clock.now()[0]:
+        raise Exception("Permit2 allowance for the router is too low or expired, "
+                        "approve it first (swap_script.py --use_permit2 does this)")
+
+    router_contract = w3.eth.contract(address=ROUTER_ADDRESS, abi=load_abi("router"))
+    deadline = clock.deadline(args.deadline)
+    calls = build_split_calls(router_contract, legs, token_in, token_out, args.slippage, deadline)
+
+    transaction = router_contract.functions.multicall(calls).build_transaction({
+        'from': account.address,
+        'nonce': w3.eth.get_transaction_count(account.address),
+        'gas': 300000 * len(calls),
+        'gasPrice': w3.eth.gas_price
+    })
+    signed_tx = account.sign_transaction(transaction)
+    tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+    print(f"Split swap sent! Hash: {tx_hash.hex()}")
+    tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    print(f"Transaction status: {'Successful' if tx_receipt.status == 1 else 'Failed'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import http.client
+import json
+import socket
+import sys
+
+# Kept free of web3 imports so the client starts in milliseconds
+DEFAULT_PORT = 8547
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=300):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_socket = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_socket)
+
+
+def submit(job, port=DEFAULT_PORT, unix_socket=None):
+    """POST a job to the daemon, returns (ok, response dict)"""
+    if unix_socket:
+        connection = UnixHTTPConnection(unix_socket)
+    else:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    body = json.dumps(job)
+    connection.request("POST", "/jobs", body, {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    result = json.loads(response.read())
+    connection.close()
+    return response.status == 200, result
+
+
+def main():
+    # Same arguments as swap_script.py, the other job types are selected with --job
+    parser = argparse.ArgumentParser(description='Submit swap/join/exit jobs to swap_daemon.py')
+    parser.add_argument('--job', choices=['swap', 'join', 'exit'], default='swap', help='Job type')
+    parser.add_argument('--token_in', help='Token to swap from (TOKEN_A, TOKEN_B, a symbol or an address)')
+    parser.add_argument('--token_out', help='Token to swap to / exit into (default for swaps: the other pool token)')
+    parser.add_argument('--amount', help='Amount to swap (in human-readable format)')
+    parser.add_argument('--min_amount_out', help='Minimum amount to receive (default: HyperCore fair value less --slippage)')
+    parser.add_argument('--slippage', default='0.005', help='Tolerance below the HyperCore fair value')
+    parser.add_argument('--deadline', type=int, default=3600, help='Deadline in seconds from now')
+    parser.add_argument('--use_permit2', action='store_true', help='Sign a Permit2 batch instead of sending approve')
+    parser.add_argument('--pool', help='Pool address (swap, join)')
+    parser.add_argument('--mode', choices=['proportional', 'best'], default='proportional', help='Join mode')
+    parser.add_argument('--fraction', default='1', help='Share of each position to exit')
+    parser.add_argument('--no_wait', action='store_true', help='Return as soon as the transaction is sent')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Daemon HTTP port')
+    parser.add_argument('--unix_socket', help='Daemon Unix socket')
+    args = parser.parse_args()
+
+    wait = not args.no_wait
+    if args.job == 'swap':
+        if args.token_in is None or args.amount is None:
+            parser.error("swap needs --token_in and --amount")
+        job = {"type": "swap", "token_in": args.token_in, "token_out": args.token_out, "amount": args.amount,
+               "min_amount_out": args.min_amount_out, "slippage": args.slippage, "pool": args.pool,
+               "use_permit2": args.use_permit2, "deadline": args.deadline, "wait": wait}
+    elif args.job == 'join':
+        job = {"type": "join", "pool": args.pool, "mode": args.mode, "deadline": args.deadline, "wait": wait}
+    else:
+        job = {"type": "exit", "pools": [args.pool] if args.pool else None, "token_out": args.token_out,
+               "fraction": args.fraction, "wait": wait}
+
+    ok, result = submit(job, args.port, args.unix_socket)
+    print(json.dumps(result, indent=2))
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
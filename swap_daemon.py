@@ -0,0 +1,380 @@
+from web3 import Web3
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from eth_account import Account
+from dotenv import load_dotenv
+from chain_clock import ChainClock
+from chain_utils import (
+    ABI_DIR, HYPEREVM_RPC_URL, KNOWN_POOLS, MAX_UINT256, PERMIT2_ADDRESS, ROUTER_ADDRESS, TOKENS,
+    WEIGHTED_FACTORY_ADDRESS, STABLE_FACTORY_ADDRESS, ZERO_ADDRESS, encode_calldata, load_abi
+)
+from exit_engine import ExitEngine, read_positions
+from hypercore_reader import HyperCoreReader
+from join_planner import build_join_calls, plan_join, read_join_inputs
+from permit2_tracker import Permit2Tracker
+from pool_mirror import PoolMirror
+from pool_registry import build_registry, indexed_pools
+from rpc_scheduler import ScheduledHTTPProvider
+from signing_service import permit2_batch_typed_data
+from swap_client import DEFAULT_PORT
+from token_amount import fp, get_token
+from tx_replacer import TxReplacer
+from wallet_fleet import NonceManager
+
+load_dotenv()
+
+# Names swap_script.py accepts for --token_in
+LEGACY_TOKENS = {"TOKEN_A": TOKENS["USDT"], "TOKEN_B": TOKENS["UETH"]}
+
+
+def resolve_token(value):
+    return Web3.to_checksum_address(LEGACY_TOKENS.get(value, TOKENS.get(value, value)))
+
+
+class SwapDaemon:
+    """
+    Keeps the connection, wallet nonces, Permit2 allowances, token decimals and a
+    block-following pool mirror warm, and runs swap/join/exit/deploy jobs against them.
+    """
+
+    def __init__(self, rpc_url=HYPEREVM_RPC_URL, private_key=None, follow=True):
+        self.w3 = Web3(ScheduledHTTPProvider(rpc_url))
+        if not self.w3.is_connected():
+            raise Exception("Failed to connect to Ethereum node")
+        private_key = private_key or os.getenv("PRIVATE_KEY")
+        if not private_key:
+            raise Exception("Private key not found in environment variables")
+        self.account = Account.from_key(private_key)
+        self.address = self.account.address
+        self.chain_id = self.w3.eth.chain_id
+        self.router_contract = self.w3.eth.contract(address=ROUTER_ADDRESS, abi=load_abi("router"))
+        self.permit2_contract = self.w3.eth.contract(address=PERMIT2_ADDRESS, abi=load_abi("permit2"))
+        self.nonces = NonceManager(self.w3, self.address)
+        self.permit2 = Permit2Tracker(self.w3)
+        self.replacer = TxReplacer(self.w3, self.account)
+        self.replacer.start()
+        self.clock = ChainClock(self.w3)
+        self.hypercore = HyperCoreReader(self.w3)
+        self.erc20_approved = set()
+        self.lock = threading.Lock()
+        # Last transaction a job sent, per handler thread
+        self.local = threading.local()
+
+        pools = dict(KNOWN_POOLS)
+        pools.update(indexed_pools())
+        self.registry = build_registry(self.w3, pools)
+        self.mirror = PoolMirror(self.w3, self.registry)
+        self.follow = follow
+        if follow:
+            threading.Thread(target=self.mirror.follow, args=(self._on_block,), daemon=True).start()
+            self.clock.start()
+        self.started = time.time()
+        print(f"Daemon ready for {self.address}: {len(self.registry.states)} pools")
+
+    def _on_block(self, head, changed):
+        """Mirror callback: catch Permit2 approvals, permits and invalidations made outside the daemon"""
+        try:
+            self.permit2.reconcile(head)
+        except Exception as e:
+            print(f"Permit2 reconcile failed: {e}")
+
+    # Transactions
+
+    def _send(self, transaction, wait, deadline=None, permits=None, spend=None):
+        """
+        Send through the replacer: bumped when stuck past the SLO, cancelled after the swap deadline.
+        permits are the tokens of a signed PermitBatch in the transaction; if it is known not to
+        have executed (not sent, reverted, cancelled) their Permit2 nonces are re-read from chain.
+        spend ({token: amount} of Permit2 allowance to the router) is booked when the transaction
+        is sent, so the next job sees it gone, and refunded if the transaction does not succeed.
+        Without wait the pending transaction is left in self.local.pending for handle() to await.
+        """
+        def refund():
+            for token, amount in (spend or {}).items():
+                self.permit2.refund(self.address, token, ROUTER_ADDRESS, amount)
+            self._resync_permits(permits)
+
+        def settled(pending):
+            receipt = pending.receipt
+            if receipt is None or receipt.status != 1 or pending.landed_kind == "cancel":
+                refund()
+
+        for token, amount in (spend or {}).items():
+            self.permit2.spend(self.address, token, ROUTER_ADDRESS, amount)
+        try:
+            pending = self.replacer.submit(transaction, deadline, on_settled=settled)
+        except Exception:
+            self.nonces.sync()
+            refund()
+            raise
+        result = {"tx_hash": Web3.to_hex(pending.sent[0][0])}
+        self.local.pending = pending
+        if wait:
+            result.update(self._await(pending, result["tx_hash"]))
+        return result
+
+    def _await(self, pending, tx_hash):
+        """Receipt fields of a sent transaction, once the replacer has seen its nonce used"""
+        receipt = self.replacer.wait(pending)
+        if not pending.done.is_set():
+            raise Exception(f"Nonce {pending.nonce} not included yet, still watched: {tx_hash}")
+        if receipt is None:
+            raise Exception(f"Nonce {pending.nonce} was used by a transaction the daemon did not send")
+        return {"tx_hash": Web3.to_hex(pending.landed_hash), "landed": pending.landed_kind,
+                "status": receipt.status, "gas_used": receipt.gasUsed}
+
+    def _resync_permits(self, tokens):
+        for token in tokens or ():
+            self.permit2.resync(self.address, token, ROUTER_ADDRESS)
+
+    def _ensure_permit2_approval(self, token):
+        """ERC20 approval of Permit2, checked once per token and sent without waiting"""
+        if token in self.erc20_approved:
+            return
+        token_contract = self.w3.eth.contract(address=token, abi=load_abi("erc20"))
+        if token_contract.functions.allowance(self.address, PERMIT2_ADDRESS).call() < MAX_UINT256 // 2:
+            self._send(token_contract.functions.approve(PERMIT2_ADDRESS, MAX_UINT256).build_transaction({
+                "from": self.address, "chainId": self.chain_id, "gas": 100000,
+                "gasPrice": self.w3.eth.gas_price, "nonce": self.nonces.take()
+            }), wait=False)
+        self.erc20_approved.add(token)
+
+    def _permit2_batch(self, spend, deadline):
+        """Signed PermitBatch for {token: amount} with locally tracked nonces"""
+        details = [self.permit2.permit_details(self.address, token, ROUTER_ADDRESS, amount)
+                   for token, amount in spend.items() if amount > 0]
+        permit2_batch = {"details": details, "spender": ROUTER_ADDRESS, "sigDeadline": deadline}
+        typed_data = permit2_batch_typed_data(self.chain_id, permit2_batch)
+        signature = self.account.sign_typed_data(
+            domain_data=typed_data["domain"],
+            message_types=typed_data["types"],
+            message_data=typed_data["message"]
+        ).signature
+        return permit2_batch, signature
+
+    # Jobs
+
+    def swap(self, token_in, amount, min_amount_out=None, token_out=None, pool=None, use_permit2=False,
+             deadline=3600, wait=True, slippage="0.005"):
+        token_in = resolve_token(token_in)
+        if token_out is None:
+            token_out = LEGACY_TOKENS["TOKEN_B"] if token_in == LEGACY_TOKENS["TOKEN_A"] else LEGACY_TOKENS["TOKEN_A"]
+        token_out = resolve_token(token_out)
+        tin, tout = get_token(self.w3, token_in), get_token(self.w3, token_out)
+        amount_in = tin.to_raw(amount)
+        deadline = self.clock.deadline(deadline)
+
+        # Best single pool by local quote unless one is given
+        quotes = []
+        for state in self.registry.states.values():
+            if (pool is None or state.address.lower() == pool.lower()) and state.has_tokens(token_in, token_out):
+                try:
+                    quotes.append((state.quote_exact_in(token_in, token_out, amount_in), state.address))
+                except Exception:
+                    continue
+        if not quotes:
+            raise Exception(f"No pool can swap {token_in} for {token_out}")
+        expected_out, pool_address = max(quotes)
+        if min_amount_out is not None:
+            min_out = tout.to_raw(min_amount_out)
+        else:
+            # HyperCore fair value less the pool's fee and impact, cached per block so repeated swaps
+            # in a block cost no extra read. Without follow the mirror's block is stale, read latest
+            min_out = self.hypercore.min_amount_out(token_in, token_out, amount_in, Decimal(slippage),
+                                                    self.mirror.last_block if self.follow else None,
+                                                    state=self.registry.states[pool_address])
+        if expected_out < min_out:
+            raise Exception(f"Quote {tout.format(expected_out)} is below min_amount_out {tout.format(min_out)}")
+
+        self._ensure_permit2_approval(token_in)
+        swap_call = self.router_contract.functions.swapSingleTokenExactIn(
+            pool_address, token_in, token_out, amount_in, min_out, deadline, False, '0x'
+        )
+        if use_permit2:
+            # One transaction: signed PermitBatch plus the swap
+            permit2_batch, signature = self._permit2_batch({token_in: amount_in}, deadline)
+            transaction = self.router_contract.functions.permitBatchAndCall(
+                [], [], permit2_batch, signature, [encode_calldata(swap_call)]
+            ).build_transaction({"from": self.address, "chainId": self.chain_id, "gas": 500000,
+                                 "gasPrice": self.w3.eth.gas_price, "nonce": self.nonces.take()})
+        else:
+            allowance, expiration, _nonce = self.permit2.get(self.address, token_in, ROUTER_ADDRESS)
+            if allowance < amount_in or expiration < deadline:
+                # Booked ahead like the spend below, re-read from chain if the approve does not land
+                self.permit2.approved(self.address, token_in, ROUTER_ADDRESS, amount_in, deadline)
+                self._send(self.permit2_contract.functions.approve(
+                    token_in, ROUTER_ADDRESS, amount_in, deadline
+                ).build_transaction({"from": self.address, "chainId": self.chain_id, "gas": 200000,
+                                     "gasPrice": self.w3.eth.gas_price, "nonce": self.nonces.take()}),
+                    wait=False, permits=[token_in])
+            transaction = swap_call.build_transaction({"from": self.address, "chainId": self.chain_id, "gas": 500000,
+                                                       "gasPrice": self.w3.eth.gas_price, "nonce": self.nonces.take()})
+        result = self._send(transaction, wait, deadline, permits=[token_in] if use_permit2 else None,
+                            spend={token_in: amount_in})
+        result.update({"pool": pool_address, "expected_out": tout.format(expected_out)})
+        return result
+
+    def join(self, pool=None, mode="proportional", max_impact=0.01, deadline=3600, wait=True):
+        pool_address = Web3.to_checksum_address(pool or next(iter(KNOWN_POOLS)))
+        inputs = read_join_inputs(self.w3, pool_address, self.address)
+        plan = plan_join(inputs, mode, max_impact)
+        if plan.bpt_out == 0 and plan.extra_kind is None:
+            raise Exception("Wallet balances are too small to join this pool")
+        for token in inputs.state.tokens:
+            self._ensure_permit2_approval(token)
+        deadline = self.clock.deadline(deadline)
+        permit2_batch, signature = self._permit2_batch(dict(zip(inputs.state.tokens, plan.total_amounts_in)), deadline)
+        transaction = self.router_contract.functions.permitBatchAndCall(
+            [], [], permit2_batch, signature, build_join_calls(self.router_contract, plan)
+        ).build_transaction({"from": self.address, "chainId": self.chain_id, "gas": 800000,
+                             "gasPrice": self.w3.eth.gas_price, "nonce": self.nonces.take()})
+        result = self._send(transaction, wait, deadline, permits=inputs.state.tokens)
+        result["plan"] = repr(plan)
+        return result
+
+    def exit(self, pools=None, token_out=None, fraction="1", slippage="0.005", deadline=600, wait=True):
+        pools = [Web3.to_checksum_address(p) for p in pools] if pools else list(self.registry.states)
+        positions = read_positions(self.w3, self.address, pools, self.mirror.vault_address)
+        engine = ExitEngine(self.w3, self.account, slippage=Decimal(slippage), chain_id=self.chain_id)
+        plans = engine.plan(positions, resolve_token(token_out) if token_out else None, Decimal(fraction))
+        if not plans:
+            return {"exits": []}
+        deadline = self.clock.deadline(deadline)
+        transaction = engine.build_transaction(plans, deadline, nonce=self.nonces.take())
+        result = self._send(transaction, wait, deadline)
+        result["exits"] = [repr(q) for _p, q in plans]
+        return result
+
+    def deploy(self, kind, name, symbol, tokens, swap_fee, weights=None, amp=None, salt="0x" + "0" * 64,
+               pause_manager=None, swap_fee_manager=None):
+        """Runs the deploy scripts' functions with the daemon's connection (they manage their own nonce)"""
+        tokens = [resolve_token(t) for t in tokens]
+        common = dict(
+            pause_manager=pause_manager or self.address,
+            swap_fee_manager=swap_fee_manager or self.address,
+            pool_creator=ZERO_ADDRESS,
+            swap_fee_percentage=fp(swap_fee),
+            pool_hooks_contract=ZERO_ADDRESS,
+            enable_donation=False,
+            disable_unbalanced_liquidity=False,
+            salt=salt,
+        )
+        if kind == "weighted":
+            from weighted_deploy_hyper import deploy_weighted_pool
+            pool_address = deploy_weighted_pool(
+                self.w3, self.account, WEIGHTED_FACTORY_ADDRESS, name, symbol, tokens,
+                [fp(w) for w in weights], **common
+            )
+        else:
+            from stable_deploy_hyper import deploy_stable_pool
+            pool_address = deploy_stable_pool(
+                self.w3, self.account, STABLE_FACTORY_ADDRESS, name, symbol, tokens, int(amp), **common
+            )
+        self.nonces.sync()
+        return {"pool": pool_address}
+
+    def status(self):
+        return {
+            "wallet": self.address,
+            "block": self.mirror.last_block,
+            "pools": len(self.registry.states),
+            "pending_transactions": len(self.replacer.pending),
+            "uptime": round(time.time() - self.started, 1),
+        }
+
+    def handle(self, job):
+        job = dict(job)
+        kind = job.pop("type", "swap")
+        handler = {"swap": self.swap, "join": self.join, "exit": self.exit, "deploy": self.deploy}.get(kind)
+        if handler is None:
+            raise Exception(f"Unknown job type {kind}")
+        if not self.follow:
+            self._on_block(None, set())
+        if kind == "deploy":
+            # The deploy scripts send and wait on their own
+            with self.lock:
+                return handler(**job)
+        # Jobs share the wallet: build, sign and send one at a time so reads and nonces stay
+        # consistent, then wait for the receipt outside the lock
+        wait = job.pop("wait", True)
+        with self.lock:
+            self.local.pending = None
+            result = handler(**job, wait=False)
+            pending = self.local.pending
+        if wait and pending is not None:
+            result.update(self._await(pending, result["tx_hash"]))
+        return result
+
+
+class JobHandler(BaseHTTPRequestHandler):
+    daemon = None
+
+    def _reply(self, code, body):
+        payload = json.dumps(body, default=str).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._reply(200, self.daemon.status())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self._reply(404, {"error": "not found"})
+            return
+        start = time.time()
+        try:
+            job = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            result = self.daemon.handle(job)
+            result["elapsed_ms"] = round((time.time() - start) * 1000, 1)
+            self._reply(200, result)
+        except Exception as e:
+            self._reply(400, {"error": str(e), "elapsed_ms": round((time.time() - start) * 1000, 1)})
+
+    def address_string(self):
+        # Unix socket peers have no (host, port)
+        return self.client_address[0] if self.client_address else "unix"
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(daemon, port=DEFAULT_PORT, unix_socket=None):
+    JobHandler.daemon = daemon
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, JobHandler)
+        print(f"Listening on {unix_socket}")
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", port), JobHandler)
+        print(f"Listening on http://127.0.0.1:{port}")
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Long-running swap/join/exit/deploy daemon')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Local HTTP port')
+    parser.add_argument('--unix_socket', help='Serve on a Unix socket instead of HTTP')
+    parser.add_argument('--no_follow', action='store_true', help='Do not follow new blocks')
+    args = parser.parse_args()
+
+    # The deploy scripts open their ABIs relative to the working directory
+    os.chdir(ABI_DIR)
+    serve(SwapDaemon(follow=not args.no_follow), args.port, args.unix_socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,11 @@
 from web3 import Web3
+from rpc_scheduler import ScheduledHTTPProvider
+from evm_simulator import simulate_transaction
+from access_lists import AccessListCache
+from token_amount import Token
+from chain_clock import ChainClock
+from hypercore_reader import HyperCoreReader
+from pool_state import fetch_pool_state
 import json
 import argparse
 from eth_account import Account
@@ -11,14 +18,17 @@ load_dotenv()
 # Set up command line arguments
 parser = argparse.ArgumentParser(description='Swap tokens using Balancer Router')
 parser.add_argument('--token_in', required=True, choices=['TOKEN_A', 'TOKEN_B'], help='Token to swap from')
-parser.add_argument('--amount', required=True, type=float, help='Amount to swap (in human-readable format)')
-parser.add_argument('--min_amount_out', required=True, type=float, help='Minimum amount to receive (in human-readable format)')
+parser.add_argument('--amount', required=True, help='Amount to swap (in human-readable format)')
+parser.add_argument('--min_amount_out', help='Minimum amount to receive (in human-readable format, default: HyperCore fair value less --slippage)')
+parser.add_argument('--slippage', default='0.005', help='Tolerance below the HyperCore fair value when --min_amount_out is not given')
 parser.add_argument('--deadline', type=int, default=3600, help='Deadline in seconds from now')
 parser.add_argument('--use_permit2', action='store_true', help='Use Permit2 for token approvals')
+parser.add_argument('--simulate', action='store_true', help='Dry-run the swap on a local EVM before sending (needs pyrevm)')
+parser.add_argument('--access_list', action='store_true', help='Send as a typed transaction with a cached access list')
 args = parser.parse_args()
 
 base_rpc_url = "https://rpc.hyperliquid.xyz/evm"
-web3 = Web3(Web3.HTTPProvider(base_rpc_url))
+web3 = Web3(ScheduledHTTPProvider(base_rpc_url))
 
 # Check connection
 if not web3.is_connected():
@@ -74,13 +84,23 @@ else:
 token_in_contract = web3.eth.contract(address=token_in_address, abi=ERC20_ABI)
 token_out_contract = web3.eth.contract(address=token_out_address, abi=ERC20_ABI)
 
-# Convert human-readable amounts to wei values with correct decimals
-amount_in = int(args.amount * (10 ** token_in_decimals))
-min_amount_out = int(args.min_amount_out * (10 ** token_out_decimals))
+# Convert human-readable amounts to raw values exactly (string parsing, no float rounding)
+token_in_info = Token(token_in_address, args.token_in, token_in_decimals)
+token_out_info = Token(token_out_address, 'TOKEN_B' if args.token_in == 'TOKEN_A' else 'TOKEN_A', token_out_decimals)
+amount_in = token_in_info.to_raw(args.amount)
+if args.min_amount_out is not None:
+    min_amount_out = token_out_info.to_raw(args.min_amount_out)
+else:
+    # Fair value from HyperCore oracle prices read through the precompiles (one batched call),
+    # less the pool's fee and the price impact of this amount
+    min_amount_out = HyperCoreReader(web3).min_amount_out(token_in_address, token_out_address, amount_in, args.slippage,
+                                                          state=fetch_pool_state(web3, POOL_ADDRESS))
+    print(f"min_amount_out from HyperCore prices: {token_out_info.format(min_amount_out)}")
 
-# Calculate deadline timestamp
-current_timestamp = web3.eth.get_block('latest').timestamp
-deadline = current_timestamp + args.deadline
+# Calculate deadline timestamp from the chain clock, fitted to one header read here
+chain_clock = ChainClock(web3)
+chain_clock.sync()
+deadline = chain_clock.deadline(args.deadline)
 
 def approve_token_erc20(token_contract, spender_address, amount):
     """Standard ERC20 approve function"""
@@ -174,9 +194,9 @@ def swap_tokens(router_contract, pool_address, token_in, token_out, amount_in, m
     # Check token balance before swap
     balance_before = token_in_contract.functions.balanceOf(account.address).call()
     if balance_before < amount_in:
-        raise Exception(f"Insufficient balance. Have: {balance_before / (10 ** token_in_decimals)}, Need: {amount_in / (10 ** token_in_decimals)}")
+        raise Exception(f"Insufficient balance. Have: {token_in_info.format(balance_before)}, Need: {token_in_info.format(amount_in)}")
     
-    print(f"Swapping {amount_in / (10 ** token_in_decimals)} {args.token_in} for at least {min_amount_out / (10 ** token_out_decimals)} tokens")
+    print(f"Swapping {token_in_info.format(amount_in)} {args.token_in} for at least {token_out_info.format(min_amount_out)} tokens")
     
     # Build swap transaction using swapSingleTokenExactIn
     swap_txn = router_contract.functions.swapSingleTokenExactIn(
@@ -194,6 +214,20 @@ def swap_tokens(router_contract, pool_address, token_in, token_out, amount_in, m
         'gas': 500000,  # Adjust as needed
         'gasPrice': web3.eth.gas_price
     })
+
+    # Catch reverts (SwapDeadline, SwapLimit, MaxInRatio...) before paying gas, and size the gas limit
+    if args.simulate:
+        result = simulate_transaction(web3, swap_txn, tokens=[token_in, token_out])
+        if not result.success:
+            raise Exception(f"Swap would revert: {result.error}")
+        if result.gas_used is not None:
+            swap_txn['gas'] = int(result.gas_used * 1.2)
+
+    # Pre-warm the Vault, pool and token slots with an access list cached per pool and direction
+    operation = f"swapSingleTokenExactIn:{token_in}"
+    if args.access_list:
+        access_lists = AccessListCache(web3)
+        swap_txn = access_lists.apply(pool_address, operation, swap_txn)
     
     # Sign and send transaction
     signed_txn = web3.eth.account.sign_transaction(swap_txn, PRIVATE_KEY)
@@ -202,6 +236,8 @@ def swap_tokens(router_contract, pool_address, token_in, token_out, amount_in, m
     # Wait for transaction receipt
     tx_receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
     print(f"Swap transaction successful. Hash: {tx_hash.hex()}")
+    if args.access_list:
+        access_lists.record(pool_address, operation, account.address, tx_receipt, 'accessList' in swap_txn)
     
     return tx_receipt
 
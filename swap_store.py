@@ -0,0 +1,283 @@
+from web3 import Web3
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+import numpy as np
+from chain_utils import HYPEREVM_RPC_URL, KNOWN_POOLS, load_abi
+from rpc_scheduler import ScheduledHTTPProvider
+
+# Fixed-width columns, one append-only file per column per (pool, day) partition.
+# Amounts are raw token units stored as float64: exact enough for analytics, not for accounting.
+SWAP_COLUMNS = {
+    "block_number": np.int64,
+    "timestamp": np.int64,
+    "log_index": np.int32,
+    "token_in": np.int8,       # index into the pool's token list
+    "token_out": np.int8,
+    "amount_in": np.float64,
+    "amount_out": np.float64,
+    "fee_amount": np.float64,
+    "price": np.float64,       # human units of token_out per token_in
+}
+
+LIQUIDITY_COLUMNS = {
+    "block_number": np.int64,
+    "timestamp": np.int64,
+    "log_index": np.int32,
+    "direction": np.int8,      # +1 add, -1 remove
+    "kind": np.int8,
+    "total_supply": np.float64,
+}
+
+
+def _day(timestamp):
+    return datetime.fromtimestamp(int(timestamp), tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _day_start(day):
+    return int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+
+
+class SwapStore:
+    """
+    Columnar swap/liquidity history partitioned as <root>/<pool>/<table>/<day>/<column>.bin.
+
+    Partitions are only ever appended to, reads memory-map the column files and
+    return NumPy arrays without touching individual rows in Python. Columns are written
+    before the watermark is saved, so opening the store cuts them back to the watermark
+    and an interrupted ingest is appended again rather than twice.
+    """
+
+    def __init__(self, root="swap_store", w3=None):
+        self.root = root
+        self.w3 = w3
+        os.makedirs(root, exist_ok=True)
+        self.meta_path = os.path.join(root, "meta.json")
+        self.meta = {"watermark": {}, "pools": {}}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r") as f:
+                self.meta = json.load(f)
+        self._truncate_to_watermark()
+
+    def _save_meta(self):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_path, self.meta_path)
+
+    def _truncate_to_watermark(self):
+        """Drop rows past each pool's saved watermark (left by an ingest that stopped before saving it)"""
+        for pool in os.listdir(self.root):
+            if not os.path.isdir(os.path.join(self.root, pool)):
+                continue
+            watermark = self.meta["watermark"].get(pool, {"swaps": [-1, -1], "liquidity": [-1, -1]})
+            for table, columns in (("swaps", SWAP_COLUMNS), ("liquidity", LIQUIDITY_COLUMNS)):
+                table_path = os.path.join(self.root, pool, table)
+                if not os.path.isdir(table_path):
+                    continue
+                block_number, log_index = watermark[table]
+                for day in os.listdir(table_path):
+                    path = os.path.join(table_path, day)
+                    blocks, logs = (
+                        np.fromfile(os.path.join(path, f"{name}.bin"), dtype=columns[name])
+                        if os.path.exists(os.path.join(path, f"{name}.bin")) else np.empty(0, dtype=columns[name])
+                        for name in ("block_number", "log_index")
+                    )
+                    rows = min(len(blocks), len(logs))
+                    blocks, logs = blocks[:rows], logs[:rows]
+                    keep = int(np.count_nonzero((blocks < block_number) | ((blocks == block_number) & (logs <= log_index))))
+                    for file_name in os.listdir(path):
+                        # amount_<i> columns of liquidity partitions are float64
+                        size = keep * np.dtype(columns.get(file_name[:-len(".bin")], np.float64)).itemsize
+                        file_path = os.path.join(path, file_name)
+                        if os.path.getsize(file_path) > size:
+                            os.truncate(file_path, size)
+
+    # Pool token metadata
+
+    def pool_tokens(self, pool):
+        """Tokens and decimals of a pool, read on-chain once and kept in meta.json"""
+        if pool not in self.meta["pools"]:
+            if self.w3 is None:
+                raise Exception(f"Unknown pool {pool} and no web3 connection to look it up")
+            pool_contract = self.w3.eth.contract(address=pool, abi=load_abi("weighted_pool"))
+            tokens = pool_contract.functions.getTokens().call()
+            erc20_abi = load_abi("erc20")
+            decimals = [self.w3.eth.contract(address=t, abi=erc20_abi).functions.decimals().call() for t in tokens]
+            self.meta["pools"][pool] = {"tokens": list(tokens), "decimals": decimals}
+            self._save_meta()
+        return self.meta["pools"][pool]
+
+    # Writing
+
+    def _partition(self, pool, table, day):
+        path = os.path.join(self.root, pool, table, day)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _append(self, pool, table, columns, rows):
+        """Append column arrays, split into day partitions by timestamp"""
+        if not rows:
+            return
+        data = {name: np.asarray([row[name] for row in rows], dtype=dtype) for name, dtype in columns.items()}
+        days = np.array([_day(ts) for ts in data["timestamp"]])
+        for day in np.unique(days):
+            mask = days == day
+            path = self._partition(pool, table, day)
+            for name in columns:
+                with open(os.path.join(path, f"{name}.bin"), "ab") as f:
+                    f.write(data[name][mask].tobytes())
+
+    def _append_amount_columns(self, pool, rows, count):
+        """Per-token amount columns for liquidity events (amount_0 ... amount_{n-1})"""
+        if not rows:
+            return
+        days = [_day(row["timestamp"]) for row in rows]
+        for day in sorted(set(days)):
+            path = self._partition(pool, "liquidity", day)
+            day_rows = [row for row, d in zip(rows, days) if d == day]
+            for i in range(count):
+                column = np.asarray([float(row["amounts"][i]) for row in day_rows], dtype=np.float64)
+                with open(os.path.join(path, f"amount_{i}.bin"), "ab") as f:
+                    f.write(column.tobytes())
+
+    def ingest_from_indexer(self, db_path="pool_events.db"):
+        """Append everything the event indexer stored after our watermark"""
+        db = sqlite3.connect(db_path)
+        # Our own pools (notes.txt) are stored even before the indexer has seen them
+        pools = {row[0] for row in db.execute("SELECT address FROM pools")} | set(KNOWN_POOLS)
+        for pool in sorted(pools):
+            watermark = self.meta["watermark"].get(pool, {"swaps": [-1, -1], "liquidity": [-1, -1]})
+            info = self.pool_tokens(pool)
+            index = {t.lower(): i for i, t in enumerate(info["tokens"])}
+            decimals = info["decimals"]
+
+            swap_rows = []
+            for block_number, log_index, timestamp, token_in, token_out, amount_in, amount_out, fee in db.execute(
+                "SELECT s.block_number, s.log_index, b.timestamp, s.token_in, s.token_out, s.amount_in, s.amount_out, "
+                "s.swap_fee_amount FROM swaps s JOIN blocks b ON b.number = s.block_number "
+                "WHERE s.pool = ? AND (s.block_number > ? OR (s.block_number = ? AND s.log_index > ?)) "
+                "ORDER BY s.block_number, s.log_index",
+                (pool, watermark["swaps"][0], watermark["swaps"][0], watermark["swaps"][1])
+            ):
+                i, o = index[token_in.lower()], index[token_out.lower()]
+                amount_in, amount_out = float(amount_in), float(amount_out)
+                price = (amount_out / 10 ** decimals[o]) / (amount_in / 10 ** decimals[i]) if amount_in else 0.0
+                swap_rows.append({
+                    "block_number": block_number, "timestamp": timestamp, "log_index": log_index,
+                    "token_in": i, "token_out": o, "amount_in": amount_in, "amount_out": amount_out,
+                    "fee_amount": float(fee), "price": price,
+                })
+
+            liquidity_rows = []
+            for block_number, log_index, timestamp, direction, kind, total_supply, amounts in db.execute(
+                "SELECT l.block_number, l.log_index, b.timestamp, l.direction, l.kind, l.total_supply, l.amounts "
+                "FROM liquidity l JOIN blocks b ON b.number = l.block_number "
+                "WHERE l.pool = ? AND (l.block_number > ? OR (l.block_number = ? AND l.log_index > ?)) "
+                "ORDER BY l.block_number, l.log_index",
+                (pool, watermark["liquidity"][0], watermark["liquidity"][0], watermark["liquidity"][1])
+            ):
+                liquidity_rows.append({
+                    "block_number": block_number, "timestamp": timestamp, "log_index": log_index,
+                    "direction": 1 if direction == "add" else -1, "kind": kind,
+                    "total_supply": float(total_supply), "amounts": json.loads(amounts),
+                })
+
+            self._append(pool, "swaps", SWAP_COLUMNS, swap_rows)
+            self._append(pool, "liquidity", LIQUIDITY_COLUMNS, liquidity_rows)
+            self._append_amount_columns(pool, liquidity_rows, len(info["tokens"]))
+
+            if swap_rows:
+                watermark["swaps"] = [swap_rows[-1]["block_number"], swap_rows[-1]["log_index"]]
+            if liquidity_rows:
+                watermark["liquidity"] = [liquidity_rows[-1]["block_number"], liquidity_rows[-1]["log_index"]]
+            self.meta["watermark"][pool] = watermark
+            self._save_meta()
+            if swap_rows or liquidity_rows:
+                print(f"{pool}: appended {len(swap_rows)} swaps, {len(liquidity_rows)} liquidity events")
+        db.close()
+
+    # Reading
+
+    def _read(self, pool, table, start_ts, end_ts, columns):
+        table_path = os.path.join(self.root, pool, table)
+        if not os.path.isdir(table_path):
+            return {name: np.empty(0, dtype=dtype) for name, dtype in columns.items()}
+        days = sorted(
+            d for d in os.listdir(table_path)
+            if _day_start(d) + 86400 > start_ts and _day_start(d) <= end_ts
+        )
+        parts = {name: [] for name in columns}
+        for day in days:
+            path = os.path.join(table_path, day)
+            maps = {}
+            for name, dtype in columns.items():
+                file_path = os.path.join(path, f"{name}.bin")
+                if os.path.getsize(file_path) == 0:
+                    maps[name] = np.empty(0, dtype=dtype)
+                else:
+                    maps[name] = np.memmap(file_path, dtype=dtype, mode="r")
+            # A writer may be mid-append, only expose rows every column already has
+            rows = min(len(m) for m in maps.values())
+            timestamps = maps["timestamp"][:rows]
+            lo = np.searchsorted(timestamps, start_ts, side="left")
+            hi = np.searchsorted(timestamps, end_ts, side="right")
+            for name in columns:
+                parts[name].append(maps[name][lo:hi])
+        return {
+            name: (np.concatenate(chunks) if len(chunks) > 1 else (chunks[0] if chunks else np.empty(0, dtype=columns[name])))
+            for name, chunks in parts.items()
+        }
+
+    def swaps(self, pool, start_ts=0, end_ts=2**62):
+        """Swap columns for a pool in [start_ts, end_ts] as NumPy arrays"""
+        return self._read(pool, "swaps", start_ts, end_ts, SWAP_COLUMNS)
+
+    def liquidity(self, pool, start_ts=0, end_ts=2**62):
+        """Liquidity event columns (plus amount_i per token) for a pool in [start_ts, end_ts]"""
+        columns = dict(LIQUIDITY_COLUMNS)
+        for i in range(len(self.pool_tokens(pool)["tokens"])):
+            columns[f"amount_{i}"] = np.float64
+        return self._read(pool, "liquidity", start_ts, end_ts, columns)
+
+    def volume_report(self, pool, start_ts=0, end_ts=2**62):
+        """Volume and fees per token (human units) and VWAP per direction over the range"""
+        info = self.pool_tokens(pool)
+        swaps = self.swaps(pool, start_ts, end_ts)
+        report = {"swaps": int(len(swaps["block_number"])), "tokens": {}}
+        for i, token in enumerate(info["tokens"]):
+            scale = 10.0 ** info["decimals"][i]
+            sold = swaps["token_in"] == i
+            bought = swaps["token_out"] == i
+            volume_in = swaps["amount_in"][sold].sum() / scale
+            report["tokens"][token] = {
+                "volume_in": float(volume_in),
+                "volume_out": float(swaps["amount_out"][bought].sum() / scale),
+                "fees": float(swaps["fee_amount"][sold].sum() / scale),
+                "vwap_out_per_in": float((swaps["price"][sold] * swaps["amount_in"][sold]).sum() / scale / volume_in)
+                if volume_in else None,
+            }
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Columnar swap history store built from the event indexer database')
+    parser.add_argument('--db', default='pool_events.db', help='Event indexer SQLite database')
+    parser.add_argument('--root', default='swap_store', help='Store directory')
+    parser.add_argument('--report', action='store_true', help='Print a volume and fee report per pool')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    store = SwapStore(args.root, w3)
+    store.ingest_from_indexer(args.db)
+
+    if args.report:
+        for pool in store.meta["pools"]:
+            print(f"\nPool {pool}:")
+            print(json.dumps(store.volume_report(pool), indent=2))
+
+
+if __name__ == "__main__":
+    main()
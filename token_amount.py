@@ -0,0 +1,186 @@
+from decimal import Decimal
+import numpy as np
+from chain_utils import load_abi
+from multicall import batch_call
+
+# Raw amounts below this fit in int64, larger batches fall back to Python ints in object arrays
+INT64_LIMIT = 2**63
+# Floats are exact integers up to here, so float batches below it can be scaled with numpy
+FLOAT_EXACT_LIMIT = 2**53
+
+
+def _parse(value, decimals, scale):
+    """Exact human -> raw for one value (str, int, Decimal or float)"""
+    if isinstance(value, int):
+        return value * scale
+    if isinstance(value, float):
+        value = repr(value)
+    if isinstance(value, str) and "e" not in value.lower():
+        text = value.strip()
+        negative = text.startswith("-")
+        whole, _, fraction = text.lstrip("+-").partition(".")
+        fraction = fraction.rstrip("0")
+        if len(fraction) > decimals:
+            raise ValueError(f"{value} has more than {decimals} decimals")
+        raw = int(whole or "0") * scale + int(fraction.ljust(decimals, "0") or "0")
+        return -raw if negative else raw
+    raw = Decimal(value) * scale
+    if raw != raw.to_integral_value():
+        raise ValueError(f"{value} has more than {decimals} decimals")
+    return int(raw)
+
+
+def _format(raw, decimals, scale):
+    """Exact raw -> human string without trailing zeros"""
+    sign = "-" if raw < 0 else ""
+    whole, fraction = divmod(abs(raw), scale)
+    if decimals == 0 or fraction == 0:
+        return f"{sign}{whole}"
+    return f"{sign}{whole}." + str(fraction).rjust(decimals, "0").rstrip("0")
+
+
+class Token:
+    """An ERC20 with its scaling factor computed once"""
+
+    __slots__ = ("address", "symbol", "decimals", "scale")
+
+    def __init__(self, address, symbol, decimals):
+        self.address = address
+        self.symbol = symbol
+        self.decimals = decimals
+        self.scale = 10 ** decimals
+
+    def __repr__(self):
+        return f"Token({self.symbol}, {self.address}, {self.decimals})"
+
+    def __eq__(self, other):
+        return isinstance(other, Token) and self.address.lower() == other.address.lower()
+
+    def __hash__(self):
+        return hash(self.address.lower())
+
+    def to_raw(self, value):
+        """Human amount (str, int, Decimal or float) -> raw int, exact, raises on excess precision"""
+        return _parse(value, self.decimals, self.scale)
+
+    def to_human(self, raw):
+        return Decimal(raw) / self.scale
+
+    def format(self, raw):
+        return _format(raw, self.decimals, self.scale)
+
+    def amount(self, value):
+        """TokenAmount from a human amount"""
+        return TokenAmount(self, self.to_raw(value))
+
+    def to_raw_batch(self, values):
+        """
+        Human amounts -> raw, a list gives a list of ints, a numpy array gives an int64
+        array (object array of ints when the values do not fit in int64).
+        """
+        if not isinstance(values, np.ndarray):
+            return [_parse(v, self.decimals, self.scale) for v in values]
+        if values.dtype.kind in "iu":
+            if values.size and int(np.abs(values).max()) * self.scale < INT64_LIMIT:
+                return values.astype(np.int64) * self.scale
+            return np.array([int(v) * self.scale for v in values.tolist()], dtype=object)
+        if values.dtype.kind == "f" and (not values.size or np.abs(values).max() * self.scale < FLOAT_EXACT_LIMIT):
+            raws = np.rint(values * self.scale)
+            # Same rule as the scalar path: the float must be the nearest float to a value with at most
+            # `decimals` decimals, anything else goes through _parse so it raises on excess precision
+            inexact = raws / self.scale != values
+            if inexact.any():
+                for v in values[inexact].tolist():
+                    _parse(v, self.decimals, self.scale)
+            return raws.astype(np.int64)
+        raws = [_parse(v, self.decimals, self.scale) for v in values.tolist()]
+        if all(-INT64_LIMIT < r < INT64_LIMIT for r in raws):
+            return np.array(raws, dtype=np.int64)
+        return np.array(raws, dtype=object)
+
+    def to_human_batch(self, raws, exact=False):
+        """
+        Raw amounts -> human. float64 array by default (analytics), exact strings with exact=True.
+        """
+        if exact:
+            values = raws.tolist() if isinstance(raws, np.ndarray) else raws
+            return [_format(int(r), self.decimals, self.scale) for r in values]
+        if isinstance(raws, np.ndarray) and raws.dtype != object:
+            return raws / self.scale
+        return np.array([int(r) / self.scale for r in raws], dtype=np.float64)
+
+
+class TokenAmount:
+    """A raw amount of a token, exact arithmetic on the raw integer"""
+
+    __slots__ = ("token", "raw")
+
+    def __init__(self, token, raw):
+        self.token = token
+        self.raw = raw
+
+    def __repr__(self):
+        return f"{self.token.format(self.raw)} {self.token.symbol}"
+
+    def __int__(self):
+        return self.raw
+
+    @property
+    def human(self):
+        return self.token.to_human(self.raw)
+
+    def _same_token(self, other):
+        if not isinstance(other, TokenAmount) or other.token != self.token:
+            raise ValueError(f"Cannot combine {self!r} with {other!r}")
+        return other.raw
+
+    def __add__(self, other):
+        return TokenAmount(self.token, self.raw + self._same_token(other))
+
+    def __sub__(self, other):
+        return TokenAmount(self.token, self.raw - self._same_token(other))
+
+    def __eq__(self, other):
+        return isinstance(other, TokenAmount) and other.token == self.token and other.raw == self.raw
+
+    def __lt__(self, other):
+        return self.raw < self._same_token(other)
+
+    def __le__(self, other):
+        return self.raw <= self._same_token(other)
+
+    def scaled(self, ratio):
+        """Amount times a Decimal/str ratio, rounded down (e.g. min out = amount.scaled('0.995'))"""
+        return TokenAmount(self.token, int(Decimal(self.raw) * Decimal(ratio)))
+
+
+# 18-decimal fixed point used by the Vault for weights, fees and rates
+FIXED18 = Token("0x0000000000000000000000000000000000000000", "FP18", 18)
+
+
+def fp(value):
+    """Exact 18-decimal fixed point, e.g. fp('0.0025') for a 0.25% swap fee"""
+    return FIXED18.to_raw(value)
+
+
+# Decimals and symbols never change, read them once per process
+_tokens = {}
+
+
+def get_tokens(w3, addresses):
+    """Token objects for the addresses, unknown ones read in one batched call"""
+    missing = [a for a in dict.fromkeys(addresses) if a.lower() not in _tokens]
+    if missing:
+        erc20_abi = load_abi("erc20")
+        contracts = [w3.eth.contract(address=a, abi=erc20_abi) for a in missing]
+        results = batch_call(w3, [c.functions.decimals() for c in contracts] + [c.functions.symbol() for c in contracts])
+        for i, address in enumerate(missing):
+            decimals, symbol = results[i], results[len(missing) + i]
+            if decimals is None:
+                raise Exception(f"Failed to read decimals of {address}")
+            _tokens[address.lower()] = Token(address, symbol or address[:8], decimals)
+    return [_tokens[a.lower()] for a in addresses]
+
+
+def get_token(w3, address):
+    return get_tokens(w3, [address])[0]
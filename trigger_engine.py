@@ -0,0 +1,373 @@
+from web3 import Web3
+import argparse
+import itertools
+import os
+import threading
+import time
+from decimal import Decimal
+import numpy as np
+from eth_account import Account
+from dotenv import load_dotenv
+from arb_scanner import CycleEvaluator, _hop_out
+from chain_clock import ChainClock
+from chain_utils import (
+    HYPEREVM_RPC_URL, KNOWN_POOLS, MAX_UINT256, PERMIT2_ADDRESS, ROUTER_ADDRESS, TOKENS, encode_calldata, load_abi
+)
+from pool_math import PoolMathError
+from pool_mirror import PoolMirror
+from pool_registry import build_registry, indexed_pools
+from rpc_scheduler import ScheduledHTTPProvider
+from token_amount import get_tokens
+
+load_dotenv()
+
+# Condition metrics, evaluated per trigger from the local pool mirror
+SPOT = 0        # marginal price, human token_out per token_in
+OUT = 1         # raw amount out for the trigger's own amount_in
+IMBALANCE = 2   # token_out's share of the live balances minus an even share (stable pools)
+METRICS = {"spot": SPOT, "out": OUT, "imbalance": IMBALANCE}
+OPS = {">=": 1.0, "<=": -1.0}
+
+_trigger_ids = itertools.count(1)
+
+
+class Trigger:
+    """
+    Swap amount_in of token_in for token_out in pool once `metric op threshold` holds.
+    A limit sell is ("out", ">=", min_amount_out) or ("spot", ">=", price).
+    """
+
+    def __init__(self, pool, token_in, token_out, amount_in, min_amount_out, metric, op, threshold, expires_at=None):
+        if metric not in METRICS or op not in OPS:
+            raise ValueError(f"Unknown condition {metric} {op}")
+        self.id = next(_trigger_ids)
+        self.pool = pool
+        self.token_in = token_in
+        self.token_out = token_out
+        self.amount_in = amount_in
+        self.min_amount_out = min_amount_out
+        self.metric = metric
+        self.op = op
+        self.threshold = threshold
+        self.expires_at = expires_at
+        self.status = "active"   # active -> fired / expired / cancelled
+        self.calldata = None
+        self.signed = None       # (nonce, signed transaction), replaced as one value
+        self.tx_hash = None
+        self.fired_block = None
+
+    @property
+    def hop(self):
+        return self.pool, self.token_in, self.token_out
+
+    def __repr__(self):
+        return (f"Trigger({self.id}, {self.metric} {self.op} {self.threshold}, "
+                f"{self.amount_in} in, min out {self.min_amount_out}, {self.status})")
+
+
+class TriggerEngine:
+    """
+    Evaluates many triggers on every block with one NumPy pass.
+
+    Metrics are computed once per distinct (pool, token_in, token_out) and spread to the
+    triggers by index; amount-out conditions use the float pool math of the arb scanner
+    and are confirmed with the exact integer quote before firing. Every active trigger
+    holds a swap signed for the next nonce, so a match is broadcast without signing. After
+    a fire the other signatures are stale (their nonce is used): a background signer
+    (start()) redoes them outside the evaluation lock, and a match whose signature is not
+    ready yet is signed when it fires. With a SigningService (signer) the background
+    passes are signed on its worker processes. Matches in one block are confirmed one after the
+    other on a copy of the pool state that has our fills applied, kept until the mirror
+    reports the pool changed.
+    """
+
+    def __init__(self, w3, account, registry, router_contract=None, clock=None, gas_price=None, lifetime=86400,
+                 signer=None):
+        self.w3 = w3
+        self.account = account
+        self.registry = registry
+        self.router_contract = router_contract or w3.eth.contract(address=ROUTER_ADDRESS, abi=load_abi("router"))
+        self.clock = clock or ChainClock(w3)
+        self.gas_price = gas_price or (lambda: w3.eth.gas_price)
+        self.lifetime = lifetime
+        self.signer = signer
+        self.chain_id = w3.eth.chain_id
+        self.nonce = w3.eth.get_transaction_count(account.address, 'pending')
+        self.triggers = {}
+        self.fired = []
+        self.lock = threading.Lock()
+        self.dirty = True
+        self.hops = []
+        self.values = None
+        self.resign = threading.Event()
+        self.projected = {}   # pool -> state with our fills applied, until the mirror re-reads the pool
+
+    # Trigger book
+
+    def _transaction(self, trigger, nonce, gas_price=None):
+        return {
+            "from": self.account.address, "to": self.router_contract.address, "data": trigger.calldata,
+            "value": 0, "chainId": self.chain_id, "gas": 500000,
+            "gasPrice": gas_price or self.gas_price(), "nonce": nonce
+        }
+
+    def _sign(self, trigger, nonce, gas_price=None):
+        trigger.signed = (nonce, self.account.sign_transaction(self._transaction(trigger, nonce, gas_price)))
+
+    def add(self, trigger):
+        """Register a trigger, its swap is signed by the background signer (or when it fires)"""
+        if trigger.pool not in self.registry.states:
+            raise Exception(f"Pool {trigger.pool} is not in the registry")
+        trigger.calldata = encode_calldata(self.router_contract.functions.swapSingleTokenExactIn(
+            trigger.pool, trigger.token_in, trigger.token_out, trigger.amount_in, trigger.min_amount_out,
+            self.clock.deadline(self.lifetime), False, '0x'
+        ))
+        with self.lock:
+            self.triggers[trigger.id] = trigger
+            self.dirty = True
+        self.resign.set()
+        return trigger
+
+    def sign_pending(self):
+        """Sign every active trigger for the current nonce, outside the lock, one gas price read per pass"""
+        while True:
+            with self.lock:
+                nonce = self.nonce
+                todo = [t for t in self.triggers.values() if t.signed is None or t.signed[0] != nonce]
+            if not todo:
+                return
+            gas_price = self.gas_price()
+            if self.signer is not None:
+                signed = self.signer.sign_transactions(
+                    self.account.address, [self._transaction(t, nonce, gas_price) for t in todo]
+                ).result()
+                if self.nonce == nonce:
+                    for trigger, signed_tx in zip(todo, signed):
+                        trigger.signed = (nonce, signed_tx)
+                continue
+            for trigger in todo:
+                if self.nonce != nonce:
+                    break   # a fire moved the nonce, start over at the new one
+                self._sign(trigger, nonce, gas_price)
+
+    def run_signer(self):
+        while True:
+            self.resign.wait()
+            self.resign.clear()
+            try:
+                self.sign_pending()
+            except Exception as e:
+                print(f"Trigger signer error: {e}")
+                time.sleep(1)
+                self.resign.set()
+
+    def start(self):
+        thread = threading.Thread(target=self.run_signer, daemon=True)
+        thread.start()
+        return thread
+
+    def cancel(self, trigger_id):
+        with self.lock:
+            trigger = self.triggers.pop(trigger_id)
+            trigger.status = "cancelled"
+            self.dirty = True
+        return trigger
+
+    def _rebuild(self):
+        """Per-trigger arrays, redone only when the trigger book changes"""
+        self.book = list(self.triggers.values())
+        self.hops = list(dict.fromkeys(t.hop for t in self.book))
+        hop_index = {hop: h for h, hop in enumerate(self.hops)}
+        self.hop_idx = np.array([hop_index[t.hop] for t in self.book], dtype=np.int64)
+        self.metric = np.array([METRICS[t.metric] for t in self.book], dtype=np.int64)
+        self.sign = np.array([OPS[t.op] for t in self.book])
+        self.threshold = np.array([float(t.threshold) for t in self.book])
+        self.amount = np.array([float(t.amount_in) for t in self.book])
+        self.expires = np.array([np.inf if t.expires_at is None else t.expires_at for t in self.book])
+        self.values = None
+        self.dirty = False
+
+    # Evaluation
+
+    def _hop_metrics(self, hops):
+        """Spot price, imbalance and float swap parameters for the given distinct hops"""
+        spot = np.empty(len(hops))
+        imbalance = np.empty(len(hops))
+        for h, (pool, token_in, token_out) in enumerate(hops):
+            state = self.registry.states[pool]
+            spot[h] = state.spot_price(token_in, token_out)
+            live = state.balances_live
+            imbalance[h] = live[state.index(token_out)] / sum(live) - 1 / len(live)
+        evaluator = CycleEvaluator(self.registry, [[hop] for hop in hops])
+        return spot, imbalance, evaluator.arrays[0], evaluator.supported
+
+    def _compute_values(self, rows):
+        """Metric value of the triggers at rows, from the hops they touch"""
+        hops = np.unique(self.hop_idx[rows])
+        local = np.searchsorted(hops, self.hop_idx[rows])
+        spot, imbalance, params, supported = self._hop_metrics([self.hops[h] for h in hops])
+        metric = self.metric[rows]
+        values = np.where(metric == SPOT, spot[local], imbalance[local])
+        is_out = np.nonzero(metric == OUT)[0]
+        if len(is_out):
+            indexed = {key: array[local[is_out]] for key, array in params.items()}
+            out = _hop_out(indexed, self.amount[rows[is_out], None])[:, 0]
+            values[is_out] = np.nan_to_num(out, nan=-np.inf)
+            # Stable pools with more than two tokens are not covered by the float math
+            for k in is_out[~supported[local[is_out]]]:
+                values[k] = self._exact_out(self.book[rows[k]]) or -np.inf
+        self.values[rows] = values
+
+    def evaluate(self, changed=None):
+        """
+        Indexes into self.book of the triggers whose condition holds. Only triggers on
+        changed pools are recomputed (all of them when changed is None), the rest keep
+        their value from the previous block.
+        """
+        if self.dirty:
+            self._rebuild()
+        if not self.book:
+            return np.array([], dtype=np.int64)
+        if self.values is None or changed is None:
+            self.values = np.empty(len(self.book))
+            rows = np.arange(len(self.book))
+        else:
+            stale = np.array([hop[0] in changed for hop in self.hops])
+            rows = np.nonzero(stale[self.hop_idx])[0]
+        if len(rows):
+            self._compute_values(rows)
+        return np.nonzero(self.sign * (self.values - self.threshold) >= 0)[0]
+
+    def _exact_out(self, trigger, state=None):
+        state = state or self.registry.states[trigger.pool]
+        try:
+            return state.quote_exact_in(trigger.token_in, trigger.token_out, trigger.amount_in)
+        except PoolMathError:
+            return None
+
+    # Firing
+
+    def _fire(self, trigger, block_number, state):
+        """Confirm on state (our earlier fills this block applied), broadcast, then apply this fill to it"""
+        out = self._exact_out(trigger, state)
+        if out is None or out < trigger.min_amount_out:
+            return False   # float match that the exact math does not confirm, it would revert
+        signed = trigger.signed
+        if signed is None or signed[0] != self.nonce:
+            self._sign(trigger, self.nonce)
+            signed = trigger.signed
+        try:
+            trigger.tx_hash = self.w3.eth.send_raw_transaction(signed[1].raw_transaction)
+        except Exception as e:
+            print(f"Trigger {trigger.id} rejected: {e}")
+            self.nonce = self.w3.eth.get_transaction_count(self.account.address, 'pending')
+            return False
+        self.nonce += 1
+        state.apply_swap(trigger.token_in, trigger.token_out, trigger.amount_in, out)
+        trigger.status, trigger.fired_block = "fired", block_number
+        self.fired.append(trigger)
+        print(f"Block {block_number}: trigger {trigger.id} fired {Web3.to_hex(trigger.tx_hash)}")
+        return True
+
+    def on_block(self, block_number, changed):
+        """PoolMirror.follow callback: expire, evaluate, fire matches, then wake the signer"""
+        with self.lock:
+            if self.dirty:
+                self._rebuild()
+            for i in np.nonzero(self.expires < time.time())[0]:
+                trigger = self.book[i]
+                trigger.status = "expired"
+                del self.triggers[trigger.id]
+                self.dirty = True
+            for pool in changed:
+                self.projected.pop(pool, None)
+            matched = [self.book[i] for i in self.evaluate(changed)] if self.triggers else []
+            fired = False
+            for trigger in sorted(matched, key=lambda t: t.id):
+                if trigger.pool not in self.projected:
+                    self.projected[trigger.pool] = self.registry.states[trigger.pool].copy()
+                if self._fire(trigger, block_number, self.projected[trigger.pool]):
+                    del self.triggers[trigger.id]
+                    self.dirty = True
+                    fired = True
+        if fired:
+            self.resign.set()
+        return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fire a pre-signed swap when a pool condition holds')
+    parser.add_argument('--pool', required=True, help='Pool address')
+    parser.add_argument('--token_in', required=True, help='Token to sell (symbol or address)')
+    parser.add_argument('--token_out', required=True, help='Token to buy (symbol or address)')
+    parser.add_argument('--amount', required=True, help='Amount to sell (human-readable)')
+    parser.add_argument('--min_amount_out', required=True, help='Minimum amount to receive (human-readable)')
+    parser.add_argument('--metric', choices=list(METRICS), default='out', help='Condition metric')
+    parser.add_argument('--op', choices=list(OPS), default='>=', help='Condition operator')
+    parser.add_argument('--threshold', help='Condition threshold (default for out: min_amount_out)')
+    parser.add_argument('--expires_in', type=int, default=86400, help='Seconds until the trigger expires')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    private_key = os.getenv("PRIVATE_KEY")
+    if not private_key:
+        raise Exception("Private key not found in environment variables")
+    account = Account.from_key(private_key)
+    pool = Web3.to_checksum_address(args.pool)
+    token_in = Web3.to_checksum_address(TOKENS.get(args.token_in, args.token_in))
+    token_out = Web3.to_checksum_address(TOKENS.get(args.token_out, args.token_out))
+    tin, tout = get_tokens(w3, [token_in, token_out])
+    amount_in = tin.to_raw(args.amount)
+    min_amount_out = tout.to_raw(args.min_amount_out)
+    if args.threshold is None:
+        threshold = min_amount_out if args.metric == 'out' else None
+        if threshold is None:
+            parser.error("--threshold is required for spot and imbalance conditions")
+    else:
+        threshold = tout.to_raw(args.threshold) if args.metric == 'out' else Decimal(args.threshold)
+
+    pools = dict(KNOWN_POOLS)
+    pools.update(indexed_pools())
+    registry = build_registry(w3, pools)
+
+    # The pre-signed swap pulls through Permit2: ERC20 approval of Permit2 and a Permit2 allowance
+    # for the router that outlives the trigger, both mined before the engine reads its nonce
+    clock = ChainClock(w3)
+    clock.sync()
+    token_contract = w3.eth.contract(address=token_in, abi=load_abi("erc20"))
+    permit2_contract = w3.eth.contract(address=PERMIT2_ADDRESS, abi=load_abi("permit2"))
+    approvals = []
+    if token_contract.functions.allowance(account.address, PERMIT2_ADDRESS).call() < amount_in:
+        approvals.append(token_contract.functions.approve(PERMIT2_ADDRESS, MAX_UINT256))
+    allowance, expiration, _nonce = permit2_contract.functions.allowance(account.address, token_in, ROUTER_ADDRESS).call()
+    if allowance < amount_in or expiration < clock.now()[0] + args.expires_in + 3600:
+        approvals.append(permit2_contract.functions.approve(
+            token_in, ROUTER_ADDRESS, amount_in, clock.expiration(args.expires_in + 3600)
+        ))
+    for approval in approvals:
+        signed = account.sign_transaction(approval.build_transaction({
+            "from": account.address, "gas": 200000, "gasPrice": w3.eth.gas_price,
+            "nonce": w3.eth.get_transaction_count(account.address, 'pending')
+        }))
+        w3.eth.wait_for_transaction_receipt(w3.eth.send_raw_transaction(signed.raw_transaction))
+
+    engine = TriggerEngine(w3, account, registry, clock=clock, lifetime=args.expires_in)
+    clock.start()
+    engine.start()
+    trigger = engine.add(Trigger(pool, token_in, token_out, amount_in, min_amount_out, args.metric, args.op,
+                                 threshold, time.time() + args.expires_in))
+    print(f"Watching {trigger}")
+
+    def on_block(block_number, changed):
+        start = time.time()
+        engine.on_block(block_number, changed)
+        print(f"Block {block_number}: evaluated in {(time.time() - start) * 1e6:.0f} us")
+        if trigger.status != "active":
+            print(f"{trigger}")
+            raise SystemExit(0)
+
+    PoolMirror(w3, registry).follow(on_block)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+from web3 import Web3
+import argparse
+import itertools
+import os
+import threading
+from decimal import Decimal
+from eth_abi import decode
+from eth_account import Account
+from dotenv import load_dotenv
+from chain_clock import ChainClock
+from chain_utils import HYPEREVM_RPC_URL, KNOWN_POOLS, MAX_UINT256, PERMIT2_ADDRESS, ROUTER_ADDRESS, TOKENS, load_abi
+from event_indexer import SWAP
+from pool_mirror import PoolMirror
+from pool_registry import build_registry, indexed_pools
+from rpc_scheduler import ScheduledHTTPProvider
+from split_router import _capacity, _quote
+from token_amount import get_tokens
+from wallet_fleet import NonceManager
+
+load_dotenv()
+
+_order_ids = itertools.count(1)
+
+
+def child_size(state, token_in, token_out, remaining, max_impact):
+    """
+    Largest input up to `remaining` whose average price is within max_impact of the
+    marginal price (and that the pool accepts, MaxInRatio), from the local pool math.
+    """
+    capacity = _capacity(state, token_in, token_out, remaining)
+    if capacity <= 0:
+        return 0
+    step = max(capacity // 10**6, 1)
+    reference = Decimal(_quote(state, token_in, token_out, step) or 0) / step
+    if reference <= 0:
+        return 0
+
+    def within(x):
+        out = _quote(state, token_in, token_out, x)
+        return out is not None and Decimal(out) / x >= reference * (1 - Decimal(max_impact))
+
+    if within(capacity):
+        return capacity
+    lo, hi = 0, capacity
+    while hi - lo > step:
+        mid = (lo + hi) // 2
+        if within(mid):
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+class ChildSwap:
+    def __init__(self, index, amount_in, expected_out, min_amount_out, transaction, signed, signed_block, basis):
+        self.index = index
+        self.amount_in = amount_in
+        self.expected_out = expected_out
+        self.min_amount_out = min_amount_out
+        self.transaction = transaction
+        self.nonce = transaction["nonce"]
+        self.signed = signed
+        self.signed_block = signed_block
+        self.basis = basis       # pool balances (raw) the child was sized on
+        self.tx_hash = None
+        self.sent_block = None
+        self.status = "signed"   # signed -> sent -> filled / failed
+        self.amount_out = 0
+
+    def __repr__(self):
+        return f"ChildSwap({self.index}, in={self.amount_in}, out={self.amount_out or self.expected_out}, {self.status})"
+
+
+class ParentOrder:
+    """A large swap executed as child swaps spread over blocks"""
+
+    def __init__(self, pool, token_in, token_out, amount_in, slippage=Decimal('0.005'), max_impact=Decimal('0.002'),
+                 interval_blocks=2, limit_price=None, child_deadline=60):
+        self.id = next(_order_ids)
+        self.pool = pool
+        self.token_in = token_in
+        self.token_out = token_out
+        self.amount_in = amount_in
+        self.slippage = Decimal(slippage)
+        self.max_impact = Decimal(max_impact)
+        self.interval_blocks = interval_blocks
+        # Worst raw out per raw in any child may accept, None for no limit
+        self.limit_price = limit_price
+        self.child_deadline = child_deadline
+        self.children = []
+        self.next_child = None      # pre-signed, not yet broadcast
+        self.last_sent_block = None
+        self.status = "active"      # active -> done / cancelled
+
+    @property
+    def committed_in(self):
+        """Input sent or filled (failed children give their input back)"""
+        return sum(c.amount_in for c in self.children if c.status in ("sent", "filled"))
+
+    @property
+    def filled_in(self):
+        return sum(c.amount_in for c in self.children if c.status == "filled")
+
+    @property
+    def filled_out(self):
+        return sum(c.amount_out for c in self.children if c.status == "filled")
+
+    @property
+    def remaining(self):
+        return self.amount_in - self.committed_in
+
+    @property
+    def effective_price(self):
+        """Raw out per raw in over the filled children"""
+        return Decimal(self.filled_out) / self.filled_in if self.filled_in else None
+
+    def report(self):
+        return {
+            "id": self.id,
+            "pool": self.pool,
+            "status": self.status,
+            "progress": float(Decimal(self.filled_in) / self.amount_in),
+            "filled_in": self.filled_in,
+            "filled_out": self.filled_out,
+            "pending": sum(1 for c in self.children if c.status == "sent"),
+            "children": len(self.children),
+            "effective_price": self.effective_price,
+        }
+
+    def __repr__(self):
+        return f"ParentOrder({self.id}, {self.filled_in}/{self.amount_in} filled, {self.status})"
+
+
+class TwapExecutor:
+    """
+    Runs ParentOrders on every block of a PoolMirror.
+
+    After each broadcast the next child is sized and signed at once against the pool
+    state with our pending child applied, so sending it later costs no reads. It is only
+    re-sized when the mirror shows a pool state other than that projection (or the state
+    before our pending child, if it has not landed yet), i.e. someone else traded.
+    Nonces are taken at broadcast time, in send order across all orders; a child signed
+    for another nonce is re-signed with the one it gets, so a cancelled or skipped child
+    never leaves a gap. Fills come from the Vault Swap log in each child's receipt.
+    """
+
+    def __init__(self, w3, account, registry, router_contract=None, nonces=None, clock=None, gas_price=None):
+        self.w3 = w3
+        self.account = account
+        self.registry = registry
+        self.router_contract = router_contract or w3.eth.contract(address=ROUTER_ADDRESS, abi=load_abi("router"))
+        self.nonces = nonces or NonceManager(w3, account.address)
+        self.clock = clock or ChainClock(w3)
+        self.gas_price = gas_price or (lambda: w3.eth.gas_price)
+        self.chain_id = w3.eth.chain_id
+        self.orders = {}
+        self.lock = threading.Lock()
+
+    def submit(self, order):
+        with self.lock:
+            self.orders[order.id] = order
+        return order
+
+    def cancel(self, order_id):
+        """Stop sending children, a pre-signed child is dropped (it never took a nonce)"""
+        with self.lock:
+            order = self.orders[order_id]
+            order.status = "cancelled"
+            order.next_child = None
+        return order
+
+    def _sign_child(self, order, state, block_number):
+        amount = child_size(state, order.token_in, order.token_out, order.remaining, order.max_impact)
+        if amount <= 0:
+            return None
+        expected_out = _quote(state, order.token_in, order.token_out, amount)
+        if not expected_out:
+            return None
+        if order.limit_price is not None and Decimal(expected_out) / amount < order.limit_price:
+            return None
+        min_out = int(Decimal(expected_out) * (1 - order.slippage))
+        transaction = self.router_contract.functions.swapSingleTokenExactIn(
+            order.pool, order.token_in, order.token_out, amount, min_out,
+            self.clock.deadline(order.child_deadline), False, '0x'
+        ).build_transaction({
+            "from": self.account.address, "chainId": self.chain_id, "gas": 500000,
+            "gasPrice": self.gas_price(), "nonce": self.nonces.peek()
+        })
+        signed = self.account.sign_transaction(transaction)
+        return ChildSwap(len(order.children), amount, expected_out, min_out, transaction, signed, block_number,
+                         tuple(state.balances_raw))
+
+    def _settle(self, order):
+        """Read receipts of sent children, failed ones return their input to the order"""
+        for child in order.children:
+            if child.status != "sent":
+                continue
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(child.tx_hash)
+            except Exception:
+                continue
+            if receipt.status != 1:
+                child.status = "failed"
+                continue
+            for log in receipt.logs:
+                if log['topics'] and bytes(log['topics'][0]) == bytes(SWAP):
+                    amount_in, amount_out, _fee_pct, _fee = decode(['uint256'] * 4, bytes(log['data']))
+                    child.amount_out = amount_out
+            child.status = "filled"
+
+    def _is_stale(self, order, child, state):
+        """The mirror shows neither the projection the child was sized on nor the state before our pending child"""
+        current = tuple(state.balances_raw)
+        if current == child.basis:
+            return False
+        previous = order.children[-1] if order.children else None
+        return not (previous is not None and previous.status == "sent" and current == previous.basis)
+
+    def _step(self, order, block_number, changed):
+        self._settle(order)
+        if order.status != "active":
+            return
+        if order.remaining <= 0 and order.next_child is None:
+            if all(c.status != "sent" for c in order.children):
+                order.status = "done"
+            return
+        if order.last_sent_block is not None and block_number - order.last_sent_block < order.interval_blocks:
+            return
+        state = self.registry.states[order.pool]
+        child = order.next_child
+        if child is None or self._is_stale(order, child, state):
+            # Someone else moved the pool since signing, re-size on the mirror state
+            child = self._sign_child(order, state, block_number)
+            order.next_child = child
+            if child is None:
+                return   # nothing fillable within limits this block, try again next block
+        nonce = self.nonces.take()
+        if nonce != child.nonce:
+            # Another order (or job) sent at the nonce this child was signed for
+            child.transaction = dict(child.transaction, nonce=nonce)
+            child.signed = self.account.sign_transaction(child.transaction)
+            child.nonce = nonce
+        try:
+            child.tx_hash = self.w3.eth.send_raw_transaction(child.signed.raw_transaction)
+        except Exception as e:
+            print(f"Order {order.id}: child {child.index} rejected: {e}")
+            order.next_child = None
+            self.nonces.sync()
+            return
+        child.status, child.sent_block = "sent", block_number
+        order.children.append(child)
+        order.last_sent_block = block_number
+        order.next_child = None
+        print(f"Order {order.id}: child {child.index} sent, {child.amount_in} in, min out {child.min_amount_out}")
+
+        # Pre-sign the next child against the state after this one
+        if order.remaining > 0:
+            projected = state.copy()
+            projected.balances_raw = list(child.basis)
+            projected.apply_swap(order.token_in, order.token_out, child.amount_in, child.expected_out)
+            order.next_child = self._sign_child(order, projected, block_number)
+
+    def on_block(self, block_number, changed):
+        """PoolMirror.follow callback"""
+        with self.lock:
+            for order in list(self.orders.values()):
+                try:
+                    self._step(order, block_number, changed)
+                except Exception as e:
+                    print(f"Order {order.id}: {e}")
+
+    def report(self):
+        with self.lock:
+            return [order.report() for order in self.orders.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Execute a large swap as child swaps spread over blocks')
+    parser.add_argument('--token_in', required=True, help='Token to sell (symbol or address)')
+    parser.add_argument('--token_out', required=True, help='Token to buy (symbol or address)')
+    parser.add_argument('--amount', required=True, help='Total amount to sell (human-readable)')
+    parser.add_argument('--pool', help='Pool address (default: best local quote for the whole amount)')
+    parser.add_argument('--max_impact', default='0.002', help='Price impact allowed per child')
+    parser.add_argument('--slippage', default='0.005', help='Tolerance below each child expected out')
+    parser.add_argument('--interval_blocks', type=int, default=2, help='Blocks between children')
+    parser.add_argument('--limit_price', help='Worst human price (token_out per token_in) to accept')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    private_key = os.getenv("PRIVATE_KEY")
+    if not private_key:
+        raise Exception("Private key not found in environment variables")
+    account = Account.from_key(private_key)
+    token_in = Web3.to_checksum_address(TOKENS.get(args.token_in, args.token_in))
+    token_out = Web3.to_checksum_address(TOKENS.get(args.token_out, args.token_out))
+    tin, tout = get_tokens(w3, [token_in, token_out])
+    amount_in = tin.to_raw(args.amount)
+
+    pools = dict(KNOWN_POOLS)
+    pools.update(indexed_pools())
+    registry = build_registry(w3, pools)
+    if args.pool:
+        pool = Web3.to_checksum_address(args.pool)
+    else:
+        candidates = [s for s in registry.states.values() if s.has_tokens(token_in, token_out)]
+        if not candidates:
+            raise Exception(f"No pool holds {args.token_in} and {args.token_out}")
+        pool = max(candidates, key=lambda s: _quote(s, token_in, token_out, amount_in) or 0).address
+
+    # Router pulls through Permit2: ERC20 approval of Permit2 and a Permit2 allowance for the whole order
+    nonces = NonceManager(w3, account.address)
+    clock = ChainClock(w3)
+    clock.sync()
+    token_contract = w3.eth.contract(address=token_in, abi=load_abi("erc20"))
+    permit2_contract = w3.eth.contract(address=PERMIT2_ADDRESS, abi=load_abi("permit2"))
+    approvals = []
+    if token_contract.functions.allowance(account.address, PERMIT2_ADDRESS).call() < amount_in:
+        approvals.append(token_contract.functions.approve(PERMIT2_ADDRESS, MAX_UINT256))
+    allowance, expiration, _nonce = permit2_contract.functions.allowance(account.address, token_in, ROUTER_ADDRESS).call()
+    if allowance < amount_in or expiration < clock.now()[0] + 3600:
+        approvals.append(permit2_contract.functions.approve(token_in, ROUTER_ADDRESS, amount_in, clock.expiration(86400)))
+    for approval in approvals:
+        signed = account.sign_transaction(approval.build_transaction({
+            "from": account.address, "gas": 200000, "gasPrice": w3.eth.gas_price, "nonce": nonces.take()
+        }))
+        w3.eth.wait_for_transaction_receipt(w3.eth.send_raw_transaction(signed.raw_transaction))
+
+    limit_price = None
+    if args.limit_price:
+        limit_price = Decimal(tout.to_raw(args.limit_price)) / tin.scale
+    order = ParentOrder(pool, token_in, token_out, amount_in, Decimal(args.slippage), Decimal(args.max_impact),
+                        args.interval_blocks, limit_price)
+    executor = TwapExecutor(w3, account, registry, nonces=nonces, clock=clock)
+    clock.start()
+    executor.submit(order)
+
+    def on_block(block_number, changed):
+        executor.on_block(block_number, changed)
+        report = order.report()
+        price = report["effective_price"]
+        human_price = f"{price * tin.scale / tout.scale:.6f}" if price else "-"
+        print(f"Block {block_number}: {report['progress']:.1%} filled, {tout.format(report['filled_out'])} "
+              f"{tout.symbol} received, effective price {human_price}, {report['pending']} pending")
+        if order.status != "active":
+            raise SystemExit(0)
+
+    PoolMirror(w3, registry).follow(on_block)
+
+
+if __name__ == "__main__":
+    main()
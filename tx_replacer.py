@@ -0,0 +1,264 @@
+from web3 import Web3
+import argparse
+import os
+import threading
+import time
+from eth_account import Account
+from dotenv import load_dotenv
+from chain_utils import HYPEREVM_RPC_URL
+from rpc_scheduler import ScheduledHTTPProvider
+
+load_dotenv()
+
+# Nodes only accept a replacement at the same nonce if it pays at least 10% more,
+# 12.5% leaves room for the integer rounding of the bumped price
+MIN_BUMP = 1.125
+CANCEL_GAS = 21000
+# How long wait() blocks by default before giving up on a nonce
+WAIT_TIMEOUT = 300
+# Cancel price raises unstick() tries per nonce when the node calls it underpriced
+MAX_CANCEL_ATTEMPTS = 8
+
+
+class PendingTx:
+    """One nonce of ours and every version of it we broadcast"""
+
+    def __init__(self, nonce, transaction, deadline=None, on_settled=None):
+        self.nonce = nonce
+        self.transaction = transaction
+        self.deadline = deadline      # swap deadline, after it the transaction is cancelled
+        self.on_settled = on_settled  # called with this PendingTx once the nonce is used
+        self.sent = []                # (tx hash, gas price, kind, time sent), kind: original/bump/cancel
+        self.first_sent = None
+        self.landed_hash = None
+        self.landed_kind = None
+        self.receipt = None
+        self.done = threading.Event()
+
+    @property
+    def gas_price(self):
+        return self.sent[-1][1]
+
+    @property
+    def last_sent(self):
+        return self.sent[-1][3]
+
+    def __repr__(self):
+        state = f"landed {self.landed_kind}" if self.receipt else f"pending ({len(self.sent)} sent)"
+        return f"PendingTx(nonce={self.nonce}, {state})"
+
+
+class TxReplacer:
+    """
+    Watches our pending transactions against an inclusion-time SLO.
+
+    A transaction not included within `slo` seconds of its last broadcast is re-signed at
+    the same nonce with a higher gas price (at least MIN_BUMP, and never below the current
+    network price). A transaction whose swap deadline has passed is replaced by a 0-value
+    self transfer so the nonce frees up without paying for a SwapDeadline revert.
+    Every broadcast hash is remembered so we know which version landed.
+    """
+
+    def __init__(self, w3, account, slo=10.0, bump_factor=1.25, max_gas_price=None, poll_interval=1.0):
+        self.w3 = w3
+        self.account = account
+        self.slo = slo
+        self.bump_factor = max(bump_factor, MIN_BUMP)
+        self.max_gas_price = max_gas_price
+        self.poll_interval = poll_interval
+        self.pending = {}   # nonce -> PendingTx
+        self.history = []
+        self.lock = threading.Lock()
+        self.chain_id = w3.eth.chain_id
+
+    def _broadcast(self, pending, transaction, kind):
+        signed_tx = self.account.sign_transaction(transaction)
+        tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        now = time.time()
+        pending.sent.append((tx_hash, transaction["gasPrice"], kind, now))
+        pending.first_sent = pending.first_sent or now
+        return tx_hash
+
+    def submit(self, transaction, deadline=None, on_settled=None):
+        """
+        Sign and send a legacy/type-1 transaction dict (nonce and gasPrice set) and start watching it.
+        on_settled(pending) runs on the watcher once the nonce is used, before waiters wake.
+        """
+        pending = PendingTx(transaction["nonce"], dict(transaction), deadline, on_settled)
+        self._broadcast(pending, pending.transaction, "original")
+        with self.lock:
+            self.pending[pending.nonce] = pending
+        return pending
+
+    def _bumped_price(self, pending):
+        price = max(int(pending.gas_price * self.bump_factor), pending.gas_price + 1, self.w3.eth.gas_price)
+        if self.max_gas_price is not None:
+            price = min(price, self.max_gas_price)
+        return price
+
+    def _replace(self, pending, cancel):
+        price = self._bumped_price(pending)
+        if price <= pending.gas_price:
+            return None   # capped, nothing more we can do
+        if cancel:
+            transaction = {
+                "from": self.account.address, "to": self.account.address, "value": 0, "data": "0x",
+                "gas": CANCEL_GAS, "gasPrice": price, "nonce": pending.nonce, "chainId": self.chain_id
+            }
+        else:
+            transaction = dict(pending.transaction, gasPrice=price)
+        try:
+            return self._broadcast(pending, transaction, "cancel" if cancel else "bump")
+        except Exception as e:
+            # "nonce too low": one of the versions just landed, check() will pick it up
+            print(f"Replacement of nonce {pending.nonce} rejected: {e}")
+            return None
+
+    def _settle(self, pending):
+        """The nonce is used, find which of our versions landed"""
+        for tx_hash, _price, kind, _sent in reversed(pending.sent):
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+            except Exception:
+                continue
+            pending.landed_hash, pending.landed_kind, pending.receipt = tx_hash, kind, receipt
+            break
+        with self.lock:
+            self.pending.pop(pending.nonce, None)
+            self.history.append(pending)
+        if pending.on_settled is not None:
+            try:
+                pending.on_settled(pending)
+            except Exception as e:
+                print(f"Settle callback of nonce {pending.nonce} failed: {e}")
+        pending.done.set()
+
+    def check(self):
+        """One pass: settle used nonces, cancel expired swaps, bump transactions past the SLO"""
+        with self.lock:
+            pending_list = sorted(self.pending.values(), key=lambda p: p.nonce)
+        if not pending_list:
+            return
+        confirmed_nonce = self.w3.eth.get_transaction_count(self.account.address, 'latest')
+        now = time.time()
+        for pending in pending_list:
+            if pending.nonce < confirmed_nonce:
+                self._settle(pending)
+            elif pending.deadline is not None and now > pending.deadline and pending.sent[-1][2] != "cancel":
+                self._replace(pending, cancel=True)
+            elif now - pending.last_sent > self.slo:
+                self._replace(pending, cancel=pending.sent[-1][2] == "cancel")
+
+    def wait(self, pending, timeout=WAIT_TIMEOUT):
+        """
+        Block until the nonce is used (the watcher thread or run() must be checking).
+        Returns the receipt, None if another transaction used the nonce or the timeout passed
+        (pending.done tells the two apart).
+        """
+        pending.done.wait(timeout)
+        return pending.receipt
+
+    def run(self, stop_when_idle=True):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                # A transient RPC error must not end the watcher, the next pass retries
+                print(f"Replacer check failed: {e}")
+            with self.lock:
+                idle = not self.pending
+            if idle and stop_when_idle:
+                return
+            time.sleep(self.poll_interval)
+
+    def start(self):
+        """Watch in a background thread for the life of the process"""
+        thread = threading.Thread(target=self.run, kwargs={"stop_when_idle": False}, daemon=True)
+        thread.start()
+        return thread
+
+    def report(self):
+        """Per settled nonce: which version landed, how many broadcasts and the inclusion time"""
+        rows = []
+        for pending in self.history:
+            block_time = None
+            if pending.receipt is not None:
+                block_time = self.w3.eth.get_block(pending.receipt.blockNumber).timestamp - pending.first_sent
+            rows.append({
+                "nonce": pending.nonce,
+                "landed": pending.landed_kind,
+                "tx_hash": Web3.to_hex(pending.landed_hash) if pending.landed_hash else None,
+                "broadcasts": len(pending.sent),
+                "inclusion_seconds": block_time,
+            })
+        return rows
+
+
+def _pool_gas_prices(w3, address):
+    """{nonce: gas price} of our transactions in the node's txpool, empty if the node does not expose it"""
+    try:
+        content = w3.manager.request_blocking("txpool_contentFrom", [address])
+    except Exception:
+        return {}
+    prices = {}
+    for section in ("pending", "queued"):
+        for nonce, tx in (content.get(section) or {}).items():
+            price = tx.get("gasPrice") or tx.get("maxFeePerGas")
+            if price is not None:
+                prices[int(nonce)] = int(price, 16) if isinstance(price, str) else int(price)
+    return prices
+
+
+def unstick(w3, account, gas_multiplier=2):
+    """
+    Cancel every nonce between the confirmed and the pending count, for transactions
+    sent by an earlier process (their contents are unknown, so they are only cancelled).
+    A cancel starts above the stuck transaction's price when the txpool shows it, and is
+    re-priced while the node rejects it as underpriced. Returns (report rows, {nonce: error}).
+    """
+    replacer = TxReplacer(w3, account)
+    confirmed = w3.eth.get_transaction_count(account.address, 'latest')
+    pending_count = w3.eth.get_transaction_count(account.address, 'pending')
+    base_price = int(w3.eth.gas_price * gas_multiplier)
+    stuck_prices = _pool_gas_prices(w3, account.address)
+    failed = {}
+    for nonce in range(confirmed, pending_count):
+        gas_price = max(base_price, int(stuck_prices.get(nonce, 0) * MIN_BUMP) + 1)
+        for _ in range(MAX_CANCEL_ATTEMPTS):
+            try:
+                replacer.submit({
+                    "from": account.address, "to": account.address, "value": 0, "data": "0x",
+                    "gas": CANCEL_GAS, "gasPrice": gas_price, "nonce": nonce, "chainId": replacer.chain_id
+                })
+                failed.pop(nonce, None)
+                break
+            except Exception as e:
+                failed[nonce] = str(e)
+                if "underpriced" not in str(e).lower():
+                    break   # "nonce too low" and the like: nothing left to cancel at this nonce
+                gas_price = int(gas_price * 2)
+    replacer.run()
+    return replacer.report(), failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cancel stuck transactions of the wallet')
+    parser.add_argument('--gas_multiplier', type=float, default=2, help='Multiple of the current gas price')
+    args = parser.parse_args()
+
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    private_key = os.getenv("PRIVATE_KEY")
+    if not private_key:
+        raise Exception("Private key not found in environment variables")
+    account = Account.from_key(private_key)
+    rows, failed = unstick(w3, account, args.gas_multiplier)
+    if not rows and not failed:
+        print("No stuck transactions")
+    for row in rows:
+        print(f"nonce {row['nonce']}: {row['landed']} {row['tx_hash']} after {row['broadcasts']} broadcast(s)")
+    for nonce, error in failed.items():
+        print(f"nonce {nonce}: cancel not accepted: {error}")
+
+
+if __name__ == "__main__":
+    main()
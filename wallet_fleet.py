@@ -0,0 +1,352 @@
+from web3 import Web3
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from eth_account import Account
+from dotenv import load_dotenv
+from chain_clock import ChainClock
+from chain_utils import HYPEREVM_RPC_URL, MAX_UINT160, PERMIT2_ADDRESS, ROUTER_ADDRESS, load_abi
+from permit2_tracker import Permit2Tracker
+from rpc_scheduler import ScheduledHTTPProvider
+
+load_dotenv()
+
+# Permit2 allowance the fleet gives the router, renewed when it has less than the margin left
+ROUTER_APPROVAL_LIFETIME = 7 * 86400
+ROUTER_APPROVAL_MARGIN = 3600
+
+
+def load_private_keys():
+    """
+    Keys for the fleet: PRIVATE_KEYS (comma separated) or the single PRIVATE_KEY
+    the other scripts use.
+    """
+    keys = os.getenv("PRIVATE_KEYS")
+    if keys:
+        return [k.strip() for k in keys.split(",") if k.strip()]
+    key = os.getenv("PRIVATE_KEY")
+    if not key:
+        raise Exception("No keys found. Set PRIVATE_KEYS or PRIVATE_KEY environment variable.")
+    return [key]
+
+
+class NonceManager:
+    """Hands out nonces locally so transactions from one wallet can be pipelined"""
+
+    def __init__(self, w3, address):
+        self.w3 = w3
+        self.address = address
+        self.lock = threading.Lock()
+        self.next_nonce = None
+
+    def sync(self):
+        """Re-read the pending nonce from the node (after a dropped or replaced transaction)"""
+        with self.lock:
+            self.next_nonce = self.w3.eth.get_transaction_count(self.address, 'pending')
+            return self.next_nonce
+
+    def peek(self):
+        """The nonce take() hands out next, without reserving it"""
+        with self.lock:
+            if self.next_nonce is None:
+                self.next_nonce = self.w3.eth.get_transaction_count(self.address, 'pending')
+            return self.next_nonce
+
+    def take(self):
+        with self.lock:
+            if self.next_nonce is None:
+                self.next_nonce = self.w3.eth.get_transaction_count(self.address, 'pending')
+            nonce = self.next_nonce
+            self.next_nonce += 1
+            return nonce
+
+
+class Wallet:
+    """One fleet account with its nonce stream and a local view of balances and allowances"""
+
+    def __init__(self, w3, private_key):
+        self.account = Account.from_key(private_key)
+        self.address = self.account.address
+        self.nonces = NonceManager(w3, self.address)
+        self.native_balance = 0
+        self.balances = {}     # token -> raw balance
+        self.allowances = {}   # (token, spender) -> raw allowance
+        self.reserved = {}     # token -> amount promised to assigned but unsent jobs
+        self.pending = 0       # jobs assigned and not yet confirmed
+
+    def available(self, token):
+        return self.balances.get(token, 0) - self.reserved.get(token, 0)
+
+    def __repr__(self):
+        return f"Wallet({self.address}, pending={self.pending})"
+
+
+class FleetJob:
+    """
+    A swap/join/exit to run from whichever wallet the fleet picks.
+
+    `build(wallet)` returns the contract function to send, `token_in`/`amount_in`
+    is what the wallet must hold (and have approved to Permit2) for it to succeed.
+    """
+
+    def __init__(self, name, build, token_in=None, amount_in=0, gas=500000):
+        self.name = name
+        self.build = build
+        self.token_in = token_in
+        self.amount_in = amount_in
+        self.gas = gas
+        self.wallet = None
+        self.tx_hash = None
+        self.receipt = None
+        self.error = None
+        self.confirmed = None   # future of the background confirmation with submit(wait=False)
+
+
+def swap_job(router_contract, pool_address, token_in, token_out, amount_in, min_amount_out, deadline):
+    """FleetJob for a router swapSingleTokenExactIn"""
+    def build(wallet):
+        return router_contract.functions.swapSingleTokenExactIn(
+            pool_address, token_in, token_out, amount_in, min_amount_out, deadline, False, '0x'
+        )
+    return FleetJob(f"swap {amount_in} {token_in}", build, token_in=token_in, amount_in=amount_in)
+
+
+class WalletFleet:
+    """
+    N wallets with sharded nonces, balance/allowance views and parallel submission.
+
+    Jobs pull token_in through Permit2, so a wallet needs the ERC20 allowance of Permit2
+    (checked when assigning) and a Permit2 allowance of the router, which the fleet
+    tracks and renews itself right before the job in the same nonce stream.
+    """
+
+    def __init__(self, w3, private_keys, tokens, spenders=(PERMIT2_ADDRESS,), gas_price=None, max_workers=None):
+        self.w3 = w3
+        self.wallets = [Wallet(w3, key) for key in private_keys]
+        self.tokens = list(tokens)
+        self.spenders = list(spenders)
+        self.gas_price = gas_price or (lambda: w3.eth.gas_price)
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers or max(4, len(self.wallets)))
+        # Receipt waits of submit(wait=False), kept off the pool that sends
+        self.confirmer = ThreadPoolExecutor(max_workers=max_workers or max(4, len(self.wallets)))
+        erc20_abi = load_abi("erc20")
+        self.token_contracts = {t: w3.eth.contract(address=t, abi=erc20_abi) for t in self.tokens}
+        self.permit2 = Permit2Tracker(w3)
+        self.permit2_contract = w3.eth.contract(address=PERMIT2_ADDRESS, abi=load_abi("permit2"))
+        self.clock = ChainClock(w3)
+
+    def refresh(self):
+        """Reload nonce, native balance, token balances and allowances for every wallet in parallel"""
+        def refresh_wallet(wallet):
+            wallet.nonces.sync()
+            wallet.native_balance = self.w3.eth.get_balance(wallet.address)
+            for token, contract in self.token_contracts.items():
+                wallet.balances[token] = contract.functions.balanceOf(wallet.address).call()
+                for spender in self.spenders:
+                    wallet.allowances[(token, spender)] = contract.functions.allowance(wallet.address, spender).call()
+            return wallet
+        list(self.pool.map(refresh_wallet, self.wallets))
+        self.permit2.seed([(w.address, t, ROUTER_ADDRESS) for w in self.wallets for t in self.tokens])
+        self.clock.sync()
+
+    def _can_run(self, wallet, job):
+        if job.token_in is None:
+            return True
+        if wallet.available(job.token_in) < job.amount_in:
+            return False
+        return wallet.allowances.get((job.token_in, PERMIT2_ADDRESS), 0) >= job.amount_in
+
+    def assign(self, job):
+        """Pick the least busy wallet able to fund the job, rebalancing funds into one if none can"""
+        with self.lock:
+            candidates = [w for w in self.wallets if self._can_run(w, job)]
+            if candidates:
+                wallet = min(candidates, key=lambda w: (w.pending, -w.available(job.token_in) if job.token_in else 0))
+                self._reserve(wallet, job)
+                return wallet
+            # Donor amounts and the job are reserved here, the transfers are awaited without the lock
+            wallet, moves = self._plan_rebalance(job)
+            self._reserve(wallet, job)
+        try:
+            for donor, amount in moves:
+                self.transfer(donor, wallet, job.token_in, amount)
+        except Exception:
+            self._release(job)
+            raise
+        finally:
+            with self.lock:
+                for donor, amount in moves:
+                    donor.reserved[job.token_in] -= amount
+        return wallet
+
+    def _reserve(self, wallet, job):
+        if job.token_in is not None:
+            wallet.reserved[job.token_in] = wallet.reserved.get(job.token_in, 0) + job.amount_in
+        wallet.pending += 1
+        job.wallet = wallet
+
+    def _release(self, job):
+        with self.lock:
+            if job.token_in is not None:
+                job.wallet.reserved[job.token_in] -= job.amount_in
+            job.wallet.pending -= 1
+
+    def _plan_rebalance(self, job):
+        """
+        Transfers moving the shortfall of job.token_in from the richest wallets to the least busy
+        approved wallet, as [(donor, amount)]. Called with the lock held, reserves each donor amount.
+        """
+        approved = [w for w in self.wallets if w.allowances.get((job.token_in, PERMIT2_ADDRESS), 0) >= job.amount_in]
+        if not approved:
+            raise Exception(f"No wallet has approved Permit2 for {job.token_in}")
+        target = min(approved, key=lambda w: w.pending)
+        shortfall = job.amount_in - target.available(job.token_in)
+        donors = sorted((w for w in self.wallets if w is not target), key=lambda w: -w.available(job.token_in))
+        moves = []
+        for donor in donors:
+            if shortfall <= 0:
+                break
+            amount = min(shortfall, donor.available(job.token_in))
+            if amount <= 0:
+                continue
+            moves.append((donor, amount))
+            shortfall -= amount
+        if shortfall > 0:
+            raise Exception(f"Fleet cannot fund {job.name}: short {shortfall} of {job.token_in}")
+        for donor, amount in moves:
+            donor.reserved[job.token_in] = donor.reserved.get(job.token_in, 0) + amount
+        return target, moves
+
+    def transfer(self, donor, target, token, amount):
+        """ERC20 transfer between fleet wallets, balances are moved in the local view once it lands"""
+        print(f"Rebalancing {amount} of {token} from {donor.address} to {target.address}")
+        tx = self.token_contracts[token].functions.transfer(target.address, amount).build_transaction({
+            'from': donor.address,
+            'nonce': donor.nonces.take(),
+            'gas': 100000,
+            'gasPrice': self.gas_price(),
+        })
+        signed_tx = donor.account.sign_transaction(tx)
+        tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+        if receipt.status != 1:
+            raise Exception(f"Rebalance transfer failed: {tx_hash.hex()}")
+        with self.lock:
+            donor.balances[token] = donor.balances.get(token, 0) - amount
+            target.balances[token] = target.balances.get(token, 0) + amount
+        return receipt
+
+    def _ensure_router_allowance(self, job, gas_price):
+        """Permit2.approve of the router for job.token_in if the tracked allowance is short or expiring"""
+        wallet = job.wallet
+        amount, expiration, _nonce = self.permit2.get(wallet.address, job.token_in, ROUTER_ADDRESS)
+        if amount >= job.amount_in and expiration > self.clock.now()[0] + ROUTER_APPROVAL_MARGIN:
+            return
+        expiration = self.clock.expiration(ROUTER_APPROVAL_LIFETIME)
+        approve = self.permit2_contract.functions.approve(job.token_in, ROUTER_ADDRESS, MAX_UINT160, expiration)
+        tx = approve.build_transaction({
+            'from': wallet.address,
+            'nonce': wallet.nonces.take(),
+            'gas': 100000,
+            'gasPrice': gas_price,
+        })
+        signed_tx = wallet.account.sign_transaction(tx)
+        tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        print(f"Permit2 approval of the router for {job.token_in} sent from {wallet.address}: {tx_hash.hex()}")
+        # Lands before the job, which has the next nonce
+        self.permit2.approved(wallet.address, job.token_in, ROUTER_ADDRESS, MAX_UINT160, expiration)
+
+    def _send(self, job, gas_price):
+        wallet = job.wallet
+        try:
+            if job.token_in is not None:
+                self._ensure_router_allowance(job, gas_price)
+            tx = job.build(wallet).build_transaction({
+                'from': wallet.address,
+                'nonce': wallet.nonces.take(),
+                'gas': job.gas,
+                'gasPrice': gas_price,
+            })
+            signed_tx = wallet.account.sign_transaction(tx)
+            job.tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            print(f"{job.name} sent from {wallet.address}: {job.tx_hash.hex()}")
+            if job.token_in is not None:
+                self.permit2.spend(wallet.address, job.token_in, ROUTER_ADDRESS, job.amount_in)
+        except Exception as e:
+            job.error = e
+            print(f"{job.name} failed to send from {wallet.address}: {e}")
+            # A nonce may have been burned without a transaction, re-read it
+            wallet.nonces.sync()
+        return job
+
+    def _confirm(self, job):
+        wallet = job.wallet
+        try:
+            if job.tx_hash is not None:
+                job.receipt = self.w3.eth.wait_for_transaction_receipt(job.tx_hash)
+                if job.token_in is not None:
+                    if job.receipt.status == 1:
+                        with self.lock:
+                            wallet.balances[job.token_in] = wallet.balances.get(job.token_in, 0) - job.amount_in
+                    else:
+                        self.permit2.refund(wallet.address, job.token_in, ROUTER_ADDRESS, job.amount_in)
+        except Exception as e:
+            job.error = e
+        finally:
+            self._release(job)
+        return job
+
+    def submit(self, jobs, wait=True):
+        """
+        Assign jobs to wallets and send them. Each wallet sends its own jobs back to back
+        with consecutive nonces while the wallets themselves submit in parallel.
+        Without wait the receipts are awaited in the background (job.confirmed), a job's
+        reservation and pending count are released once its receipt is in.
+        """
+        assigned = []
+        try:
+            for job in jobs:
+                self.assign(job)
+                assigned.append(job)
+        except Exception:
+            # Nothing was sent yet, give back what the earlier jobs reserved
+            for job in assigned:
+                self._release(job)
+            raise
+        gas_price = self.gas_price()
+        by_wallet = {}
+        for job in jobs:
+            by_wallet.setdefault(job.wallet.address, []).append(job)
+
+        def send_all(wallet_jobs):
+            return [self._send(job, gas_price) for job in wallet_jobs]
+        list(self.pool.map(send_all, by_wallet.values()))
+
+        if wait:
+            list(self.pool.map(self._confirm, jobs))
+        else:
+            for job in jobs:
+                job.confirmed = self.confirmer.submit(self._confirm, job)
+        return jobs
+
+    def summary(self):
+        for wallet in self.wallets:
+            balances = {token: wallet.balances.get(token, 0) for token in self.tokens}
+            print(f"{wallet.address}: nonce={wallet.nonces.next_nonce} native={wallet.native_balance} "
+                  f"pending={wallet.pending} balances={balances}")
+
+
+def main():
+    w3 = Web3(ScheduledHTTPProvider(HYPEREVM_RPC_URL))
+    tokens = [
+        "0xB8CE59FC3717ada4C02eaDF9682A9e934F625ebb",  # USDT
+        "0xBe6727B535545C67d5cAa73dEa54865B92CF7907",  # UETH
+    ]
+    fleet = WalletFleet(w3, load_private_keys(), tokens, spenders=[PERMIT2_ADDRESS, ROUTER_ADDRESS])
+    fleet.refresh()
+    fleet.summary()
+
+
+if __name__ == "__main__":
+    main()
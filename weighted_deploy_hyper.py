@@ -1,4 +1,7 @@
 from web3 import Web3
+from rpc_scheduler import ScheduledHTTPProvider
+from token_amount import fp
+from hypercore_client import set_big_block_flag
 import json
 import os
 from dotenv import load_dotenv
@@ -7,12 +10,9 @@ import requests
 
 load_dotenv()
 
-def fp(number):
-    return int(Decimal(number) * Decimal(10**18))
-
 # Setup web3 connection
 def setup_web3(rpc_url, private_key):
-    w3 = Web3(Web3.HTTPProvider(rpc_url))
+    w3 = Web3(ScheduledHTTPProvider(rpc_url))
     if not w3.is_connected():
         raise Exception(f"Failed to connect to RPC: {rpc_url}")
     
@@ -21,46 +21,6 @@ def setup_web3(rpc_url, private_key):
     print(f"Using account: {account.address}")
     return w3, account
 
-# Function to set big block flag via HyperCore
-def set_big_block_flag(account_address, private_key):
-    """
-    Set the HyperCore user flag to use big blocks
-    """
-    try:
-        # HyperCore API endpoint
-        hypercore_url = "https://api.hyperliquid.xyz/exchange"
-        
-        # Create the action to enable big blocks
-        action = {
-            "type": "evmUserModify",
-            "usingBigBlocks": True
-        }
-        
-        # Create timestamp (in milliseconds)
-        import time
-        timestamp = int(time.time() * 1000)
-        
-        # Create the request payload
-        payload = {
-            "action": action,
-            "nonce": timestamp,
-            "signature": None  # Will be filled by signing
-        }
-        
-        # Note: You'll need to implement proper signing for HyperCore
-        # This is a placeholder - actual implementation requires HyperCore signing
-        print(f"Setting big block flag for address: {account_address}")
-        print(f"Action: {action}")
-        print("Note: You may need to set this flag manually via HyperCore interface")
-        print("or implement proper HyperCore signing in this script.")
-        
-        return True
-        
-    except Exception as e:
-        print(f"Failed to set big block flag: {e}")
-        print("You may need to set this manually via HyperCore interface")
-        return False
-
 # Function to get big block gas price for Hyperliquid
 def get_big_block_gas_price(w3):
     try:
@@ -247,14 +207,6 @@ def main():
     print("🔥 BIG BLOCK DEPLOYMENT MODE ENABLED 🔥")
     print("This script will ALWAYS use big blocks for deployment\n")
     
-    # Set big block flag (you may need to do this manually)
-    print("Setting HyperCore big block flag...")
-    set_big_block_flag(account.address, private_key)
-    
-    input("\n⚠️  IMPORTANT: Please ensure your HyperCore account has the big block flag set.")
-    input("You can do this via HyperCore interface or by sending the evmUserModify action.")
-    input("Press Enter to continue with deployment...")
-    
     # Token addresses
     token_addresses = [
         "0xB8CE59FC3717ada4C02eaDF9682A9e934F625ebb",  # USDT
@@ -309,6 +261,11 @@ def main():
         print("Deployment cancelled.")
         return
     
+    # Signed evmUserModify so the deployment goes to big blocks
+    print("Setting HyperCore big block flag...")
+    if not set_big_block_flag(private_key):
+        input("\n⚠️  Could not set the big block flag, set it via the HyperCore interface and press Enter to continue...")
+    
     try:
         # Deploy pool (always using big blocks)
         pool_address = deploy_weighted_pool(
@@ -344,6 +301,10 @@ def main():
             print("4. Contact Hyperliquid support")
         else:
             raise e
+    finally:
+        # Back to small blocks so later transactions from this account are not held for a big block
+        print("Restoring HyperCore small block flag...")
+        set_big_block_flag(private_key, False)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file